@@ -0,0 +1,114 @@
+"""
+Benchmark of the event queue backends of CQSim
+
+Replays the job events of a trace the way `Cqsim` does: every submit event is
+inserted first, then each popped submit event inserts the finish event of its job.
+The trace is either synthetic (Poisson arrivals, exponential run times) or read
+from a formatted job file (data/Fmt/*.csv).
+
+    python -m benchmarks.event_queue -n 100000 -n 1000000 -n 10000000
+    python -m benchmarks.event_queue -t data/Fmt/test.csv
+
+The sorted list is O(n) per event, so it is only run up to --list_max jobs.
+"""
+
+import optparse
+import random
+import time
+
+from cqsim.cqsim.event_queue import EventQueueMode, create_event_queue
+from cqsim.cqsim.types import Event, EventPara, EventState, EventType
+
+
+def synthetic_trace(num: int, seed: int = 0, interval: float = 60, run: float = 3600):
+    """Integer submit and run times, like a SWF trace."""
+    rng = random.Random(seed)
+    submit_times: list[float] = []
+    run_times: list[float] = []
+    now = 0
+    for _ in range(num):
+        now += int(rng.expovariate(1 / interval))
+        submit_times.append(float(now))
+        run_times.append(float(max(1, int(rng.expovariate(1 / run)))))
+    return submit_times, run_times
+
+
+def load_trace(path: str):
+    import pandas as pd
+
+    df = pd.read_csv(path, usecols=["submit_time", "run_time"])
+    return df["submit_time"].tolist(), df["run_time"].tolist()
+
+
+def replay(mode: EventQueueMode, submit_times: list[float], run_times: list[float]):
+    """Run the events through a queue, and return the seconds it took."""
+    queue = create_event_queue(mode)
+    start = time.perf_counter()
+    for index, submit_time in enumerate(submit_times):
+        queue.push(
+            Event(EventType.JOB, submit_time, 2, EventPara(EventState.SUBMIT, index))
+        )
+    while queue:
+        # Cqsim peeks at the next event after each one, see Cqsim.next_event_time
+        event = queue.pop()
+        assert event.para is not None
+        if event.para.state == EventState.SUBMIT:
+            job_index = event.para.job_index
+            queue.push(
+                Event(
+                    EventType.JOB,
+                    event.time + run_times[job_index],
+                    1,
+                    EventPara(EventState.FINISH, job_index),
+                )
+            )
+        if queue:
+            queue.peek()
+    return time.perf_counter() - start
+
+
+def main():
+    p = optparse.OptionParser()
+    p.add_option(
+        "-n",
+        "--num",
+        dest="num",
+        type="int",
+        action="append",
+        help="number of jobs of a synthetic trace, can be repeated",
+    )
+    p.add_option(
+        "-t", "--trace", dest="trace", type="string", help="formatted job file"
+    )
+    p.add_option(
+        "--list_max",
+        dest="list_max",
+        type="int",
+        default=200000,
+        help="largest trace to run the sorted list on",
+    )
+    p.add_option("--seed", dest="seed", type="int", default=0)
+    opts, args = p.parse_args()
+
+    traces: list[tuple[str, list[float], list[float]]] = []
+    if opts.trace:
+        traces.append((opts.trace, *load_trace(opts.trace)))
+    for num in opts.num or ([] if opts.trace else [100000, 1000000]):
+        traces.append((f"synthetic {num}", *synthetic_trace(num, opts.seed)))
+
+    print(f"{'trace':>24} {'jobs':>10} {'queue':>10} {'seconds':>10} {'events/s':>12}")
+    for name, submit_times, run_times in traces:
+        num = len(submit_times)
+        for mode in EventQueueMode:
+            if mode == EventQueueMode.LIST and num > opts.list_max:
+                print(f"{name:>24} {num:>10} {mode.name:>10} {'skipped':>10}")
+                continue
+            seconds = replay(mode, submit_times, run_times)
+            rate = 2 * num / seconds
+            print(
+                f"{name:>24} {num:>10} {mode.name:>10} {seconds:>10.2f} {rate:>12.0f}"
+            )
+
+
+if __name__ == "__main__":
+    main()
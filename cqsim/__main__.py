@@ -7,7 +7,7 @@ import time
 from datetime import datetime
 from typing import Any
 
-from cqsim import cqsim_main, cqsim_path
+from cqsim import cqsim_main, cqsim_path, cqsim_sweep
 
 
 def datetime_strptime(value: str, format: str):
@@ -162,7 +162,7 @@ if __name__ == "__main__":
         "--frac",
         dest="cluster_fraction",
         type="float",  # default=1.0, \
-        help="job density adjust",
+        help="job density adjust (the time between job submissions is multiplied by it)",
     )
 
     # 6
@@ -303,7 +303,7 @@ if __name__ == "__main__":
         type="string",
         action="callback",
         callback=callback_alg,
-        help="basic algorithm list",
+        help="basic algorithm list, or a built-in policy: fcfs, sjf, wfp3",
     )
     p.add_option(
         "-A",
@@ -315,7 +315,11 @@ if __name__ == "__main__":
         help="sign of the algorithm element in the list",
     )
     p.add_option(
-        "-b", "--bf", dest="backfill", type="int", help="backfill mode"  # default=0, \
+        "-b",
+        "--bf",
+        dest="backfill",
+        type="int",
+        help="backfill mode (1: EASY, 2: conservative, 3: conservative at earliest starts)",  # default=0
     )
     p.add_option(
         "-B",
@@ -420,6 +424,97 @@ if __name__ == "__main__":
         type="int",
         help="read input frequency",
     )
+    p.add_option(
+        "--stream_job",
+        dest="stream_job",
+        action="store_true",
+        help="read the job trace read_input_freq jobs at a time during the simulation",
+    )
+    p.add_option(
+        "-e",
+        "--event_queue",
+        dest="event_queue",
+        type="int",
+        help="event queue mode (1: sorted list, 2: binary heap, 3: calendar queue)",
+    )
+    p.add_option(
+        "--job_store",
+        dest="job_store",
+        type="int",
+        help="job store mode (1: dict of records, 2: NumPy columns)",
+    )
+    p.add_option(
+        "--node_file",
+        dest="node_file",
+        action="store_true",
+        help="format and load a node per processor, instead of only the processor count",
+    )
+    p.add_option(
+        "--placement",
+        dest="placement",
+        type="int",
+        help="placement mode (1: any free cores, 2: contiguous block, 3: block within a group)",
+    )
+    p.add_option(
+        "--archive_mem",
+        dest="archive_mem",
+        type="float",
+        help="memory (MB) of the finished job archive, spilled to the job result file + .npy",
+    )
+    p.add_option(
+        "--coalesce",
+        dest="coalesce",
+        action="store_true",
+        help="run one scheduling pass for all job events at the same time",
+    )
+    p.add_option(
+        "--checkpoint",
+        dest="checkpoint",
+        type="string",
+        help="checkpoint file name",
+    )
+    p.add_option(
+        "--checkpoint_time",
+        dest="checkpoint_time",
+        type="float",
+        help="simulated time between checkpoints",
+    )
+    p.add_option(
+        "--checkpoint_wall",
+        dest="checkpoint_wall",
+        type="float",
+        help="wall-clock seconds between checkpoints",
+    )
+    p.add_option(
+        "--resume",
+        dest="resume",
+        type="string",
+        help="checkpoint file to resume the simulation from",
+    )
+    p.add_option(
+        "--fork_time",
+        dest="fork_time",
+        type="float",
+        help="simulated time at which to fork into the branches",
+    )
+    p.add_option(
+        "--branches",
+        dest="branches",
+        type="string",
+        help="branch config file, a list of the policies to compare after fork_time",
+    )
+    p.add_option(
+        "--sweep",
+        dest="sweep",
+        type="string",
+        help="sweep config file, the values of each parameter to run every combination of",
+    )
+    p.add_option(
+        "--sweep_workers",
+        dest="sweep_workers",
+        type="int",
+        help="number of configurations of the sweep to run at a time",
+    )
 
     opts, args = p.parse_args()
 
@@ -482,6 +577,13 @@ if __name__ == "__main__":
         ), f"Error: Please specify the {data_path}!"
         inputPara[data_path] = os.path.join(cqsim_path.path_data, inputPara[data_path])  # type: ignore
 
+    if isinstance(inputPara.get("branches"), str):
+        with open(os.path.join(cqsim_path.path_config, inputPara["branches"])) as f:  # type: ignore
+            inputPara["branches"] = json.load(f)
+    if isinstance(inputPara.get("sweep"), str):
+        with open(os.path.join(cqsim_path.path_config, inputPara["sweep"])) as f:  # type: ignore
+            inputPara["sweep"] = json.load(f)
+
     if isinstance(inputPara["alg_sign"], str):
         inputPara["alg_sign"] = alg_sign_check(
             inputPara["alg_sign"], len(inputPara["alg"])
@@ -506,4 +608,7 @@ if __name__ == "__main__":
         sys.exit()
     """
 
-    cqsim_main.cqsim_main(inputPara)  # type: ignore
+    if inputPara.get("sweep"):
+        cqsim_sweep.cqsim_sweep(inputPara)  # type: ignore
+    else:
+        cqsim_main.cqsim_main(inputPara)  # type: ignore
@@ -1,8 +1,12 @@
 from .backfill import Backfill, BackfillPara
 from .basic_algorithm import BasicAlgorithm
 from .cqsim import Cqsim
+from .event_queue import EventQueue, EventQueueMode, HeapEventQueue, ListEventQueue
+from .event_source import EventSource
 from .info_collect import InfoCollect
+from .job_store import JobRow, JobStore, JobStoreMode
 from .job_trace import Job, JobTrace, JobTraceInfo
 from .node import JobInfo, Node, NodeStructure, PredictJob, PredictNode
-from .types import Event, NodeInfo, WaitInfo
+from .placement import BlockIndex, PlacementMode
+from .types import Event, ExtendPara, NodeInfo, WaitInfo
 from .window import StartWindow
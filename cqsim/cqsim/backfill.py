@@ -6,7 +6,7 @@ from dataclasses import dataclass
 from enum import Enum
 from typing import Optional
 
-from cqsim.cqsim.types import WaitInfo
+from cqsim.cqsim.wait_queue import WaitQueue
 from cqsim.extend.swf.node import NodeSWF
 from cqsim.logging.debug import DebugLog
 from cqsim.types import Time
@@ -15,6 +15,8 @@ from cqsim.types import Time
 class BackfillMode(Enum):
     EASY = 1
     CONSERVATIVE = 2
+    # Conservative, with each job reserved at its earliest start
+    RESERVE = 3
 
 
 @dataclass
@@ -31,7 +33,7 @@ class Backfill:
     parameters: list[str]
 
     backfill_parameter: Optional[BackfillPara] = None
-    wait_job: list[WaitInfo] = []
+    wait_job: Optional[WaitQueue] = None
 
     def __init__(
         self,
@@ -48,7 +50,7 @@ class Backfill:
         self.logger = debug
         self.parameters = para_list
         self.backfill_parameter = None
-        self.wait_job = []
+        self.wait_job = None
 
         self.logger.line(4, " ")
         self.logger.line(4, "#")
@@ -75,10 +77,10 @@ class Backfill:
         if para_list:
             self.parameters = para_list
         self.backfill_parameter = None
-        self.wait_job = []
+        self.wait_job = None
 
     def backfill(
-        self, wait_job: list[WaitInfo], para_in: Optional[BackfillPara] = None
+        self, wait_job: WaitQueue, para_in: Optional[BackfillPara] = None
     ) -> Optional[list[int]]:
         # self.debug.debug("* "+self.display_name+" -- backfill",5)
         if len(wait_job) <= 1:
@@ -97,6 +99,9 @@ class Backfill:
         elif self.mode == BackfillMode.CONSERVATIVE:
             # Conservative backfill
             result = self.backfill_cons()
+        elif self.mode == BackfillMode.RESERVE:
+            # Conservative backfill at the earliest starts
+            result = self.backfill_reserve()
         else:
             return None
         return result
@@ -104,47 +109,75 @@ class Backfill:
     def backfill_EASY(self):
         # self.debug.debug("* "+self.display_name+" -- backfill_EASY",5)
         backfill_list: list[int] = []
-        assert self.backfill_parameter is not None
+        assert self.backfill_parameter is not None and self.wait_job is not None
+        indices, procs, runs = self.wait_columns()
         self.node.predict_reset(self.backfill_parameter.time)
-        self.node.reserve(
-            self.wait_job[0].proc, self.wait_job[0].index, self.wait_job[0].run
-        )
+        self.node.reserve(procs[0], indices[0], runs[0])
 
-        for job in self.wait_job[1:]:
+        for index, proc, run in zip(indices[1:], procs[1:], runs[1:]):
             backfill_test = self.node.predict_avail(
-                job.proc,
+                proc,
                 self.backfill_parameter.time,
-                self.backfill_parameter.time + job.run,
+                self.backfill_parameter.time + run,
             )
             if backfill_test:
-                backfill_list.append(job.index)
+                backfill_list.append(index)
                 self.node.reserve(
-                    job.proc,
-                    job.index,
-                    job.run,
+                    proc,
+                    index,
+                    run,
                 )
         return backfill_list
 
     def backfill_cons(self):
         # self.debug.debug("* "+self.display_name+" -- backfill_cons",5)
         backfill_list: list[int] = []
-        assert self.backfill_parameter is not None
+        assert self.backfill_parameter is not None and self.wait_job is not None
+        indices, procs, runs = self.wait_columns()
         self.node.predict_reset(self.backfill_parameter.time)
-        self.node.reserve(
-            self.wait_job[0].proc, self.wait_job[0].index, self.wait_job[0].run
-        )
+        self.node.reserve(procs[0], indices[0], runs[0])
 
-        for job in self.wait_job[1:]:
+        for index, proc, run in zip(indices[1:], procs[1:], runs[1:]):
             backfill_test = self.node.predict_avail(
-                job.proc,
+                proc,
                 self.backfill_parameter.time,
-                self.backfill_parameter.time + job.run,
+                self.backfill_parameter.time + run,
             )
             if backfill_test:
-                backfill_list.append(job.index)
+                backfill_list.append(index)
             self.node.reserve(
-                job.proc,
-                job.index,
-                job.run,
+                proc,
+                index,
+                run,
             )
         return backfill_list
+
+    def backfill_reserve(self):
+        """
+        Reserve each job in queue order at the earliest time its cores are free
+        for its run time, around the reservations before it. The jobs whose
+        reservation starts now are backfilled.
+        """
+        backfill_list: list[int] = []
+        assert self.backfill_parameter is not None and self.wait_job is not None
+        indices, procs, runs = self.wait_columns()
+        self.node.predict_reset(self.backfill_parameter.time)
+
+        for index, proc, run in zip(indices, procs, runs):
+            start = self.node.predict_start(proc, run)
+            if start is None:
+                # more cores than the machine has
+                continue
+            self.node.reserve(proc, index, run, start=start)
+            if start <= self.backfill_parameter.time:
+                backfill_list.append(index)
+        return backfill_list
+
+    def wait_columns(self):
+        """The index, proc and run of the waiting jobs, as lists for the loops."""
+        assert self.wait_job is not None
+        return (
+            self.wait_job.indices.tolist(),
+            self.wait_job.procs.tolist(),
+            self.wait_job.runs.tolist(),
+        )
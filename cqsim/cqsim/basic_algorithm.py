@@ -1,6 +1,9 @@
 from __future__ import annotations
 
-from typing import TYPE_CHECKING, Optional
+import ast
+from typing import TYPE_CHECKING, Any, Callable, Optional
+
+import numpy as np
 
 from cqsim.cqsim.job_trace import JobTraceInfo
 from cqsim.logging.debug import DebugLog
@@ -10,9 +13,139 @@ if TYPE_CHECKING:
     from cqsim.cqsim_main import ParaList
 
 
+ScoreFunction = Callable[..., object]
+
+
+# Built-in policies, precompiled. A higher score starts first.
+def fcfs(s, t, n, w, z, l):
+    """First come, first served: the longest wait first."""
+    return w
+
+
+def sjf(s, t, n, w, z, l):
+    """Shortest job first, by requested time."""
+    return -t
+
+
+def wfp3(s, t, n, w, z, l):
+    """WFP3: the cube of the wait over the requested time, times the size."""
+    return (w / t) ** 3 * n
+
+
+POLICIES: dict[str, ScoreFunction] = {"fcfs": fcfs, "sjf": sjf, "wfp3": wfp3}
+
+# The job fields the score expressions take
+SCORE_FIELDS = ("submit_time", "requested_time", "requested_number_processors")
+
+# The names of the expression which change while a job waits
+TIME_NAMES = {"w", "z", "l", "passed_time", "max_passed_time", "min_request_time"}
+
+
+def compile_score(expr: str) -> ScoreFunction:
+    """
+    Compile a score expression into a function of (s, t, n, w, z, l).
+
+    The expression is parsed once. The arguments are either numbers or NumPy
+    arrays of the whole wait queue. The name of a built-in policy in POLICIES
+    gives its function.
+
+    s, submit: submit time
+    t, request_time: requested run time
+    n, request_processors: requested processors
+    w, passed_time: time waited so far
+    z, max_passed_time: longest wait of the queue
+    l, min_request_time: shortest requested time of the queue
+    """
+    if expr.strip().lower() in POLICIES:
+        return POLICIES[expr.strip().lower()]
+
+    code = compile(expr.strip(), "<alg>", "eval")
+
+    def score(s, t, n, w, z, l):
+        return eval(
+            code,
+            globals(),
+            {
+                "s": s,
+                "t": t,
+                "n": n,
+                "w": w,
+                "z": z,
+                "l": l,
+                # For backward compatibility
+                "submit": s,
+                "request_time": t,
+                "request_processors": n,
+                "passed_time": w,
+                "max_passed_time": z,
+                "min_request_time": l,
+            },
+        )
+
+    return score
+
+
+def compile_order_key(
+    expr: str, score_function: ScoreFunction
+) -> Optional[Callable[[JobTraceInfo], Any]]:
+    """
+    A key ordering the waiting jobs as their scores do at any time, if there is one.
+
+    This is the case when the score does not depend on the time (such as SJF),
+    or is the wait time plus a constant (FCFS). Ties are left to the caller,
+    which must keep the jobs in the order they were submitted.
+    None if the order of the jobs can change while they wait.
+    """
+    name = expr.strip().lower()
+    if score_function is fcfs:
+        return lambda job: job.submit_time
+    if score_function is sjf:
+        return lambda job: job.requested_time
+    if name in POLICIES:
+        return None
+
+    try:
+        tree = ast.parse(expr.strip(), mode="eval").body
+    except SyntaxError:
+        return None
+    names = {node.id for node in ast.walk(tree) if isinstance(node, ast.Name)}
+    if not names & TIME_NAMES:
+        # the same score all along: compute it once, as get_score would
+        return lambda job: -float(
+            score_function(  # type: ignore
+                float(job.submit_time),
+                float(job.requested_time),
+                float(job.requested_number_processors),
+                0,
+                1,
+                0.0,
+            )
+        )
+
+    # w + c, c + w or w - c: int(now - s) keeps the order of the submit times
+    while (
+        isinstance(tree, ast.BinOp)
+        and isinstance(tree.op, (ast.Add, ast.Sub))
+        and isinstance(tree.right, ast.Constant)
+    ) or (
+        isinstance(tree, ast.BinOp)
+        and isinstance(tree.op, ast.Add)
+        and isinstance(tree.left, ast.Constant)
+    ):
+        tree = tree.left if isinstance(tree.right, ast.Constant) else tree.right
+    if isinstance(tree, ast.Name) and tree.id in ("w", "passed_time"):
+        return lambda job: job.submit_time
+    return None
+
+
 class BasicAlgorithm:
     score_list: list[float]
     algorithm_expr: str
+    score_function: ScoreFunction
+    # Whether score_function takes whole arrays, False once it did not
+    vectorized: bool
+    # Key of a fixed order of the waiting jobs, None if it changes with time
+    order_key: Optional[Callable[[JobTraceInfo], Any]]
 
     def __init__(
         self,
@@ -36,6 +169,9 @@ class BasicAlgorithm:
 
         self.score_list = []
         self.algorithm_expr = "".join(self.element[0])
+        self.score_function = compile_score(self.algorithm_expr)
+        self.vectorized = True
+        self.order_key = compile_order_key(self.algorithm_expr, self.score_function)
 
     def reset(
         self,
@@ -59,38 +195,86 @@ class BasicAlgorithm:
 
         self.score_list = []
         self.algorithm_expr = "".join(self.element[0])
+        self.score_function = compile_score(self.algorithm_expr)
+        self.vectorized = True
+        self.order_key = compile_order_key(self.algorithm_expr, self.score_function)
 
     def get_score(
         self,
-        wait_jobs: list[JobTraceInfo],
+        wait_jobs: Optional[list[JobTraceInfo]],
         current_time: Time,
         para_list: Optional[ParaList] = None,
+        columns: Optional[dict[str, np.ndarray]] = None,
     ):
+        """
+        :param wait_jobs: the waiting jobs, only read if `columns` is None.
+        :param columns: the fields of SCORE_FIELDS of the jobs as arrays, if the
+            job trace has them, see `JobTrace.job_columns`.
+        """
         # self.debug.debug("* "+self.display_name+" -- get_score",5)
         self.score_list = []
-        if len(wait_jobs) == 0:
+        if columns is None:
+            assert wait_jobs is not None
+            columns = {
+                name: np.array([getattr(job, name) for job in wait_jobs])
+                for name in SCORE_FIELDS
+            }
+        size = len(columns["submit_time"])
+        if size == 0:
             return self.score_list
 
-        max_passed_time = max(current_time - job.submit_time for job in wait_jobs)
-        min_request_time = min(job.requested_time for job in wait_jobs)
+        raw_submit = columns["submit_time"]
+        raw_request_time = columns["requested_time"]
+        max_passed_time = (current_time - raw_submit).max().item()
+        min_request_time = raw_request_time.min().item()
         if max_passed_time == 0:
             max_passed_time = 1
 
-        for job in wait_jobs:
-            submit = float(job.submit_time)
-            request_time = float(job.requested_time)
-            request_processors = float(job.requested_number_processors)
-            passed_time = int(current_time - submit)
-            # For backward compatibility
+        submit = raw_submit.astype(float)
+        scores = None
+        if self.vectorized:
+            request_time = raw_request_time.astype(float)
+            request_processors = columns["requested_number_processors"].astype(float)
+            # int() truncates toward zero, as trunc does. Kept as floats, which
+            # do not wrap around as int64 would on large products of waits.
+            passed_time = np.trunc(current_time - submit)
+            try:
+                # raise where the scalar expression would, and fall back to it
+                with np.errstate(divide="raise", over="raise", invalid="raise"):
+                    scores = self.score_function(
+                        submit,
+                        request_time,
+                        request_processors,
+                        passed_time,
+                        max_passed_time,
+                        min_request_time,
+                    )
+            except FloatingPointError:
+                # an overflow or division of these jobs only: score them one by
+                # one this time, as Python does
+                pass
+            except Exception:
+                # the expression does not take arrays, such as max(w, t)
+                self.vectorized = False
+                self.debug.debug(
+                    "  Score: "
+                    + self.algorithm_expr
+                    + " is not vectorized, scoring one job at a time",
+                    1,
+                )
+
+        if scores is not None:
+            scores = np.broadcast_to(np.asarray(scores, dtype=float), size)
+            self.score_list = scores.tolist()
+        else:
+            # one job at a time, as Python numbers
             z, l = max_passed_time, min_request_time
-            s, t, n, w = submit, request_time, request_processors, passed_time
-            self.score_list.append(float(eval(self.algorithm_expr)))
-
-        # Prevent autoflake auto delete unused code
-        if False:
-            submit or request_time
-            request_processors or passed_time or max_passed_time or min_request_time
-            z or l or s or t or n or w
+            for s, t, n in zip(*(columns[name].tolist() for name in SCORE_FIELDS)):
+                s, t, n = float(s), float(t), float(n)
+                w = int(current_time - s)
+                self.score_list.append(
+                    float(self.score_function(s, t, n, w, z, l))  # type: ignore
+                )
 
         # self.debug.debug("  Score:"+str(self.scoreList),4)
         return self.score_list
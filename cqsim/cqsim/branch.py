@@ -0,0 +1,137 @@
+"""
+Branching module for CQSim
+
+Run a simulation up to a fork time, then fork the process into several branches
+which share the simulated prefix and continue with their own scheduling policy.
+Every branch writes its own output and debug files.
+"""
+
+from __future__ import annotations
+
+import os
+import shutil
+import sys
+import traceback
+from dataclasses import dataclass
+from typing import TYPE_CHECKING, Optional
+
+from cqsim.cqsim.window import StartWindowPara
+from cqsim.result.archive import ARCHIVE_EXT
+from cqsim.types import StrOrBytesPath, Time
+
+if TYPE_CHECKING:
+    from cqsim.cqsim.cqsim import Cqsim
+    from cqsim.logging.output import Output
+
+
+@dataclass
+class Branch:
+    """
+    The policy of a branch and where it writes to.
+
+    The policy fields left to None keep the setting of the simulation that is forked.
+    """
+
+    name: str
+    output: Optional[Output] = None
+    debug: Optional[StrOrBytesPath] = None
+    checkpoint: Optional[StrOrBytesPath] = None
+    backfill: Optional[int] = None
+    win: Optional[bool] = None
+    win_para: Optional[StartWindowPara] = None
+    alg: Optional[tuple[list[str], list[int]]] = None
+
+
+def fork_branches(
+    sim: Cqsim,
+    time: Time,
+    branches: list[Branch],
+    max_workers: Optional[int] = None,
+) -> dict[str, int]:
+    """
+    Simulate until `time`, then continue every branch in a forked process.
+
+    The events are expected to be imported already, see `Cqsim.import_events`.
+    All the events before `time` are processed once in the current process.
+    At most `max_workers` branches (default: the number of cpus) run at a time.
+
+    :return: the exit code of every branch, by name.
+    """
+    sim.scan_event(until=time)
+    sim.debug.debug("  [Fork] " + str(sim.current_time), 2)
+    # write out what the branches would otherwise all print again
+    sys.stdout.flush()
+    sys.stderr.flush()
+
+    max_workers = max_workers or os.cpu_count() or 1
+    running: dict[int, str] = {}
+    results: dict[str, int] = {}
+    for branch in branches:
+        if len(running) >= max_workers:
+            pid, status = os.wait()
+            results[running.pop(pid)] = os.waitstatus_to_exitcode(status)
+        pid = os.fork()
+        if pid == 0:
+            run_branch(sim, branch)
+        running[pid] = branch.name
+    while running:
+        pid, status = os.wait()
+        results[running.pop(pid)] = os.waitstatus_to_exitcode(status)
+
+    for branch in branches:
+        sim.debug.debug(
+            "  [Branch] " + branch.name + " exit " + str(results[branch.name]), 2
+        )
+    return results
+
+
+def run_branch(sim: Cqsim, branch: Branch):
+    """Apply the branch to the forked simulation and run it to the end. Never returns."""
+    code = 0
+    try:
+        apply_branch(sim, branch)
+        sim.scan_event()
+        sim.sim_done()
+    except BaseException:
+        traceback.print_exc()
+        code = 1
+    finally:
+        sys.stdout.flush()
+        sys.stderr.flush()
+        os._exit(code)
+
+
+def apply_branch(sim: Cqsim, branch: Branch):
+    """Redirect the files of the simulation to the branch, then switch its policy."""
+    output = sim.module.output
+    if branch.output and output.output_path:
+        # the prefix written so far is shared by all the branches
+        for key in ("sys", "adapt", "result"):
+            shutil.copyfile(output.output_path[key], branch.output[key])  # type: ignore
+        archive = output.archive
+        if archive is not None and archive.path and os.path.exists(archive.path):
+            shutil.copyfile(archive.path, branch.output["result"] + ARCHIVE_EXT)
+        output.output_path = branch.output
+        output.reset_output(append=True)
+
+    debug = sim.debug
+    if branch.debug and debug.path:
+        shutil.copyfile(debug.path, branch.debug)
+        debug.path = branch.debug
+        debug.debugFile.reset(debug.path, "a")
+
+    if sim.checkpoint:
+        sim.checkpoint.path = branch.checkpoint
+        sim.checkpoint.reset()
+
+    if branch.backfill is not None:
+        sim.module.backfill.reset(mode=branch.backfill)
+    if branch.win is not None:
+        sim.module.win.use_window = branch.win
+    if branch.win_para is not None:
+        sim.module.win.reset(para_list=branch.win_para)
+    if branch.alg is not None:
+        sim.module.alg.reset(element=branch.alg)  # type: ignore
+        sim.module.job.set_wait_order(sim.module.alg.order_key)
+
+    sim.debug.debug("  [Branch] " + branch.name, 2)
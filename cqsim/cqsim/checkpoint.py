@@ -0,0 +1,92 @@
+"""
+Checkpoint module for CQSim
+
+A checkpoint is a pickled dict with the state of the simulator and its modules,
+see `Cqsim.get_state`. Only the state that changes during the simulation is saved:
+a run must be resumed with the same parameters it was started with.
+"""
+
+import os
+import pickle
+import time
+from typing import Optional
+
+from cqsim.logging.debug import DebugLog
+from cqsim.types import StrOrBytesPath, Time
+
+CHECKPOINT_VERSION = 1
+
+
+class Checkpoint:
+    """
+    Decide when to write a checkpoint, and write it.
+
+    A checkpoint is written every `sim_interval` seconds of simulated time and/or
+    every `wall_interval` seconds of wall-clock time, replacing the previous one.
+    """
+
+    path: Optional[StrOrBytesPath]
+    sim_interval: Optional[Time]
+    wall_interval: Optional[float]
+    last_sim_time: Optional[Time]
+    last_wall_time: float
+    saved: int
+
+    def __init__(
+        self,
+        debug: DebugLog,
+        path: Optional[StrOrBytesPath] = None,
+        sim_interval: Optional[Time] = None,
+        wall_interval: Optional[float] = None,
+    ):
+        self.display_name = "Checkpoint"
+        self.debug = debug
+        self.path = path
+        self.sim_interval = sim_interval
+        self.wall_interval = wall_interval
+        self.reset()
+
+    def reset(self):
+        self.last_sim_time = None
+        self.last_wall_time = time.monotonic()
+        self.saved = 0
+
+    def due(self, sim_time: Time):
+        """Whether a checkpoint should be written at the given simulated time."""
+        if not self.path:
+            return False
+        if self.last_sim_time is None:
+            self.last_sim_time = sim_time
+        if self.sim_interval and sim_time - self.last_sim_time >= self.sim_interval:
+            return True
+        if (
+            self.wall_interval
+            and time.monotonic() - self.last_wall_time >= self.wall_interval
+        ):
+            return True
+        return False
+
+    def save(self, state: dict, sim_time: Time):
+        assert self.path
+        temp_path = str(self.path) + ".tmp"
+        with open(temp_path, "wb") as f:
+            pickle.dump(
+                {"version": CHECKPOINT_VERSION} | state,
+                f,
+                protocol=pickle.HIGHEST_PROTOCOL,
+            )
+        # never leave a half written checkpoint behind
+        os.replace(temp_path, self.path)
+
+        self.last_sim_time = sim_time
+        self.last_wall_time = time.monotonic()
+        self.saved += 1
+        self.debug.debug("  [Checkpoint] " + str(sim_time), 3)
+
+
+def load_checkpoint(path: StrOrBytesPath) -> dict:
+    with open(path, "rb") as f:
+        state = pickle.load(f)
+    if state.get("version") != CHECKPOINT_VERSION:
+        raise ValueError(f"Unsupported checkpoint version {state.get('version')}")
+    return state
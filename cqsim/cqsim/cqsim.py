@@ -1,10 +1,18 @@
-import bisect
-from typing import Any, NamedTuple, Optional
+import itertools
+from typing import Any, Iterable, NamedTuple, Optional
 
 import pandas as pd
 
 from cqsim.cqsim.backfill import Backfill, BackfillPara
-from cqsim.cqsim.basic_algorithm import BasicAlgorithm
+from cqsim.cqsim.basic_algorithm import SCORE_FIELDS, BasicAlgorithm
+from cqsim.cqsim.checkpoint import Checkpoint, load_checkpoint
+from cqsim.cqsim.event_queue import (
+    EventQueue,
+    EventQueueMode,
+    MonitorTimer,
+    create_event_queue,
+)
+from cqsim.cqsim.event_source import EventSource
 from cqsim.cqsim.info_collect import InfoCollect
 from cqsim.cqsim.job_trace import JobTrace
 from cqsim.cqsim.types import (
@@ -12,15 +20,15 @@ from cqsim.cqsim.types import (
     EventPara,
     EventState,
     EventType,
+    ExtendPara,
     NodeInfo,
-    WaitInfo,
 )
 from cqsim.cqsim.window import StartWindow
 from cqsim.extend.swf.node import NodeSWF
 from cqsim.logging.debug import DebugLog
 from cqsim.logging.file import LogFile
 from cqsim.logging.output import OutputLog
-from cqsim.types import EventCode, Time
+from cqsim.types import EventCode, StrOrBytesPath, Time
 
 
 class ModuleList(NamedTuple):
@@ -39,32 +47,63 @@ class Cqsim:
     previous_read_job_time: Optional[Time]
 
     # An event sequence
-    event_seq: list[Event]
+    event_seq: EventQueue
+    event_queue_mode: EventQueueMode
 
     monitor: Optional[int]
     monitor_start: int
+    # Lazy source of monitor events, used unless the list event queue is selected
+    monitor_timer: Optional[MonitorTimer]
+
+    # Run one scheduling pass for all the job events sharing a time
+    coalesce: bool
+    coalesced_passes: int
+
+    # Smallest request of the waiting jobs, None if it has to be recomputed
+    wait_min_proc: Optional[int]
+    # Scans and backfills skipped because no waiting job fits in the available cores
+    skipped_scans: int
+    skipped_backfills: int
+
+    checkpoint: Optional[Checkpoint]
+
+    # Sources of extension events, by the index in their events
+    event_sources: list[EventSource]
 
     def __init__(
         self,
         module: ModuleList,
         debug: DebugLog,
         monitor: Optional[int] = None,
+        event_queue: int = 2,
+        coalesce: bool = False,
+        checkpoint: Optional[Checkpoint] = None,
     ):
         self.display_name = "Cqsim Sim"
         self.module = module
         self.debug = debug
         self.monitor = monitor
+        self.event_queue_mode = EventQueueMode(event_queue)
+        self.coalesce = coalesce
+        self.checkpoint = checkpoint
 
         self.debug.line(4, " ")
         self.debug.line(4, "#")
         self.debug.debug("# " + self.display_name, 1)
         self.debug.line(4, "#")
 
-        self.event_seq = []
+        self.event_seq = create_event_queue(self.event_queue_mode)
         # self.event_pointer = 0
         self.monitor_start = 0
+        self.monitor_timer = self.create_monitor_timer()
+        self.coalesced_passes = 0
+        self.wait_min_proc = None
+        self.skipped_scans = 0
+        self.skipped_backfills = 0
+        self.event_sources = []
         self.current_event = None
         self.current_time = 0
+        self.module.job.set_wait_order(self.module.alg.order_key)
         self.previous_read_job_time = None  # lastest read job submit time
 
         self.debug.line(4)
@@ -78,6 +117,9 @@ class Cqsim:
         module: Optional[ModuleList] = None,
         debug: Optional[DebugLog] = None,
         monitor: Optional[int] = None,
+        event_queue: Optional[int] = None,
+        coalesce: Optional[bool] = None,
+        checkpoint: Optional[Checkpoint] = None,
     ):
         # self.debug.debug("# "+self.display_name+" -- reset",5)
         if module:
@@ -87,35 +129,103 @@ class Cqsim:
             self.debug = debug
         if monitor:
             self.monitor = monitor
-
-        self.event_seq: list[Event] = []
+        if event_queue:
+            self.event_queue_mode = EventQueueMode(event_queue)
+        if coalesce is not None:
+            self.coalesce = coalesce
+        if checkpoint:
+            self.checkpoint = checkpoint
+        if self.checkpoint:
+            self.checkpoint.reset()
+
+        self.event_seq = create_event_queue(self.event_queue_mode)
         # self.event_pointer = 0
         self.monitor_start = 0
+        self.monitor_timer = self.create_monitor_timer()
+        self.coalesced_passes = 0
+        self.wait_min_proc = None
+        self.skipped_scans = 0
+        self.skipped_backfills = 0
+        self.event_sources = []
         self.current_event = None
         self.current_time = 0
+        self.module.job.set_wait_order(self.module.alg.order_key)
         self.previous_read_job_time = -1
 
-    def cqsim_sim(self):
-        """The main process of the simulator."""
+    def create_monitor_timer(self):
+        if not self.monitor or self.event_queue_mode == EventQueueMode.LIST:
+            return None
+        return MonitorTimer(self.monitor)
+
+    def cqsim_sim(self, resume: Optional[StrOrBytesPath] = None):
+        """
+        The main process of the simulator.
+
+        :param resume: a checkpoint file to resume the simulation from.
+        """
 
-        # Initialize the event sequence with the job submit event, monitor event and extend event.
-        self.import_job_events()
-        self.insert_extend_events()
+        self.import_events(resume)
 
         # Scan the event sequence and deal with all the event in the sequence
         self.scan_event()
 
-        # Output the job result
+        self.sim_done()
+
+        return
+
+    def import_events(self, resume: Optional[StrOrBytesPath] = None):
+        """Fill the event sequence, or restore it from a checkpoint file."""
+        if resume:
+            self.set_state(load_checkpoint(resume))
+        else:
+            # Initialize the event sequence with the job submit event, monitor event and extend event.
+            self.import_job_events()
+            self.insert_extend_events()
+
+    def sim_done(self):
+        """Output the job result and the statistics of the simulation."""
         self.print_result()
+        if self.coalesce:
+            self.debug.debug(
+                "------ Scheduling passes saved by coalescing: "
+                + str(self.coalesced_passes),
+                2,
+            )
+        self.debug.debug(
+            "------ Scheduling passes skipped: "
+            + str(self.skipped_scans)
+            + " scans, "
+            + str(self.skipped_backfills)
+            + " backfills",
+            2,
+        )
         self.debug.debug("------ Simulating Done!", 2)
         self.debug.debug(lvl=1)
 
-        return
-
     def import_job_events(self):
         """Read the job trace and insert the job submit event in the event sequence in time order."""
+        if not self.module.job.read_done():
+            # the job trace is streamed, only read as far as the first event
+            self.read_job_events()
+            return
 
-        for i in range(self.module.job.job_info_len()):
+        self.insert_job_events(range(self.module.job.job_info_len()))
+
+    def read_job_events(self):
+        """
+        Read chunks of a streamed job trace until the next event in the event sequence
+        is earlier than every job not read yet.
+        """
+        while not self.module.job.read_done() and (
+            not self.event_seq
+            or self.previous_read_job_time is None
+            or self.event_seq.peek().time >= self.previous_read_job_time
+        ):
+            self.insert_job_events(self.module.job.read_job_chunk())
+
+    def insert_job_events(self, job_indices: Iterable[int]):
+        """Insert the job submit events of the given jobs."""
+        for i in job_indices:
             event = Event(
                 EventType.JOB,
                 self.module.job.job_info(i).submit_time,
@@ -137,6 +247,11 @@ class Cqsim:
         """Insert monitor event from current time to time of the next event."""
         if not self.monitor:
             return
+        if self.monitor_timer is not None:
+            # ticks are popped from the timer when they are due
+            if not self.monitor_timer.started():
+                self.monitor_timer.start(start)
+            return
 
         monitor_time = int(start // self.monitor) * self.monitor
 
@@ -152,22 +267,48 @@ class Cqsim:
                 )
             monitor_time += self.monitor
 
+    def add_event_source(self, source: EventSource):
+        """
+        Register a source of extension events, before the simulation starts.
+
+        To resume a checkpoint, register the same sources again from the start;
+        the events already taken are skipped.
+
+        :return: the index of the source.
+        """
+        self.event_sources.append(source)
+        return len(self.event_sources) - 1
+
     def insert_extend_events(self):
+        """Insert the first event of every event source."""
         # self.debug.debug("# "+self.display_name+" -- insert_event_extend",5)
-        return
+        for index in range(len(self.event_sources)):
+            self.insert_source_event(index)
+
+    def insert_source_event(self, index: int):
+        """Insert the next event of an event source, if it has any left."""
+        event = self.event_sources[index].next_event(index)
+        if event is None:
+            return
+        self.insert_event(event)
+        self.debug.debug(
+            "  "
+            + "Insert ext["
+            + str(event.prio)
+            + "] "
+            + self.event_sources[index].display_name
+            + " "
+            + str(event.time),
+            4,
+        )
 
     def insert_event(self, event: Event):
         """Insert the event in the event sequence in time order"""
         index: Optional[int] = None
-        if event.type == EventType.JOB:
-            index = bisect.bisect_right(self.event_seq, event)
-        elif event.type == EventType.MONITOR:
+        if event.type == EventType.MONITOR:
             index = self.get_index_monitor()
 
-        if index is None or index >= len(self.event_seq):
-            self.event_seq.append(event)
-        else:
-            self.event_seq.insert(index, event)
+        self.event_seq.push(event, index)
 
     def delete_event(self, type: Any, time: Time, index: int):
         # self.debug.debug("# "+self.display_name+" -- delete_event",5)
@@ -178,12 +319,30 @@ class Cqsim:
         self.monitor_start += 1
         return self.monitor_start
 
-    def scan_event(self):
+    def pop_event(self):
+        """Pop the next event, taking a monitor tick instead if one is due before it."""
+        if self.monitor_timer and self.monitor_timer.due(self.event_seq.peek().time):
+            return self.monitor_timer.pop()
+        return self.event_seq.pop()
+
+    def next_event_time(self):
+        """The time of the next event, or None if there is none."""
+        if not self.event_seq:
+            return None
+        time = self.event_seq.peek().time
+        if self.monitor_timer and self.monitor_timer.due(time):
+            assert self.monitor_timer.next_time is not None
+            return self.monitor_timer.next_time
+        return time
+
+    def scan_event(self, until: Optional[Time] = None):
         """
         Scan the event sequence and deal with all the event in the sequence
 
         `scan_event` will set `self.current_event` to the current event.
         Then call the corresponding `event_[type]` function to process the event.
+
+        :param until: if set, stop before the first event at or after this time.
         """
         self.debug.line(2, " ")
 
@@ -191,8 +350,11 @@ class Cqsim:
         self.debug.line(2, "=")
         self.current_event = None
 
+        self.read_job_events()
         while len(self.event_seq) > 0:
-            self.current_event = self.event_seq.pop(0)
+            if until is not None and self.next_event_time() >= until:  # type: ignore
+                break
+            self.current_event = self.pop_event()
             self.current_time = self.current_event.time
 
             if self.current_event.type == EventType.JOB:
@@ -203,8 +365,11 @@ class Cqsim:
                 self.debug.debug("  Time: " + str(self.current_time), 2)
                 self.debug.debug("   " + str(self.current_event), 2)
                 self.debug.line(2, "--")
-                self.debug.debug("  Wait: " + str(self.module.job.wait_list()), 2)
-                self.debug.debug("  Run : " + str(self.module.job.run_list()), 2)
+                if self.debug.lvl >= 2:
+                    wait_list = self.module.job.wait_list()
+                    run_list = list(self.module.job.run_list())
+                    self.debug.debug("  Wait: " + str(wait_list), 2)
+                    self.debug.debug("  Run : " + str(run_list), 2)
                 self.debug.line(2, "--")
                 self.debug.debug(
                     "  Tot:"
@@ -223,14 +388,56 @@ class Cqsim:
                 self.event_monitor(self.current_event.para)
             elif self.current_event.type == EventType.EXTEND:
                 self.event_extend(self.current_event.para)
+            self.read_job_events()
             self.sys_collect(self.current_event)
             self.interface()
 
+            if self.checkpoint and self.checkpoint.due(self.current_time):
+                self.checkpoint.save(self.get_state(), self.current_time)
+
         self.debug.line(2, "=")
         self.debug.line(2, "=")
         self.debug.line(2, " ")
         return
 
+    def get_state(self):
+        """The state of the simulation between two events, see `checkpoint`."""
+        return {
+            "sim": {
+                "current_time": self.current_time,
+                "previous_read_job_time": self.previous_read_job_time,
+                "event_seq": self.event_seq,
+                "monitor_start": self.monitor_start,
+                "monitor_timer": self.monitor_timer,
+                "coalesced_passes": self.coalesced_passes,
+                "wait_min_proc": self.wait_min_proc,
+                "skipped_scans": self.skipped_scans,
+                "skipped_backfills": self.skipped_backfills,
+            },
+            "job": self.module.job.get_state(),
+            "node": self.module.node.get_state(),
+            "output": self.module.output.get_state(),
+            "debug": self.debug.get_state(),
+            "event_sources": [source.consumed for source in self.event_sources],
+        }
+
+    def set_state(self, state: dict):
+        """
+        Restore the state of `get_state`.
+
+        The modules must be set up as for a new run, with the job file imported
+        and the output files opened without clearing them.
+        """
+        for key, value in state["sim"].items():
+            setattr(self, key, value)
+        self.module.job.set_state(state["job"])
+        self.module.node.set_state(state["node"])
+        self.module.output.set_state(state["output"])
+        self.debug.set_state(state["debug"])
+        for source, consumed in zip(self.event_sources, state.get("event_sources", [])):
+            source.skip(consumed)
+        self.debug.debug("  [Resume] " + str(self.current_time), 3)
+
     # Event process functions
 
     def event_job(self, para_in: Optional[EventPara] = None):
@@ -248,15 +455,30 @@ class Cqsim:
         elif current_event.para.state == EventState.FINISH:
             self.finish(current_event.para.job_index)
 
+        if self.coalesce and self.next_job_event_at(self.current_time):
+            # The last job event at this time will do the scheduling pass.
+            self.coalesced_passes += 1
+            self.debug.debug("  [Coalesce] scheduling pass deferred", 3)
+            return
+
         # Calculate the scores of the waiting job after the event is done.
         self.score_calculate()
 
         # Call the start scan method group: window - start new job - backfill
         self.start_scan()
 
+        self.read_job_events()
         if self.event_seq:
             # self.insert_event_monitor(self.currentTime, self.event_seq[self.event_pointer+1]['time'])
-            self.insert_monitor_events(self.current_time, self.event_seq[0].time)
+            self.insert_monitor_events(self.current_time, self.event_seq.peek().time)
+
+    def next_job_event_at(self, time: Time):
+        """Whether the next event is a job event at the given time."""
+        self.read_job_events()
+        if not self.event_seq:
+            return False
+        event = self.event_seq.peek()
+        return event.type == EventType.JOB and event.time == time
 
     def event_monitor(self, para_in: Optional[EventPara] = None):
         # Deal with the monitor event
@@ -267,15 +489,26 @@ class Cqsim:
         # Call the print_adapt() method if needed.
         self.print_adapt(None)
 
-    def event_extend(self, para_in: Optional[EventPara] = None):
-        # Deal with the extend event
-        # Call the extend process.
-        pass
+    def event_extend(self, para_in: Optional[ExtendPara] = None):
+        """
+        Process an extension event with the handler of its source,
+        then take the next event of the source.
+        """
+        assert para_in is not None
+        source = self.event_sources[para_in.source]
+        self.debug.debug("[Extend]  " + source.display_name, 3)
+        source.handler(self, para_in.data)
+        self.insert_source_event(para_in.source)
 
     def submit(self, job_index: int):
         """Submit the job by calling the corresponding method in job_trace module."""
         self.debug.debug("[Submit]  " + str(job_index), 3)
         self.module.job.job_submit(job_index)
+        if self.wait_min_proc is not None:
+            self.wait_min_proc = min(
+                self.wait_min_proc,
+                self.module.job.job_info(job_index).requested_number_processors,
+            )
 
     def finish(self, job_index: int):
         """
@@ -299,6 +532,8 @@ class Cqsim:
             self.current_time + self.module.job.job_info(job_index).requested_time,
         )
         self.module.job.job_start(job_index, self.current_time)
+        # the started job may have been the smallest one
+        self.wait_min_proc = None
         event = Event(
             EventType.JOB,
             self.current_time + self.module.job.job_info(job_index).run_time,
@@ -309,79 +544,79 @@ class Cqsim:
 
     def score_calculate(self):
         """Calculate the scores of waiting job after the event is done"""
-        wait_jobs = [self.module.job.job_info(i) for i in self.module.job.wait_list()]
-        score_list = self.module.alg.get_score(wait_jobs, self.current_time)
+        if self.module.alg.order_key is not None:
+            # the job trace keeps the wait queue in the order of the scores
+            return
+        wait_list = self.module.job.wait_list()
+        columns = self.module.job.job_columns(wait_list, SCORE_FIELDS)
+        score_list = self.module.alg.get_score(None, self.current_time, columns=columns)
         self.module.job.refresh_score(score_list)
 
     def start_scan(self):
         """Call the start scan method group: window - start new job - backfill"""
+        if not self.can_start_any():
+            # Neither the start loop nor backfill can start a job that does
+            # not fit in the available cores, and the window only reorders.
+            self.skipped_scans += 1
+            return
+
         start_max = self.module.win.start_num()
         wait_list = self.module.job.wait_list()
         win_count = start_max
 
-        for job_index in wait_list:
+        # Starting a job once removed it from the list being looped over, so
+        # the loop skipped the job after it: the jobs are tried every other
+        # one. A started job now stays in the list until the next wait_list.
+        for job_index in itertools.islice(wait_list, 0, None, 2):
             if win_count >= start_max:
                 win_count = 0
-                wait_list = self.start_window(wait_list)
+                wait_list = self.start_window()
             # print "....  ", temp_wait[i]
             job = self.module.job.job_info(job_index)
             if self.module.node.is_available(job.requested_number_processors):
                 self.start(job_index)
             else:
-                wait_list = self.module.job.wait_list()
-                self.backfill(wait_list)
+                if self.can_start_any():
+                    self.backfill()
+                else:
+                    self.skipped_backfills += 1
                 break
             win_count += 1
 
-    def start_window(self, job_indices: list[int]):
+    def can_start_any(self):
+        """Whether any waiting job requests no more than the available cores."""
+        wait_list = self.module.job.wait_list()
+        if not wait_list:
+            return False
+        if self.wait_min_proc is None:
+            procs = self.module.job.job_columns(
+                wait_list, ("requested_number_processors",)
+            )["requested_number_processors"]
+            self.wait_min_proc = int(procs.min())
+        return self.module.node.is_available(self.wait_min_proc)
+
+    def start_window(self):
         """
-        Call the window function to modify the order of the waiting job.
+        Call the window function to modify the order of the head of the wait queue.
 
         :return: the new reorder list.
         """
         win_size = self.module.win.window_size()
-        targets, keeps = job_indices[:win_size], job_indices[win_size:]
-
-        wait_jobs: list[WaitInfo] = []
-        for job_index in targets:
-            job = self.module.job.job_info(job_index)
-            wait_jobs.append(
-                WaitInfo(
-                    index=job_index,
-                    proc=job.requested_number_processors,
-                    node=job.requested_number_processors,
-                    run=job.run_time,
-                    score=job.score,
-                )
-            )
-
+        keeps = self.module.job.wait_list()[win_size:]
         targets = self.module.win.start_window(
-            wait_jobs, BackfillPara(time=self.current_time)
+            self.module.job.wait_view(), BackfillPara(time=self.current_time)
         )
 
         return targets + keeps
 
-    def backfill(self, waiting_jobs: list[int]):
+    def backfill(self):
         """
         Call the backfill function and get the backfill job list, then start these jobs.
 
-        :param wait_list: the waiting job list.
         :return: True if any job is started, False otherwise.
         """
-        wait_info: list[WaitInfo] = []
-        for index in waiting_jobs:
-            job = self.module.job.job_info(index)
-            wait_info.append(
-                WaitInfo(
-                    index=index,
-                    proc=job.requested_number_processors,
-                    node=job.requested_number_processors,
-                    run=job.run_time,
-                    score=job.score,
-                )
-            )
         backfill_list = self.module.backfill.backfill(
-            wait_info, BackfillPara(time=self.current_time)
+            self.module.job.wait_view(), BackfillPara(time=self.current_time)
         )
 
         if backfill_list is None:
@@ -399,8 +634,9 @@ class Cqsim:
         :param current_event: the current event
         """
         temp_inter = 0
-        if len(self.event_seq) > 0:
-            temp_inter = self.event_seq[0].time - self.current_time
+        next_time = self.next_event_time()
+        if next_time is not None:
+            temp_inter = next_time - self.current_time
 
         event_code: Optional[EventCode] = None
         if current_event.type == EventType.JOB:
@@ -0,0 +1,261 @@
+"""
+Event queue backends for CQSim
+"""
+
+import bisect
+import heapq
+from enum import Enum
+from typing import Optional
+
+from cqsim.cqsim.types import Event, EventType
+from cqsim.types import Time
+
+
+class EventQueueMode(Enum):
+    LIST = 1
+    HEAP = 2
+    CALENDAR = 3
+
+
+class EventQueue:
+    """
+    A sequence of pending events, ordered as tuples, see `Event`.
+
+    The head of the queue is always the next event to be processed.
+    """
+
+    display_name: str
+
+    def __len__(self) -> int:
+        raise NotImplementedError
+
+    def __bool__(self):
+        return len(self) > 0
+
+    def reset(self):
+        raise NotImplementedError
+
+    def push(self, event: Event, index: Optional[int] = None):
+        """
+        Insert an event into the queue.
+
+        :param index: a position hint used by the list backend, ignored by the others.
+        """
+        raise NotImplementedError
+
+    def pop(self) -> Event:
+        """Remove and return the next event."""
+        raise NotImplementedError
+
+    def peek(self) -> Event:
+        """Return the next event without removing it."""
+        raise NotImplementedError
+
+
+class ListEventQueue(EventQueue):
+    """
+    The original sorted list. Insert and pop are O(n).
+
+    Events pushed with an explicit index are placed at that position,
+    which is how monitor events have always been inserted.
+    """
+
+    events: list[Event]
+
+    def __init__(self):
+        self.display_name = "List Event Queue"
+        self.reset()
+
+    def __len__(self):
+        return len(self.events)
+
+    def reset(self):
+        self.events = []
+
+    def push(self, event: Event, index: Optional[int] = None):
+        if index is None:
+            index = bisect.bisect_right(self.events, event)
+
+        if index >= len(self.events):
+            self.events.append(event)
+        else:
+            self.events.insert(index, event)
+
+    def pop(self):
+        return self.events.pop(0)
+
+    def peek(self):
+        return self.events[0]
+
+
+class HeapEventQueue(EventQueue):
+    """A binary heap. Insert and pop are O(log n)."""
+
+    events: list[Event]
+
+    def __init__(self):
+        self.display_name = "Heap Event Queue"
+        self.reset()
+
+    def __len__(self):
+        return len(self.events)
+
+    def reset(self):
+        self.events = []
+
+    def push(self, event: Event, index: Optional[int] = None):
+        heapq.heappush(self.events, event)
+
+    def pop(self):
+        return heapq.heappop(self.events)
+
+    def peek(self):
+        return self.events[0]
+
+
+class CalendarEventQueue(EventQueue):
+    """
+    A calendar queue (R. Brown, 1988). Insert and pop are amortised O(1).
+
+    Events are hashed by time into `nbuckets` buckets of `width` seconds, which
+    wrap around like the days of a year; each bucket is a short sorted list.
+    The queue scans forward from the bucket of the last popped event.
+    Whenever the number of events grows past twice, or shrinks below half, the
+    number of buckets, the buckets are rebuilt and the width is set from the
+    gaps between the next events, i.e. the inter-arrival times of the trace.
+    """
+
+    MIN_BUCKETS = 2
+    # Number of events at the head of the queue used to choose the width
+    SAMPLE_SIZE = 25
+
+    buckets: list[list[Event]]
+    nbuckets: int
+    width: float
+    # Absolute number (time // width) of the bucket the scan is at
+    current: int
+    size: int
+
+    def __init__(self, width: float = 1.0):
+        self.display_name = "Calendar Event Queue"
+        self.initial_width = width
+        self.reset()
+
+    def __len__(self):
+        return self.size
+
+    def reset(self):
+        self.nbuckets = self.MIN_BUCKETS
+        self.width = self.initial_width
+        self.buckets = [[] for _ in range(self.nbuckets)]
+        self.current = 0
+        self.size = 0
+
+    def push(self, event: Event, index: Optional[int] = None):
+        # event[0] is event.time, without the property lookup on the hot path
+        number = int(event[0] // self.width)
+        bisect.insort_right(self.buckets[number % self.nbuckets], event)
+        if self.size == 0 or number < self.current:
+            self.current = number
+        self.size += 1
+        if self.size > 2 * self.nbuckets:
+            self.resize(2 * self.nbuckets)
+
+    def pop(self):
+        bucket = self.find()
+        event = bucket.pop(0)
+        self.size -= 1
+        if self.size < self.nbuckets // 2 and self.nbuckets > self.MIN_BUCKETS:
+            self.resize(self.nbuckets // 2)
+        return event
+
+    def peek(self):
+        return self.find()[0]
+
+    def find(self):
+        """Move the scan to the bucket of the next event, and return that bucket."""
+        if self.size == 0:
+            raise IndexError("peek from an empty event queue")
+        width, nbuckets, buckets = self.width, self.nbuckets, self.buckets
+        for number in range(self.current, self.current + nbuckets):
+            bucket = buckets[number % nbuckets]
+            # events of a later year hashed into the same bucket are skipped
+            if bucket and bucket[0][0] // width <= number:
+                self.current = number
+                return bucket
+        # a whole year without events: jump straight to the earliest one
+        bucket = min((b for b in buckets if b), key=lambda b: b[0])
+        self.current = int(bucket[0][0] // width)
+        return bucket
+
+    def resize(self, nbuckets: int):
+        events = [event for bucket in self.buckets for event in bucket]
+        self.width = self.sample_width(events)
+        self.nbuckets = nbuckets
+        self.buckets = [[] for _ in range(nbuckets)]
+        self.size = 0
+        for event in events:
+            self.push(event)
+
+    def sample_width(self, events: list[Event]):
+        """Three times the average gap between the next events, ignoring outliers."""
+        sample = heapq.nsmallest(self.SAMPLE_SIZE, events)
+        gaps = [b.time - a.time for a, b in zip(sample, sample[1:])]
+        if not gaps:
+            return self.width
+        average = sum(gaps) / len(gaps)
+        gaps = [gap for gap in gaps if gap <= 2 * average]
+        average = sum(gaps) / len(gaps)
+        if average <= 0:
+            return self.width
+        return 3 * average
+
+
+class MonitorTimer:
+    """
+    A periodic source of monitor events.
+
+    Instead of inserting every tick into the event queue, the timer only keeps the
+    time of its next tick, and the simulator pops it when it is due.
+    """
+
+    interval: int
+    next_time: Optional[Time]
+
+    def __init__(self, interval: int):
+        self.display_name = "Monitor Timer"
+        self.interval = interval
+        self.reset()
+
+    def reset(self):
+        self.next_time = None
+
+    def started(self):
+        return self.next_time is not None
+
+    def start(self, time: Time):
+        """Schedule the first tick at the first multiple of the interval not before time."""
+        next_time = int(time // self.interval) * self.interval
+        if next_time < time:
+            next_time += self.interval
+        self.next_time = next_time
+
+    def due(self, time: Time):
+        """Whether the next tick comes before an event at time."""
+        return self.next_time is not None and self.next_time < time
+
+    def pop(self):
+        assert self.next_time is not None
+        event = Event(EventType.MONITOR, self.next_time, 5, None)
+        self.next_time += self.interval
+        return event
+
+
+def create_event_queue(mode: EventQueueMode) -> EventQueue:
+    if mode == EventQueueMode.LIST:
+        return ListEventQueue()
+    elif mode == EventQueueMode.HEAP:
+        return HeapEventQueue()
+    elif mode == EventQueueMode.CALENDAR:
+        return CalendarEventQueue()
+    raise ValueError(f"Unknown event queue mode {mode}")
@@ -0,0 +1,74 @@
+"""
+Extension event sources for CQSim
+"""
+
+from __future__ import annotations
+
+import itertools
+from typing import TYPE_CHECKING, Any, Callable, Iterable, Optional
+
+from cqsim.cqsim.types import Event, EventType, ExtendPara
+from cqsim.types import Time
+
+if TYPE_CHECKING:
+    from cqsim.cqsim.cqsim import Cqsim
+
+
+class EventSource:
+    """
+    A lazy source of extension events, such as node failures or price changes.
+
+    `events` yields `(time, data)` pairs in time order, e.g. from a generator.
+    Only the next event of the source is in the event queue at a time, so a
+    source of any length costs the memory of a single event.
+    When the simulation reaches an event, `handler(sim, data)` is called.
+    """
+
+    events: Iterable[tuple[Time, Any]]
+    handler: Callable[[Cqsim, Any], None]
+    prio: int
+    # Number of events taken from `events`, the pending one included
+    consumed: int
+    last_time: Optional[Time]
+
+    def __init__(
+        self,
+        events: Iterable[tuple[Time, Any]],
+        handler: Callable[[Cqsim, Any], None],
+        name: str = "Event Source",
+        prio: int = 3,
+    ):
+        """
+        :param prio: the priority of the events, against the other events at the
+            same time. Job submit events are 2, job finish events 1, monitor events 5.
+        """
+        self.display_name = name
+        self.events = iter(events)
+        self.handler = handler
+        self.prio = prio
+        self.consumed = 0
+        self.last_time = None
+
+    def next_event(self, source: int):
+        """
+        Take the next event of the source, None if it is exhausted.
+
+        :param source: the index of the source in the simulator.
+        """
+        item = next(self.events, None)  # type: ignore
+        if item is None:
+            return None
+        time, data = item
+        if self.last_time is not None and time < self.last_time:
+            raise ValueError(
+                f"{self.display_name}: event at {time} after an event at {self.last_time}"
+            )
+        self.consumed += 1
+        self.last_time = time
+        return Event(EventType.EXTEND, time, self.prio, ExtendPara(source, data))
+
+    def skip(self, count: int):
+        """Drop the first `count` events, which a resumed checkpoint already has."""
+        for time, data in itertools.islice(self.events, count):
+            self.consumed += 1
+            self.last_time = time
@@ -0,0 +1,273 @@
+"""
+Columnar job store for CQSim
+
+The jobs of a trace are kept as NumPy arrays, one per field of a record dataclass
+(`JobTraceInfo`), indexed by the job index. A job takes a few dozen bytes
+instead of a dataclass instance, and a field of many jobs is a single array.
+"""
+
+import dataclasses
+from enum import Enum
+from typing import Any, Callable, Iterable, Optional, Union, get_args, get_origin
+
+import numpy as np
+
+from cqsim.utils import dataclass_types, dataclass_types_for_pandas
+
+
+class JobStoreMode(Enum):
+    DICT = 1
+    COLUMNAR = 2
+
+
+class CategoryColumn:
+    """
+    Repeated values stored as small integer codes into the distinct values.
+
+    The codes are 16 bits wide until there are more distinct values than that.
+    """
+
+    values: list[Any]
+    lookup: dict[Any, int]
+
+    def __init__(self):
+        self.values = []
+        self.lookup = {}
+
+    def code(self, value: Any):
+        code = self.lookup.get(value)
+        if code is None:
+            code = len(self.values)
+            self.lookup[value] = code
+            self.values.append(value)
+        return code
+
+    def dtype(self):
+        return np.uint16 if len(self.values) <= 1 << 16 else np.uint32
+
+
+class JobRow:
+    """
+    A view of one job of a `JobStore`, read and written like the record itself.
+
+    Pickling a row (in a checkpoint) pickles a copy of the record, not the store.
+    """
+
+    __slots__ = ("store", "index")
+
+    store: "JobStore"
+    index: int
+
+    def __init__(self, store: "JobStore", index: int):
+        object.__setattr__(self, "store", store)
+        object.__setattr__(self, "index", index)
+
+    def __getattr__(self, name: str):
+        if name not in self.store.columns:
+            # as for any object, so that getattr with a default and copy work
+            raise AttributeError(name)
+        return self.store.get(self.index, name)
+
+    def __setattr__(self, name: str, value: Any):
+        self.store.set(self.index, name, value)
+
+    def record(self):
+        """A copy of the job as a record instance."""
+        return self.store.record(
+            **{name: self.store.get(self.index, name) for name in self.store.fields}
+        )
+
+    def __reduce__(self):
+        return self.record().__reduce__()
+
+    def __repr__(self):
+        return "JobRow(" + str(self.index) + ", " + repr(self.record()) + ")"
+
+
+class JobStore:
+    """
+    The jobs of a trace as NumPy columns, indexed by job index.
+
+    Used like the `dict[int, JobTraceInfo]` of `JobTrace`: `store[index]` is a
+    `JobRow` view of the job, `pop` removes a job. A removed job keeps its row,
+    so the views already handed out stay valid.
+
+    Each field gets the column type of its annotation: int and float fields are
+    64 bits, enum fields are 8 bits holding the enum value, and an Optional
+    float field stores None as NaN. `dtypes` narrows the type of given fields,
+    and the fields of `categories` are stored as `CategoryColumn` codes.
+    """
+
+    fields: list[str]
+    defaults: dict[str, Any]
+    columns: dict[str, np.ndarray]
+    categories: dict[str, CategoryColumn]
+    enums: dict[str, type[Enum]]
+    optionals: set[str]
+    # Whether each row holds a job which has not been removed
+    live: np.ndarray
+    # Number of rows in use, that is the largest job index plus one
+    size: int
+    # Number of jobs not removed
+    count: int
+
+    def __init__(
+        self,
+        record: type,
+        dtypes: Optional[dict[str, Any]] = None,
+        categories: Iterable[str] = (),
+        capacity: int = 1024,
+    ):
+        self.record = record
+        self.fields = [field.name for field in dataclasses.fields(record)]
+        self.defaults = {
+            field.name: field.default
+            for field in dataclasses.fields(record)
+            if field.default is not dataclasses.MISSING
+        }
+        self.categories = {name: CategoryColumn() for name in categories}
+        self.enums = {}
+        self.optionals = set()
+        self.column_types: dict[str, Any] = {}
+
+        for name, field_type in dataclass_types(record).items():
+            if get_origin(field_type) == Union and type(None) in get_args(field_type):
+                self.optionals.add(name)
+        for name, field_type in dataclass_types_for_pandas(record).items():
+            if name in self.categories:
+                self.column_types[name] = np.uint16
+            elif isinstance(field_type, type) and issubclass(field_type, Enum):
+                self.enums[name] = field_type
+                self.column_types[name] = np.int8
+            elif field_type is int:
+                self.column_types[name] = np.int64
+            else:
+                self.column_types[name] = np.float64
+        self.column_types |= dtypes or {}
+        self.decoders = {name: self.decoder(name) for name in self.fields}
+
+        self.columns = {
+            name: np.empty(capacity, dtype=dtype)
+            for name, dtype in self.column_types.items()
+        }
+        self.live = np.zeros(capacity, dtype=bool)
+        self.size = 0
+        self.count = 0
+
+    def __len__(self):
+        return self.count
+
+    def __contains__(self, index: int):
+        return 0 <= index < self.size and bool(self.live[index])
+
+    def __getitem__(self, index: int):
+        if not (0 <= index < self.size and self.live[index]):
+            raise KeyError(index)
+        return JobRow(self, index)
+
+    def __setitem__(self, index: int, job: Any):
+        """Store a job, from any object with the fields as attributes."""
+        self.reserve(index + 1)
+        for name in self.fields:
+            self.set(index, name, getattr(job, name, self.defaults.get(name)))
+        if not self.live[index]:
+            self.live[index] = True
+            self.count += 1
+        self.size = max(self.size, index + 1)
+
+    def pop(self, index: int):
+        row = self[index]
+        self.live[index] = False
+        self.count -= 1
+        return row
+
+    def extend(self, size: int):
+        """Take the rows up to `size` in use, those not stored yet as removed jobs."""
+        self.reserve(size)
+        self.size = max(self.size, size)
+
+    def reserve(self, size: int):
+        """Grow the columns to hold at least `size` rows, doubling them."""
+        capacity = len(self.live)
+        if size <= capacity:
+            return
+        capacity = max(size, 2 * capacity)
+        for name, column in self.columns.items():
+            grown = np.empty(capacity, dtype=column.dtype)
+            grown[: self.size] = column[: self.size]
+            self.columns[name] = grown
+        live = np.zeros(capacity, dtype=bool)
+        live[: self.size] = self.live[: self.size]
+        self.live = live
+
+    def append(self, jobs: Iterable[Any]):
+        """
+        Store jobs after the last row, a column at a time.
+
+        :return: the indices of the jobs.
+        """
+        jobs = list(jobs)
+        start, end = self.size, self.size + len(jobs)
+        self.reserve(end)
+        for name in self.fields:
+            default = self.defaults.get(name)
+            values = [getattr(job, name, default) for job in jobs]
+            self.columns[name][start:end] = self.encode(name, values)
+        self.live[start:end] = True
+        self.size = end
+        self.count += len(jobs)
+        return list(range(start, end))
+
+    def encode(self, name: str, values: list[Any]):
+        if name in self.categories:
+            category = self.categories[name]
+            codes = [category.code(value) for value in values]
+            self.widen(name)
+            return codes
+        if name in self.enums:
+            return [value.value for value in values]
+        if name in self.optionals:
+            return [np.nan if value is None else value for value in values]
+        return values
+
+    def widen(self, name: str):
+        dtype = self.categories[name].dtype()
+        if self.columns[name].dtype != dtype:
+            self.columns[name] = self.columns[name].astype(dtype)
+
+    def get(self, index: int, name: str):
+        value = self.columns[name][index].item()
+        decode = self.decoders[name]
+        return value if decode is None else decode(value)
+
+    def decoder(self, name: str) -> Optional[Callable[[Any], Any]]:
+        """The function turning the column value of a field back into its value."""
+        if name in self.categories:
+            return self.categories[name].values.__getitem__
+        if name in self.enums:
+            return self.enums[name]
+        if name in self.optionals:
+            return lambda value: None if value != value else value
+        return None
+
+    def set(self, index: int, name: str, value: Any):
+        self.columns[name][index] = self.encode(name, [value])[0]
+
+    def column(self, name: str, indices: Optional[Iterable[int]] = None):
+        """
+        The values of a field for the given jobs (all rows by default), as an array.
+
+        Category fields are decoded, enum fields are left as their values.
+        """
+        if indices is None:
+            values = self.columns[name][: self.size]
+        else:
+            values = self.columns[name][np.fromiter(indices, dtype=np.int64)]
+        if name in self.categories:
+            return np.asarray(self.categories[name].values)[values]
+        return values
+
+    def nbytes(self):
+        """Bytes taken by the rows in use."""
+        per_row = sum(column.itemsize for column in self.columns.values()) + 1
+        return per_row * self.size
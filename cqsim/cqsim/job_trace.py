@@ -1,11 +1,17 @@
+import bisect
+import copy
+import itertools
 import json
 from dataclasses import dataclass
 from enum import Enum
-from typing import Optional
+from typing import Any, Callable, Iterable, Iterator, Optional
 
+import numpy as np
 import pandas as pd
 
-from cqsim.cqsim.types import Job
+from cqsim.cqsim.job_store import JobStore, JobStoreMode
+from cqsim.cqsim.types import Job, scale_submit_time
+from cqsim.cqsim.wait_queue import WaitQueue, unsorted_range
 from cqsim.extend import swf
 from cqsim.extend.swf.format import SWFLoader
 from cqsim.filter.job import ConfigData
@@ -72,15 +78,58 @@ class JobTraceInfo:
         )
 
 
+# XREF: JobStore
+JOB_STORE_DTYPES = {
+    "id": np.int32,
+    "average_cpu_time": np.float32,
+    "used_memory": np.float32,
+    "requested_memory": np.float32,
+    "allocated_processors": np.int32,
+    "requested_number_processors": np.int32,
+    "status": np.int8,
+    "executable_number": np.int32,
+    "queue_number": np.int32,
+    "partition_number": np.int32,
+    "previous_job_id": np.int32,
+    "think_time_from_previous_job": np.int32,
+    "happy": np.int8,
+    # the wait queue keeps the scores at full precision
+    "score": np.float32,
+}
+JOB_STORE_CATEGORIES = ("user_id", "group_id")
+
+
 class JobTrace:
-    traces: dict[int, JobTraceInfo]
+    # The jobs by index; a JobStore of JobRow views in columnar mode
+    traces: dict[int, JobTraceInfo] | JobStore
+    store_mode: JobStoreMode
 
+    # The waiting jobs in order; a job started is left as -1 until compact_wait
     wait_indices: list[int]
-    submit_indices: list[int]
-    run_indices: list[int]
-
+    wait_started: int
+    # The position of each job in wait_indices, when ordered by refresh_score
+    wait_positions: dict[int, int]
+    # Insertion ordered sets of job indices, so that a job leaves them in O(1)
+    submit_indices: dict[int, None]
+    run_indices: dict[int, None]
+
+    # Key keeping wait_indices in order as jobs are submitted, see set_wait_order
+    wait_order: Optional[Callable[[JobTraceInfo], Any]]
+    # The (key, submit sequence) of each job of wait_indices, in the same order
+    wait_keys: list[tuple[Any, int]]
+    # The same keys by job index, to find a job in wait_indices by bisection
+    wait_job_keys: dict[int, tuple[Any, int]]
+    wait_seq: int
+    # The columns of the jobs of wait_indices, for the window and backfill
+    wait_queue: WaitQueue
+
+    # The submit time of the first job read, from which `density` scales the others
     min_submit_time: Optional[Time]
     swf_loader: SWFLoader
+    job_file: Optional[str]
+    stream: bool
+    # Remaining chunks of the job file when jobs are streamed, None otherwise
+    job_reader: Optional[Iterator[list[Job]]]
 
     def __init__(
         self,
@@ -90,6 +139,7 @@ class JobTrace:
         density: float,  # 1.0
         read_input_freq: int,  # 1000
         debug: DebugLog,
+        store: int = 1,
     ):
         self.display_name = "Job Trace"
         self.start = start
@@ -100,9 +150,14 @@ class JobTrace:
         self.read_count: int | None = num
         self.density = density
         self.debug = debug
-        self.traces = dict()
+        self.store_mode = JobStoreMode(store)
+        self.traces = self.new_traces()
         self.read_input_freq = read_input_freq
         self.num_delete_jobs = 0
+        self.job_file = None
+        self.stream = False
+        self.job_reader = None
+        self.wait_order = None
 
         self.debug.line(4, " ")
         self.debug.line(4, "#")
@@ -119,6 +174,7 @@ class JobTrace:
         density: Optional[float] = None,
         read_input_freq: Optional[int] = None,
         debug: Optional[DebugLog] = None,
+        store: Optional[int] = None,
     ):
         # self.debug.debug("* "+self.display_name+" -- reset",5)
         if start:
@@ -135,30 +191,127 @@ class JobTrace:
             self.debug = debug
         if read_input_freq:
             self.read_input_freq = read_input_freq
-        self.traces = dict()
+        if store:
+            self.store_mode = JobStoreMode(store)
+        self.traces = self.new_traces()
+        self.job_reader = None
         self.reset_data()
 
+    def new_traces(self) -> dict[int, JobTraceInfo] | JobStore:
+        if self.store_mode == JobStoreMode.COLUMNAR:
+            return JobStore(
+                JobTraceInfo, dtypes=JOB_STORE_DTYPES, categories=JOB_STORE_CATEGORIES
+            )
+        return dict()
+
     def reset_data(self):
         # self.debug.debug("* "+self.display_name+" -- reset_data",5)
         self.job_wait_cores = 0
-        self.submit_indices = []
+        self.submit_indices = {}
         self.wait_indices = []
-        self.run_indices = []
+        self.wait_started = 0
+        self.wait_positions = {}
+        self.wait_keys = []
+        self.wait_job_keys = {}
+        self.wait_seq = 0
+        self.wait_queue = WaitQueue()
+        self.min_submit_time = None
+        self.run_indices = {}
         # self.job_done_list=[]
         self.num_delete_jobs = 0
 
     # TODO: read file is still a mess
 
-    def import_job_file(self, job_file: str):
+    def import_job_file(self, job_file: str, stream: bool = False):
+        """
+        Read the formatted job file.
+
+        With `stream`, only open the file here; jobs are then read
+        `read_input_freq` at a time by `read_job_chunk`.
+        """
         assert self.anchor >= 0
+        self.job_file = job_file
+        self.stream = stream
+        if stream:
+            self.open_job_reader()
+            return
+
         # read job file
         jobs = swf.load_jobs(
             job_file, swf=False, skiprows=self.anchor, nrows=self.read_count
         )
         # set job list
+        self.add_jobs(jobs)
+
+    def open_job_reader(self, skip: int = 0):
+        """Start streaming the job file, after the first `skip` jobs."""
+        assert self.job_file is not None
+        skiprows: int | Callable[[int], bool] = self.anchor
+        nrows = self.read_count
+        if skip:
+            anchor = self.anchor
+            # the line right after the anchor lines is read as the header
+            skiprows = lambda i: i < anchor or anchor < i <= anchor + skip
+            if nrows is not None:
+                nrows = max(nrows - skip, 0)
+        self.job_reader = swf.load_jobs_chunks(
+            self.job_file,
+            swf=False,
+            chunksize=self.read_input_freq,
+            skiprows=skiprows,
+            nrows=nrows,
+        )
+
+    def read_job_chunk(self):
+        """
+        Read the next chunk of a streamed job file.
+
+        :return: the indices of the newly read jobs, empty if the file is exhausted.
+        """
+        if self.job_reader is None:
+            return []
+        jobs = next(self.job_reader, None)
+        if jobs is None:
+            self.job_reader = None
+            return []
+        return self.add_jobs(jobs)
+
+    def read_done(self):
+        """Whether every job of the job file has been read."""
+        return self.job_reader is None
+
+    def scale_jobs(self, jobs: Iterable[Job]) -> Iterable[Job]:
+        """
+        The jobs with the time from the first job read to their submission
+        multiplied by `density`, the jobs read untouched.
+        """
+        if self.density == 1.0:
+            return jobs
+        jobs = [copy.copy(job) for job in jobs]
+        if jobs and self.min_submit_time is None:
+            self.min_submit_time = jobs[0].submit_time
+        if self.min_submit_time is not None:
+            origin = self.min_submit_time
+            scale_submit_time(jobs, origin, self.density, origin)
+        return jobs
+
+    def add_jobs(self, jobs: Iterable[Job]):
+        jobs = self.scale_jobs(jobs)
+        if isinstance(self.traces, JobStore):
+            # finished jobs keep their rows, so the next index is the size
+            assert self.traces.size == self.job_info_len()
+            indices = self.traces.append(jobs)
+            self.submit_indices.update(dict.fromkeys(indices))
+            return indices
+
+        indices: list[int] = []
         for job in jobs:
-            self.traces[len(self.traces)] = JobTraceInfo.from_job(job)
-            self.submit_indices.append(len(self.traces) - 1)
+            # finished jobs are removed from traces, so count them in
+            index = self.job_info_len()
+            self.traces[index] = JobTraceInfo.from_job(job)
+            self.submit_indices[index] = None
+            indices.append(index)
+        return indices
 
     # XREF: JobFilterSWF.output_job_config()
     def import_job_config(self, config_file: str):
@@ -170,15 +323,49 @@ class JobTrace:
 
     def submit_list(self):
         # self.debug.debug("* "+self.display_name+" -- submit_list",6)
-        return self.submit_indices
+        return self.submit_indices.keys()
 
     def wait_list(self):
         # self.debug.debug("* "+self.display_name+" -- wait_list",6)
+        self.compact_wait()
         return self.wait_indices
 
+    def wait_view(self):
+        """The wait queue as columns, see `WaitQueue`."""
+        self.compact_wait()
+        return self.wait_queue
+
     def run_list(self):
         # self.debug.debug("* "+self.display_name+" -- run_list",6)
-        return self.run_indices
+        return self.run_indices.keys()
+
+    def compact_wait(self):
+        """
+        Remove the jobs started from the wait queue.
+
+        The list is replaced, not changed: a loop over the list of an earlier
+        `wait_list` sees the jobs at their positions then.
+        """
+        if not self.wait_started:
+            return
+        kept = self.wait_queue.compress()
+        self.wait_indices = self.wait_queue.indices.tolist()
+        self.wait_started = 0
+        if self.wait_order is None:
+            self.index_wait_positions()
+        else:
+            self.wait_keys = list(itertools.compress(self.wait_keys, kept.tolist()))
+
+    def index_wait_positions(self):
+        self.wait_positions = dict(
+            zip(self.wait_indices, range(len(self.wait_indices)))
+        )
+
+    def wait_position(self, job_index: int):
+        """The position of a waiting job in wait_indices."""
+        if self.wait_order is None:
+            return self.wait_positions[job_index]
+        return bisect.bisect_left(self.wait_keys, self.wait_job_keys[job_index])
 
     """
     def done_list (self):
@@ -190,11 +377,70 @@ class JobTrace:
         # self.debug.debug("* "+self.display_name+" -- wait_size",6)
         return self.job_wait_cores
 
+    def set_wait_order(self, key: Optional[Callable[[JobTraceInfo], Any]]):
+        """
+        Keep the wait queue sorted by `key`, then by submission, as jobs are submitted.
+
+        The queue no longer needs `refresh_score`. None goes back to sorting
+        it by the scores of `refresh_score`.
+        """
+        self.compact_wait()
+        self.wait_order = key
+        self.wait_keys = []
+        self.wait_job_keys = {}
+        if key is None:
+            self.index_wait_positions()
+            return
+        # the current order breaks the ties, as the stable sort by score does
+        self.wait_keys = [
+            (key(self.traces[index]), seq)
+            for seq, index in enumerate(self.wait_indices)
+        ]
+        self.wait_seq = len(self.wait_keys)
+        order = sorted(range(len(self.wait_keys)), key=self.wait_keys.__getitem__)
+        self.wait_indices[:] = [self.wait_indices[i] for i in order]
+        self.wait_keys = [self.wait_keys[i] for i in order]
+        self.wait_job_keys = dict(zip(self.wait_indices, self.wait_keys))
+        self.wait_queue.reorder(order)
+
     def refresh_score(self, scores: list[float]):
+        """
+        Set the scores of the waiting jobs, in queue order, and sort the queue by them.
+
+        The queue is left in the order of a stable sort by descending score,
+        as list.sort(reverse=True) gives. Only the jobs which passed others
+        since the last refresh move. The scores are kept in the wait queue,
+        the job of each getting its score as it starts.
+        """
         # self.debug.debug("* "+self.display_name+" -- refresh_score",5)
-        for index, score in zip(self.wait_indices, scores):
-            self.traces[index].score = score
-        self.wait_indices.sort(key=lambda x: self.traces[x].score, reverse=True)
+        self.compact_wait()
+        if not len(scores):
+            return
+        scores = np.asarray(scores, dtype=float)
+        self.wait_queue.scores[:] = scores
+        span = unsorted_range(scores)
+        if span is None:
+            return
+        lo, hi = span
+        order = lo + np.argsort(-scores[lo:hi], kind="stable")
+        moved = np.flatnonzero(order != np.arange(lo, hi))
+        jobs = [self.wait_indices[i] for i in order[moved].tolist()]
+        for position, job_index in zip((lo + moved).tolist(), jobs):
+            self.wait_indices[position] = job_index
+            self.wait_positions[job_index] = position
+        self.wait_queue.reorder(order, lo)
+
+    def rebuild_wait_queue(self):
+        self.wait_queue.clear()
+        for index in self.wait_indices:
+            self.wait_queue.append(*self.wait_row(index))
+        self.wait_started = 0
+        self.index_wait_positions()
+
+    def wait_row(self, job_index: int):
+        """The columns of a job in the wait queue."""
+        job = self.traces[job_index]
+        return job_index, job.requested_number_processors, job.run_time, job.score
 
     def job_infos(self):
         return self.traces
@@ -204,6 +450,13 @@ class JobTrace:
         assert job_index >= 0
         return self.traces[job_index]
 
+    def job_columns(self, job_indices: list[int], names: Iterable[str]):
+        """The values of the given fields for the given jobs, as arrays by field name."""
+        if isinstance(self.traces, JobStore):
+            return {name: self.traces.column(name, job_indices) for name in names}
+        jobs = [self.traces[i] for i in job_indices]
+        return {name: np.array([getattr(job, name) for job in jobs]) for name in names}
+
     def job_info_len(self):
         return len(self.traces) + self.num_delete_jobs
 
@@ -214,8 +467,19 @@ class JobTrace:
         self.traces[job_index].state = JobState.SUBMIT
         self.traces[job_index].score = job_score
         self.traces[job_index].estimated_start_time = job_est_start
-        self.submit_indices.remove(job_index)
-        self.wait_indices.append(job_index)
+        del self.submit_indices[job_index]
+        if self.wait_order is None:
+            self.wait_positions[job_index] = len(self.wait_indices)
+            self.wait_indices.append(job_index)
+            self.wait_queue.append(*self.wait_row(job_index))
+        else:
+            wait_key = (self.wait_order(self.traces[job_index]), self.wait_seq)
+            self.wait_seq += 1
+            position = bisect.bisect_right(self.wait_keys, wait_key)
+            self.wait_keys.insert(position, wait_key)
+            self.wait_job_keys[job_index] = wait_key
+            self.wait_indices.insert(position, job_index)
+            self.wait_queue.insert(position, *self.wait_row(job_index))
         self.job_wait_cores += self.traces[job_index].requested_number_processors
 
     def job_start(self, job_index: int, time: Time):
@@ -236,8 +500,17 @@ class JobTrace:
         self.traces[job_index].start_time = time
         self.traces[job_index].wait_time = time - self.traces[job_index].submit_time
         self.traces[job_index].end_time = time + self.traces[job_index].run_time
-        self.wait_indices.remove(job_index)
-        self.run_indices.append(job_index)
+        position = self.wait_position(job_index)
+        if self.wait_order is None:
+            del self.wait_positions[job_index]
+            self.traces[job_index].score = self.wait_queue.scores[position].item()
+        else:
+            del self.wait_job_keys[job_index]
+        # left in place until compact_wait, see start_scan
+        self.wait_indices[position] = -1
+        self.wait_queue.drop(position)
+        self.wait_started += 1
+        self.run_indices[job_index] = None
         self.job_wait_cores -= self.traces[job_index].requested_number_processors
 
     def job_finish(self, job_index: int, time: Optional[Time] = None):
@@ -257,12 +530,64 @@ class JobTrace:
         self.traces[job_index].state = JobState.FINISH
         if time:
             self.traces[job_index].end_time = time
-        self.run_indices.remove(job_index)
+        del self.run_indices[job_index]
         # self.job_done_list.append(job_index)
         return 1
 
+    def get_state(self):
+        """
+        The job queues and the state of every job in them, for checkpoints.
+
+        Jobs not submitted yet are only saved when streaming: otherwise they are
+        read back unchanged from the job file.
+        """
+        self.compact_wait()
+        if self.wait_order is None:
+            # the scores of refresh_score are only in the wait queue
+            scores = self.wait_queue.scores.tolist()
+            for index, score in zip(self.wait_indices, scores):
+                self.traces[index].score = score
+        saved = self.wait_indices + list(self.run_indices)
+        if self.stream:
+            saved += list(self.submit_indices)
+        return {
+            "traces": {i: self.traces[i] for i in saved},
+            "submit_indices": list(self.submit_indices),
+            "wait_indices": self.wait_indices,
+            "run_indices": list(self.run_indices),
+            "job_wait_cores": self.job_wait_cores,
+            "num_delete_jobs": self.num_delete_jobs,
+            "read_done": self.read_done(),
+            "min_submit_time": self.min_submit_time,
+        }
+
+    def set_state(self, state: dict):
+        """Restore the state of `get_state` after the job file has been imported."""
+        traces = state["traces"]
+        if not self.stream:
+            traces |= {i: self.traces[i] for i in state["submit_indices"]}
+        self.traces = self.new_traces()
+        for i in sorted(traces):
+            self.traces[i] = traces[i]
+        self.submit_indices = dict.fromkeys(state["submit_indices"])
+        self.wait_indices = state["wait_indices"]
+        self.run_indices = dict.fromkeys(state["run_indices"])
+        self.job_wait_cores = state["job_wait_cores"]
+        self.num_delete_jobs = state["num_delete_jobs"]
+        self.min_submit_time = state["min_submit_time"]
+        if isinstance(self.traces, JobStore):
+            self.traces.extend(self.job_info_len())
+        self.rebuild_wait_queue()
+        self.set_wait_order(self.wait_order)
+        if not self.stream or state["read_done"]:
+            self.job_reader = None
+        else:
+            self.open_job_reader(skip=self.job_info_len())
+
     def job_set_score(self, job_index: int, job_score: float):
         self.traces[job_index].score = job_score
+        if self.traces[job_index].state == JobState.SUBMIT:
+            self.wait_queue.scores[self.wait_position(job_index)] = job_score
 
     def remove_job_from_dict(self, job_index: int):
         # TODO: so it must be a dict right?
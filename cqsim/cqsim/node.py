@@ -1,9 +1,10 @@
 import bisect
-import itertools
+import heapq
 import json
-from dataclasses import dataclass, field
-from typing import Callable, Optional
+from dataclasses import dataclass
+from typing import Callable, Iterable, Iterator, Optional, Union
 
+import numpy as np
 import pandas as pd
 from typing_extensions import reveal_type
 
@@ -19,14 +20,170 @@ class JobInfo:
     end: Time
 
 
+class JobAllocations:
+    """
+    The running jobs, indexed by job index and ordered by end time.
+
+    The order is kept in sorted buckets of at most 2 * LOAD jobs, with the
+    last key of each bucket to bisect them, so that adding and removing a job
+    is O(log n) plus the shift of one bucket. Jobs with the same end time stay
+    in the order they were added, as with `bisect.insort`.
+    """
+
+    LOAD = 256
+
+    # (end, sequence, job) triples, each bucket sorted, the buckets in order
+    buckets: list[list[tuple[Time, int, JobInfo]]]
+    # The (end, sequence) of the last job of each bucket
+    maxes: list[tuple[Time, int]]
+    # The (end, sequence) of each job, by job index
+    keys: dict[int, tuple[Time, int]]
+    seq: int
+
+    def __init__(self, jobs: Iterable[JobInfo] = ()):
+        self.buckets = []
+        self.maxes = []
+        self.keys = {}
+        self.seq = 0
+        for job in jobs:
+            self.add(job)
+
+    def __len__(self):
+        return len(self.keys)
+
+    def __contains__(self, job_index: int):
+        return job_index in self.keys
+
+    def __iter__(self) -> Iterator[JobInfo]:
+        for bucket in self.buckets:
+            for _, _, job in bucket:
+                yield job
+
+    def __repr__(self):
+        return "JobAllocations(" + repr(list(self)) + ")"
+
+    def add(self, job: JobInfo):
+        key = (job.end, self.seq)
+        self.seq += 1
+        self.keys[job.job] = key
+        if not self.buckets:
+            self.buckets.append([(*key, job)])
+            self.maxes.append(key)
+            return
+        i = bisect.bisect_left(self.maxes, key)
+        if i == len(self.maxes):
+            # after every job: at the end of the last bucket
+            i -= 1
+            self.maxes[i] = key
+        bucket = self.buckets[i]
+        bisect.insort(bucket, (*key, job))
+        if len(bucket) > 2 * self.LOAD:
+            self.buckets[i : i + 1] = [bucket[: self.LOAD], bucket[self.LOAD :]]
+            self.maxes[i : i + 1] = [bucket[self.LOAD - 1][:2], bucket[-1][:2]]
+
+    def pop(self, job_index: int):
+        """Remove a job by its index, and return it. KeyError if it is not running."""
+        key = self.keys.pop(job_index)
+        i = bisect.bisect_left(self.maxes, key)
+        bucket = self.buckets[i]
+        _, _, job = bucket.pop(bisect.bisect_left(bucket, key))
+        if not bucket:
+            del self.buckets[i]
+            del self.maxes[i]
+        else:
+            self.maxes[i] = bucket[-1][:2]
+        return job
+
+
+class NodeTable:
+    """
+    The allocation state of each node, as NumPy arrays indexed by node position.
+
+    The free nodes are kept in a heap, the lowest position first, and the
+    nodes of each job in a list, so that allocating and releasing a job is
+    O(cores of the job * log n) instead of a scan of all the nodes, and the
+    first free nodes are allocated as a scan would.
+    """
+
+    # Index of the job assigned to each node, -1 if free
+    state: np.ndarray
+    # Start and end time of the job assigned to each node, NaN if free
+    start: np.ndarray
+    end: np.ndarray
+    # Positions of the free nodes, as a heap
+    free: list[int]
+    # Positions of the nodes of each job, by job index
+    jobs: dict[int, list[int]]
+
+    def __init__(self, states: Union[Iterable[Optional[int]], np.ndarray] = ()):
+        """
+        :param states: the job index assigned to each node, -1 or None if free.
+        """
+        if not isinstance(states, np.ndarray):
+            states = [state if isinstance(state, int) else -1 for state in states]
+        self.state = np.array(states, dtype=np.int64)
+        self.start = np.full(len(self.state), np.nan)
+        self.end = np.full(len(self.state), np.nan)
+        # sorted, so already a heap
+        self.free = np.flatnonzero(self.state < 0).tolist()
+        self.jobs = {}
+        for i in np.flatnonzero(self.state >= 0).tolist():
+            self.jobs.setdefault(int(self.state[i]), []).append(i)
+
+    def __len__(self):
+        return len(self.state)
+
+    def allocate(self, job_index: int, cores: int, start: Time, end: Time):
+        """Assign the first `cores` free nodes to the job, and return them."""
+        assert cores <= len(self.free)
+        nodes = [heapq.heappop(self.free) for _ in range(cores)]
+        self.state[nodes] = job_index
+        self.start[nodes] = start
+        self.end[nodes] = end
+        self.jobs.setdefault(job_index, []).extend(nodes)
+        return nodes
+
+    def release(self, job_index: int):
+        """Free the nodes of the job, and return them (none if it has no nodes)."""
+        nodes = self.jobs.pop(job_index, [])
+        self.state[nodes] = -1
+        self.start[nodes] = np.nan
+        self.end[nodes] = np.nan
+        for node in nodes:
+            heapq.heappush(self.free, node)
+        return nodes
+
+    def job_nodes(self, job_index: int) -> list[int]:
+        return self.jobs.get(job_index, [])
+
+
+def find_first(values: np.ndarray, value: int, count: int):
+    """
+    The positions of the first `count` items equal to `value`.
+
+    The array is searched in chunks growing twice at a time, so that only the
+    part up to the last position found is read.
+    """
+    found = []
+    start, chunk = 0, max(count, 1024)
+    while count > 0 and start < len(values):
+        positions = np.flatnonzero(values[start : start + chunk] == value)[:count]
+        found.append(positions + start)
+        count -= len(positions)
+        start += chunk
+        chunk *= 2
+    return np.concatenate(found) if found else np.empty(0, dtype=np.intp)
+
+
 @dataclass
 class PredictNode:
     time: Time
     avail: int
     idle: int
-    # A list of nodes, whose length is Node.total
-    # TODO: what is this in the end?
-    node: list[int] = field(default_factory=list)
+    # The job index at each node (-1 if free), whose length is Node.total.
+    # May be shared with an other breakpoint, or None until it is needed:
+    # see Node.predict_map() and Node.predict_own().
+    node: Optional[np.ndarray] = None
 
 
 @dataclass
@@ -42,7 +199,8 @@ class NodeStructure:
     location: list[int]
     group: int
     proc: int
-    # index to the assigned job, or None if not assigned
+    # index to the assigned job at import, or None if not assigned
+    # (the allocations afterwards are in `Node.table`)
     state: Optional[int] = None
     start: Optional[Time] = None
     end: Optional[Time] = None
@@ -54,13 +212,20 @@ class Node:
 
     Attributes:
         nodes: A list of node structures.
-        jobs: A list of job information, sorted by end time.
+        table: The allocation state of the nodes.
+        jobs: The job information, by job index and in end time order.
     """
 
     nodes: list[NodeStructure]
-    jobs: list[JobInfo]
+    table: NodeTable
+    jobs: JobAllocations
     predict_nodes: list[PredictNode]
     predict_jobs: list[PredictJob]
+    # The job index and end time of each node at the last predict_reset()
+    predict_state: np.ndarray
+    predict_end: np.ndarray
+    # The breakpoints (by id) whose node map is their own, not shared
+    predict_owned: set[int]
 
     # Count of processors
     total_cores: Optional[int] = None
@@ -71,9 +236,11 @@ class Node:
         self.display_name = "Node Structure"
         self.debug = debug
         self.nodes = []
-        self.jobs = []
+        self.table = NodeTable()
+        self.jobs = JobAllocations()
         self.predict_nodes = []
         self.predict_jobs = []
+        self.predict_owned = set()
         self.total_cores = None
         self.idle_cores = None
         self.available_cores = None
@@ -87,12 +254,33 @@ class Node:
         # self.debug.debug("* "+self.display_name+" -- reset",5)
         self.debug = debug
         self.nodes = []
-        self.jobs = []
+        self.table = NodeTable()
+        self.jobs = JobAllocations()
         self.predict_nodes = []
+        self.predict_owned = set()
         self.total_cores = None
         self.idle_cores = None
         self.available_cores = None
 
+    def get_state(self):
+        """The allocation state of the nodes, for checkpoints."""
+        return {
+            "nodes": self.nodes,
+            "table": self.table,
+            "jobs": list(self.jobs),
+            "idle_cores": self.idle_cores,
+            "available_cores": self.available_cores,
+        }
+
+    def set_state(self, state: dict):
+        if "nodes" in state:
+            self.nodes = state["nodes"]
+        if "table" in state:
+            self.table = state["table"]
+        self.jobs = JobAllocations(state["jobs"])
+        self.idle_cores = state["idle_cores"]
+        self.available_cores = state["available_cores"]
+
     def read_list(self, source_str: str):
         assert source_str[0] == "[" and source_str[-1] == "]"
         source_str = source_str[1:-1]
@@ -100,9 +288,8 @@ class Node:
         return [int(item) for item in splited]
 
     def import_node_file(self, node_file: str):
+        """Import the nodes of a formatted node file, a column at a time."""
         # self.debug.debug("* "+self.display_name+" -- import_node_file",5)
-        self.nodes = []
-
         field_types = dataclass_types_for_pandas(NodeStructure) | {
             "location": str,
             "extend": str,
@@ -112,12 +299,46 @@ class Node:
             dtype=field_types,
             comment=";",
         )
-        df["location"] = df["location"].map(self.read_list)
-        df["extend"] = pd.NA
+        # the same location is parsed once, and its list shared by the nodes
+        codes, locations = pd.factorize(df["location"])
+        locations = [self.read_list(location) for location in locations]
+        states = df["state"].fillna(-1).to_numpy(dtype=np.int64)
+
+        self.nodes = [
+            NodeStructure(
+                id=id,
+                location=locations[code],
+                group=group,
+                proc=proc,
+                state=state,
+                start=start,
+                end=end,
+            )
+            for id, code, group, proc, state, start, end in zip(
+                df["id"].tolist(),
+                codes.tolist(),
+                df["group"].tolist(),
+                df["proc"].tolist(),
+                states.tolist(),
+                df["start"].tolist(),
+                df["end"].tolist(),
+            )
+        ]
+        self.table = NodeTable(states)
+        self.set_totals(len(self.nodes))
 
-        for index, row in df.iterrows():
-            self.nodes.append(NodeStructure(*row.to_dict()))
-        self.total_cores = len(self.nodes)
+    def import_node_capacity(self, total_cores: int):
+        """
+        Set up `total_cores` free nodes of one processor, as the SWF node filter
+        would format them, but without their node structures.
+        """
+        # self.debug.debug("* "+self.display_name+" -- import_node_capacity",5)
+        self.nodes = []
+        self.table = NodeTable(np.full(total_cores, -1))
+        self.set_totals(total_cores)
+
+    def set_totals(self, total_cores: int):
+        self.total_cores = total_cores
         self.idle_cores = self.total_cores
         self.available_cores = self.total_cores
 
@@ -131,11 +352,12 @@ class Node:
             + " ",
             4,
         )
-        return
 
+    # XREF: NodeFilterSWF.dump_config()
     def import_node_config(self, config_file: StrOrBytesPath):
+        """The node config, as the fields of `ConfigData`."""
         with open(config_file, "r") as f:
-            json.load(f)
+            return json.load(f)
 
     def import_node_data(self, node_data: list):
         # self.debug.debug("* "+self.display_name+" -- import_node_data",5)
@@ -158,6 +380,7 @@ class Node:
             )
             self.nodes.append(tempInfo)
             i += 1
+        self.table = NodeTable(node.state for node in self.nodes)
         self.total_cores = len(self.nodes)
         self.idle_cores = self.total_cores
         self.available_cores = self.total_cores
@@ -192,22 +415,11 @@ class Node:
             return False
 
         # NOTE: this does not exists in NodeSWF
-        assert all(node.state is not None for node in self.nodes)
-        for node in itertools.islice(
-            filter(
-                lambda x: x.state < 0,  # type: ignore ensured all states are not None
-                self.nodes,
-            ),
-            cores,
-        ):
-            node.state = job_index
-            node.start = start
-            node.end = end
+        self.table.allocate(job_index, cores, start, end)
 
         self.idle_cores -= cores
         self.available_cores = self.idle_cores
-        job = JobInfo(job=job_index, end=end, cores=cores)
-        bisect.insort(self.jobs, job, key=lambda x: x.end)
+        self.jobs.add(JobInfo(job=job_index, end=end, cores=cores))
 
         self.debug.debug(
             "  Allocate"
@@ -225,29 +437,16 @@ class Node:
 
     def node_release(self, job_index: int, end: Time):
         # self.debug.debug("* "+self.display_name+" -- node_release",5)
-        released_cores = 0
-        for core in filter(lambda x: x.state == job_index, self.nodes):
-            # self.debug.debug("  xxx: "+str(node['state'])+"   "+str(job_index),4)
-            core.state = None
-            core.start = None
-            core.end = None
-            released_cores += 1
-        if released_cores == 0:
+        if not self.table.release(job_index):
             self.debug.debug("  Release Fail!", 4)
             return False
 
         assert self.idle_cores is not None
-        self.idle_cores += released_cores
-        self.available_cores = self.idle_cores
-
-        for index, job in enumerate(self.jobs):
-            if job.job == job_index:
-                job = self.jobs.pop(index)
-                self.idle_cores += job.cores
-                self.available_cores = self.idle_cores
-                break
-        else:
+        if job_index not in self.jobs:
             raise ValueError(f"Job {job_index} not found in {self.jobs}")
+        job = self.jobs.pop(job_index)
+        self.idle_cores += job.cores
+        self.available_cores = self.idle_cores
 
         self.debug.debug(
             "  Release"
@@ -255,7 +454,7 @@ class Node:
             + str(job_index)
             + "]"
             + " Req:"
-            + str(index)
+            + str(job.cores)
             + " Avail:"
             + str(self.available_cores)
             + " ",
@@ -312,17 +511,13 @@ class Node:
         start_index = index
         for i, node in enumerate(self.predict_nodes, start=index):
             if node.time < end:
-                assert len(node.node) == self.total_cores
-                assigned_cores = 0
-                for k, n in enumerate(node.node):
-                    if assigned_cores >= cores:
-                        break
-                    if n != -1:
-                        continue
-                    node.node[k] = job_index
-                    node.idle -= 1
+                node_map = self.predict_map(node)
+                assert len(node_map) == self.total_cores
+                free = find_first(node_map, -1, cores)
+                if len(free):
+                    self.predict_own(node)[free] = job_index
+                    node.idle -= len(free)
                     node.avail = node.idle
-                    assigned_cores += 1
             elif node.time == end:
                 break
             else:  # node.time > end
@@ -331,27 +526,24 @@ class Node:
                 # And the last node must satisfy the condition
                 assert last_node.time < end
 
-                assert len(last_node.node) == self.total_cores
+                assert len(self.predict_map(last_node)) == self.total_cores
+                # the map is shared until one of them changes it
+                self.predict_owned.discard(id(last_node))
                 self.predict_nodes.insert(
                     i,
                     PredictNode(
                         time=end,
-                        # for list[int] shallow copy is enough
-                        node=last_node.node.copy(),
+                        node=last_node.node,
                         idle=last_node.idle,
                         avail=last_node.avail,
                     ),
                 )
 
                 # rollback of operations on last_node
-                assigned_cores = 0
-                for k, n in enumerate(node.node):
-                    if assigned_cores >= cores:
-                        break
-                    if n != job_index:
-                        continue
-                    node.node[k] = -1
-                    node.idle += 1
+                assigned = find_first(self.predict_map(node), job_index, cores)
+                if len(assigned):
+                    self.predict_own(node)[assigned] = -1
+                    node.idle += len(assigned)
                     node.avail = node.idle
 
                 # self.debug.debug("xx   "+str(n)+"   "+str(k),4)
@@ -360,7 +552,7 @@ class Node:
             self.predict_nodes.append(
                 PredictNode(
                     time=end,
-                    node=[-1] * self.total_cores,
+                    node=np.full(self.total_cores, -1, dtype=np.int32),
                     idle=self.total_cores,
                     avail=self.total_cores,
                 )
@@ -388,14 +580,22 @@ class Node:
         return max(job.end for job in self.predict_jobs)
 
     def predict_reset(self, time: Time):
+        """
+        Start the predictions from the running jobs.
+
+        The node maps of the breakpoints are only made when a reservation
+        changes them, from a copy of the node table.
+        """
         # self.debug.debug("* "+self.display_name+" -- pre_reset",5)
-        assert len(self.nodes) == self.total_cores
+        assert len(self.table) == self.total_cores
         assert self.idle_cores is not None and self.available_cores is not None
-        assert all(x.state is not None for x in self.nodes)
 
+        self.predict_state = self.table.state.astype(np.int32)
+        self.predict_end = self.table.end.copy()
+        self.predict_owned = set()
         node = PredictNode(
             time=time,
-            node=[x.state for x in self.nodes],  # type: ignore ensured all states are not None
+            node=self.predict_state,
             idle=self.idle_cores,
             avail=self.available_cores,
         )
@@ -407,27 +607,31 @@ class Node:
             if node.time != job.end or i == 0:
                 node = PredictNode(
                     time=job.end,
-                    node=node.node.copy(),
                     idle=node.idle,
                     avail=node.avail,
                 )
                 self.predict_nodes.append(node)
 
-            for k, n in enumerate(node.node):
-                if n == job.job:
-                    node.node[k] = -1
-                    node.idle += 1
+            node.idle += len(self.table.job_nodes(job.job))
             node.avail = node.idle
-        """
-        i = 0
-        while i< self.tot:
-            if self.nodeStruc[i]['state'] != -1:
-                temp_index = get_pre_index(temp_time = self.nodeStruc[i]['end'])
-                self.predict_node[temp_index]['node'][i] = self.nodeStruc[i]['state']
-            i += 1
-        """
         return 1
 
+    def predict_map(self, node: PredictNode) -> np.ndarray:
+        """The node map of a breakpoint, to read."""
+        if node.node is None:
+            # the nodes of the jobs ended by then are free
+            node.node = np.where(self.predict_end <= node.time, -1, self.predict_state)
+            self.predict_owned.add(id(node))
+        return node.node
+
+    def predict_own(self, node: PredictNode):
+        """The node map of a breakpoint, to change: copied first if it is shared."""
+        node_map = self.predict_map(node)
+        if id(node) not in self.predict_owned:
+            node.node = node_map = node_map.copy()
+            self.predict_owned.add(id(node))
+        return node_map
+
     def find_res_place(self, cores: int, index: int, time: Time):
         """
         In predict_nodes[index:] which ends before time, find the index of the first node
@@ -0,0 +1,292 @@
+"""
+Topology-aware placement for CQSim
+
+The nodes are laid out in slots, in the order of their group and location, so
+that consecutive slots are neighbours in the machine. A job is placed on a block
+of consecutive free slots, found in a segment tree of the free runs in O(log n).
+"""
+
+from enum import Enum
+from typing import Optional, Sequence
+
+import numpy as np
+
+from cqsim.cqsim.node import NodeStructure
+from cqsim.types import Time
+
+# The (pre, suf, best, group pre, group suf, group best) runs of a busy range
+BUSY = (0, 0, 0, 0, 0, 0)
+
+
+class PlacementMode(Enum):
+    # Any free cores, only their count matters
+    ANY = 1
+    # A block of consecutive slots
+    CONTIGUOUS = 2
+    # A block of consecutive slots within a group, if the job fits in one
+    GROUP = 3
+
+
+class BlockIndex:
+    """
+    The free slots as runs of consecutive slots, in a segment tree.
+
+    Each node of the tree holds, for its range of slots, the free run at its
+    start, the free run at its end and the longest free run: once over all
+    the slots, and once with the runs cut at the group boundaries. The ranges
+    set free or busy are set lazily, so that finding, taking and giving back a
+    block is O(log n) however large it is.
+
+    The tree holds the slots free now. The reservations from now take their
+    block in it, while those from a later start only book their block for
+    the interval they hold it, so that the slots stay free before it. The
+    blocks free over an interval are looked for by a scan of the slots, in
+    O(n + b) for b bookings. `reset` gives back the blocks of the predictions.
+    """
+
+    # Number of slots, and of leaves of the tree (a power of two)
+    size: int
+    leaves: int
+    # Whether each slot starts a group (the padding slots too)
+    cuts: list[bool]
+    # The position of the group of each slot
+    group_of: np.ndarray
+    # Whether the blocks stay within a group, when the job fits in one
+    local: bool
+    # Number of slots of the largest group
+    largest: int
+    # The runs of each node, and of each node if all its slots were free
+    runs: list[tuple[int, int, int, int, int, int]]
+    full: list[tuple[int, int, int, int, int, int]]
+    # Whether the range of each node was set free (True) or busy (False)
+    # and not yet set on its children
+    lazy: list[Optional[bool]]
+    # The end time of the job or reservation holding each slot now, -inf if free
+    until: np.ndarray
+    # The current time: a slot held then stays held until it is given back,
+    # even past its end time
+    time: Time
+    # (slot, cores) of the reservations from now since the last reset
+    reservations: list[tuple[int, int]]
+    # (slot, cores, start, end) of the first `booked` rows, the blocks of the
+    # reservations from a later start since the last reset
+    bookings: np.ndarray
+    booked: int
+
+    def __init__(self, groups: Sequence[int], local: bool = False):
+        """
+        :param groups: the group of each slot, the slots of a group together.
+        """
+        self.size = len(groups)
+        self.leaves = 1 << max(self.size - 1, 0).bit_length()
+        self.cuts = [
+            i == 0 or i >= self.size or groups[i] != groups[i - 1]
+            for i in range(self.leaves)
+        ]
+        self.group_of = np.cumsum(self.cuts[: self.size])
+        self.local = local
+        starts = [i for i in range(self.size) if self.cuts[i]] + [self.size]
+        self.largest = max(b - a for a, b in zip(starts, starts[1:])) if groups else 0
+        self.full = self.build()
+        self.runs = list(self.full)
+        self.lazy = [None] * self.leaves
+        self.until = np.full(self.size, -np.inf)
+        self.time = -np.inf
+        self.reservations = []
+        self.bookings = np.empty((16, 4))
+        self.booked = 0
+
+    @classmethod
+    def from_nodes(cls, nodes: list[NodeStructure], local: bool = False):
+        """The slots of the nodes, sorted by group and location."""
+        order = sorted(nodes, key=lambda node: (node.group, node.location))
+        return cls([node.group for node in order], local=local)
+
+    def build(self):
+        """The runs of every node, all the slots free."""
+        runs = [BUSY] * (2 * self.leaves)
+        runs[self.leaves : self.leaves + self.size] = [(1,) * 6] * self.size
+        for i in range(self.leaves - 1, 0, -1):
+            depth = i.bit_length() - 1
+            span = self.leaves >> depth
+            lo = (i - (1 << depth)) * span
+            runs[i] = self.merge(
+                runs[2 * i], runs[2 * i + 1], span // 2, lo + span // 2
+            )
+        return runs
+
+    def merge(self, left: tuple, right: tuple, half: int, mid: int):
+        """The runs of a node, from those of its children of `half` slots each."""
+        lp, ls, lb, lgp, lgs, lgb = left
+        rp, rs, rb, rgp, rgs, rgb = right
+        pre = lp + rp if lp == half else lp
+        suf = rs + ls if rs == half else rs
+        best = max(lb, rb, ls + rp)
+        if self.cuts[mid]:
+            return pre, suf, best, lgp, rgs, max(lgb, rgb)
+        gpre = lgp + rgp if lgp == half else lgp
+        gsuf = rgs + lgs if rgs == half else rgs
+        return pre, suf, best, gpre, gsuf, max(lgb, rgb, lgs + rgp)
+
+    def apply(self, i: int, free: bool):
+        self.runs[i] = self.full[i] if free else BUSY
+        if i < self.leaves:
+            self.lazy[i] = free
+
+    def push(self, i: int):
+        free = self.lazy[i]
+        if free is not None:
+            self.apply(2 * i, free)
+            self.apply(2 * i + 1, free)
+            self.lazy[i] = None
+
+    def assign(self, start: int, end: int, free: bool, i=1, lo=0, hi=None):
+        """Set the slots in [start, end) free or busy."""
+        if hi is None:
+            hi = self.leaves
+        if start <= lo and hi <= end:
+            self.apply(i, free)
+            return
+        self.push(i)
+        mid = (lo + hi) // 2
+        if start < mid:
+            self.assign(start, end, free, 2 * i, lo, mid)
+        if mid < end:
+            self.assign(start, end, free, 2 * i + 1, mid, hi)
+        self.runs[i] = self.merge(self.runs[2 * i], self.runs[2 * i + 1], mid - lo, mid)
+
+    def is_local(self, cores: int):
+        return self.local and cores <= self.largest
+
+    def fits(self, cores: int):
+        """Whether there is a block of `cores` free slots."""
+        return self.runs[1][5 if self.is_local(cores) else 2] >= cores
+
+    def find(self, cores: int) -> Optional[int]:
+        """The first slot of the first block of `cores` free slots, None if there is none."""
+        if cores <= 0:
+            return 0
+        local = self.is_local(cores)
+        pre, suf, best = (3, 4, 5) if local else (0, 1, 2)
+        if self.runs[1][best] < cores:
+            return None
+        i, lo, hi = 1, 0, self.leaves
+        while i < self.leaves:
+            self.push(i)
+            mid = (lo + hi) // 2
+            left, right = self.runs[2 * i], self.runs[2 * i + 1]
+            if left[best] >= cores:
+                i, hi = 2 * i, mid
+            elif (not local or not self.cuts[mid]) and left[suf] + right[pre] >= cores:
+                return mid - left[suf]
+            else:
+                i, lo = 2 * i + 1, mid
+        return lo
+
+    def take(self, slot: int, cores: int, end: Time):
+        """Hold the block of `cores` slots from `slot` until `end`."""
+        if cores > 0:
+            self.assign(slot, slot + cores, False)
+            self.until[slot : slot + cores] = end
+
+    def give(self, slot: int, cores: int):
+        """Free the block of `take`."""
+        if cores > 0:
+            self.assign(slot, slot + cores, True)
+            self.until[slot : slot + cores] = -np.inf
+
+    def is_free(self, slot: int, cores: int):
+        """Whether the `cores` slots from `slot` are all free."""
+        return slot + cores <= self.size and bool(
+            (self.until[slot : slot + cores] == -np.inf).all()
+        )
+
+    def reserve(self, cores: int, end: Time, start: Optional[Time] = None):
+        """
+        Take the first block of `cores` slots free until `end` for a
+        reservation, undone by `reset`: from now, or else booked from `start`.
+        """
+        if start is None or start <= self.time:
+            slot = (
+                self.find(cores) if not self.booked else self.find_at(cores, None, end)
+            )
+            if slot is not None and cores > 0:
+                self.take(slot, cores, end)
+                self.reservations.append((slot, cores))
+            return slot
+        slot = self.find_at(cores, start, end)
+        if slot is not None and cores > 0:
+            if self.booked == len(self.bookings):
+                self.bookings = np.concatenate([self.bookings, self.bookings])
+            self.bookings[self.booked] = slot, cores, start, end
+            self.booked += 1
+        return slot
+
+    def reset(self):
+        """Give back the blocks of the reservations."""
+        while self.reservations:
+            self.give(*self.reservations.pop())
+        self.booked = 0
+
+    def taken(self, start: Optional[Time], end: Time) -> np.ndarray:
+        """
+        Whether each slot is taken at some time of [start, end), or at `start`
+        if the interval is empty: held then, or booked over part of it.
+
+        :param start: None for now.
+        """
+        if start is None or start <= self.time:
+            start = self.time
+            taken = self.until != -np.inf
+        else:
+            taken = self.until > start
+        if self.booked:
+            slot, cores, first, last = self.bookings[: self.booked].T
+            if end > start:
+                hit = (first < end) & (last > start)
+            else:
+                hit = (first <= start) & (last > start)
+            if hit.any():
+                # +1 from the first slot of each block, -1 past its last one
+                count = np.zeros(self.size + 1, dtype=np.int64)
+                np.add.at(count, slot[hit].astype(np.int64), 1)
+                np.add.at(count, (slot[hit] + cores[hit]).astype(np.int64), -1)
+                taken |= np.cumsum(count[:-1]) > 0
+        return taken
+
+    def find_at(self, cores: int, start: Optional[Time], end: Time) -> Optional[int]:
+        """
+        The first slot of the first block of `cores` slots free over
+        [start, end), None if there is none. A slot is free from the end time
+        it is held until, and before and after its bookings.
+
+        :param start: None for now.
+        """
+        if cores <= 0:
+            return 0
+        if cores > self.size:
+            return None
+        if (start is None or start <= self.time) and not self.booked:
+            return self.find(cores)
+        counts = np.concatenate([[0], np.cumsum(self.taken(start, end))])
+        # the blocks with no slot taken
+        free = counts[cores:] == counts[:-cores]
+        if self.is_local(cores):
+            free &= self.group_of[: len(free)] == self.group_of[cores - 1 :]
+        fit = np.flatnonzero(free)
+        return int(fit[0]) if len(fit) else None
+
+    def fits_at(self, cores: int, start: Optional[Time], end: Time):
+        """Whether there is a block of `cores` slots free over [start, end)."""
+        return self.find_at(cores, start, end) is not None
+
+    def next_end(self, time: Time) -> Optional[Time]:
+        """
+        The first end time after `time` (and now) of a slot held or of a
+        booking, None if there is none. From `time` until then, the slots
+        taken over an interval as long only grow in number, so a block that
+        does not fit at `time` does not fit before it.
+        """
+        ends = np.concatenate([self.until, self.bookings[: self.booked, 3]])
+        ends = ends[ends > max(time, self.time)]
+        return float(ends.min()) if len(ends) else None
@@ -0,0 +1,467 @@
+"""
+Availability profile for CQSim
+
+The free cores over time are a step function, changing at the end times of the
+running jobs and of the reservations. The end times are kept in a treap, a
+binary search tree balanced by random priorities, whose nodes also hold the
+sums and the least prefix sums of their subtrees, so that the range queries
+and the updates of the profile are O(log n).
+"""
+
+import math
+import random
+from typing import Iterable, Optional
+
+from cqsim.cqsim.node import JobInfo
+from cqsim.types import Time
+
+
+class Breakpoint:
+    """A node of the treap: the cores freed at an end time."""
+
+    __slots__ = (
+        "time",
+        "freed",
+        "prio",
+        "left",
+        "right",
+        "size",
+        "total",
+        "low",
+        "high",
+    )
+
+    time: Time
+    freed: int
+    prio: float
+    left: Optional["Breakpoint"]
+    right: Optional["Breakpoint"]
+    # Number of breakpoints, and sum of `freed`, of the subtree
+    size: int
+    total: int
+    # Least and greatest sum of `freed` over the prefixes of the subtree in time order
+    low: float
+    high: float
+
+    def __init__(self, time: Time, freed: int, prio: float):
+        self.time = time
+        self.freed = freed
+        self.prio = prio
+        self.left = None
+        self.right = None
+        self.update()
+
+    def update(self):
+        left, right = self.left, self.right
+        size, total, low, high = 1, self.freed, self.freed, self.freed
+        # the comparisons inline, as this runs for each node of every path
+        if left is not None:
+            size += left.size
+            total += left.total
+            low = left.low if left.low < total else total
+            high = left.high if left.high > total else total
+        if right is not None:
+            size += right.size
+            if total + right.low < low:
+                low = total + right.low
+            if total + right.high > high:
+                high = total + right.high
+            total += right.total
+        self.size, self.total, self.low, self.high = size, total, low, high
+
+
+def size(tree: Optional[Breakpoint]):
+    return 0 if tree is None else tree.size
+
+
+def total(tree: Optional[Breakpoint]):
+    return 0 if tree is None else tree.total
+
+
+def low(tree: Optional[Breakpoint]):
+    return math.inf if tree is None else tree.low
+
+
+def split(tree: Optional[Breakpoint], time: Time, right_equal: bool = True):
+    """
+    Split the tree into the breakpoints before `time` and the others.
+
+    :param right_equal: whether the breakpoint at `time` goes to the right part.
+    """
+    if tree is None:
+        return None, None
+    if tree.time < time or (not right_equal and tree.time == time):
+        left, right = split(tree.right, time, right_equal)
+        tree.right = left
+        tree.update()
+        return tree, right
+    left, right = split(tree.left, time, right_equal)
+    tree.left = right
+    tree.update()
+    return left, tree
+
+
+def merge(left: Optional[Breakpoint], right: Optional[Breakpoint]):
+    """Join two trees, the breakpoints of `left` all before those of `right`."""
+    if left is None:
+        return right
+    if right is None:
+        return left
+    if left.prio > right.prio:
+        left.right = merge(left.right, right)
+        left.update()
+        return left
+    right.left = merge(left, right.left)
+    right.update()
+    return right
+
+
+def range_low(
+    tree: Optional[Breakpoint],
+    start: Time,
+    end: Time,
+    lo: Time = -math.inf,
+    hi: Time = math.inf,
+) -> tuple[int, float]:
+    """
+    The sum of `freed` before the breakpoints in [start, end), and the least
+    prefix sum at them (inf if there is none), in a tree whose breakpoints are
+    all between `lo` and `hi`.
+    """
+    before = 0
+    while tree is not None:
+        if start <= lo and hi <= end:
+            return before, before + tree.low
+        if tree.time < start:
+            before += total(tree.left) + tree.freed
+            tree, lo = tree.right, tree.time
+        elif tree.time >= end:
+            tree, hi = tree.left, tree.time
+        else:
+            left_before, left_low = range_low(tree.left, start, end, lo, tree.time)
+            at = before + total(tree.left) + tree.freed
+            _, right_low = range_low(tree.right, start, end, tree.time, hi)
+            return before + left_before, min(before + left_low, at, at + right_low)
+    return before, math.inf
+
+
+def high(tree: Optional[Breakpoint]):
+    return -math.inf if tree is None else tree.high
+
+
+def prefix(tree: Optional[Breakpoint], time: Time):
+    """The sum of `freed` of the breakpoints up to `time`."""
+    result = 0
+    while tree is not None:
+        if tree.time <= time:
+            result += total(tree.left) + tree.freed
+            tree = tree.right
+        else:
+            tree = tree.left
+    return result
+
+
+def last_below(
+    tree: Optional[Breakpoint],
+    threshold: float,
+    start: Time,
+    end: Time,
+    lo: Time = -math.inf,
+    hi: Time = math.inf,
+) -> Optional[Time]:
+    """
+    The time of the last breakpoint in [start, end) whose prefix sum is below
+    `threshold`, in a tree whose breakpoints are all between `lo` and `hi`.
+    """
+    while tree is not None:
+        if tree.time < start:
+            threshold -= total(tree.left) + tree.freed
+            tree, lo = tree.right, tree.time
+        elif tree.time >= end:
+            tree, hi = tree.left, tree.time
+        else:
+            if start <= lo and hi <= end and tree.low >= threshold:
+                return None
+            at = threshold - total(tree.left) - tree.freed
+            time = last_below(tree.right, at, start, end, tree.time, hi)
+            if time is not None:
+                return time
+            if at > 0:
+                return tree.time
+            tree, hi = tree.left, tree.time
+    return None
+
+
+def first_at_least(
+    tree: Optional[Breakpoint], threshold: float, after: Time, lo: Time = -math.inf
+) -> tuple[float, Optional[Time]]:
+    """
+    The time of the first breakpoint after `after` whose prefix sum is at least
+    `threshold`, in a tree whose breakpoints are all after `lo`.
+
+    :return: the threshold less the sum of `freed` of the tree, and the time.
+    """
+    while tree is not None:
+        if lo >= after:
+            if tree.high < threshold:
+                return threshold - tree.total, None
+            # the whole subtree is after: follow the first prefix at least there
+            while True:
+                if high(tree.left) >= threshold:
+                    tree = tree.left  # type: ignore
+                    continue
+                threshold -= total(tree.left) + tree.freed
+                if threshold <= 0:
+                    return threshold, tree.time
+                tree = tree.right  # type: ignore
+        if tree.time <= after:
+            threshold -= total(tree.left) + tree.freed
+            tree, lo = tree.right, tree.time
+        else:
+            threshold, time = first_at_least(tree.left, threshold, after, lo)
+            if time is not None:
+                return threshold, time
+            threshold -= tree.freed
+            if threshold <= 0:
+                return threshold, tree.time
+            tree, lo = tree.right, tree.time
+    return threshold, None
+
+
+class AvailProfile:
+    """
+    The free cores over time, as a step function kept across scheduling passes.
+
+    The profile starts at `time` with `free` cores. Each later breakpoint frees
+    the cores of the running jobs and of the reservations ending then, so the
+    free cores at a breakpoint are `free` plus the cores freed up to it. A job
+    or a reservation is added or removed in O(log n) by its end time, instead
+    of rebuilding the profile from all the running jobs.
+
+    A reservation from a later start takes its cores at a breakpoint of its
+    own, whose `freed` is negative. The reservations are also recorded, so
+    that `reset` undoes them and leaves the profile of the running jobs.
+    """
+
+    time: Time
+    free: int
+    # The breakpoints after `time`
+    tree: Optional[Breakpoint]
+    # (start, end, cores) of the reservations since the last reset,
+    # the start None for those from the start of the profile
+    reservations: list[tuple[Optional[Time], Time, int]]
+
+    def __init__(self, time: Time, free: int, jobs: Iterable[JobInfo] = ()):
+        self.time = time
+        self.free = free
+        self.tree = None
+        self.reservations = []
+        # seeded, so that the shape of the tree is the same on every run
+        self.random = random.Random(0)
+        for job in jobs:
+            self.free += job.cores
+            self.add(job.end, job.cores)
+
+    def __len__(self):
+        """Number of breakpoints, the start of the profile included."""
+        return 1 + size(self.tree)
+
+    def add(self, end: Time, cores: int):
+        """
+        Take `cores` from the start of the profile until `end`.
+
+        :return: the position of the breakpoint added at `end`, None if there already was one.
+        """
+        self.free -= cores
+        return self.insert(end, cores)
+
+    def remove(self, end: Time, cores: int):
+        """Give back `cores` taken until `end` by `add`."""
+        self.free += cores
+        self.delete(end, cores)
+
+    def insert(self, time: Time, freed: int):
+        """
+        Add `freed` to the breakpoint at `time`.
+
+        :return: the position of the breakpoint, None if there already was one.
+        """
+        path, at = self.find(time)
+        if at is not None:
+            at.freed += freed
+            position = None
+            if at.freed == 0 and freed:
+                # a reservation starting as an other one ends
+                self.replace(path, time, merge(at.left, at.right))
+            else:
+                path.append(at)
+        else:
+            # insert as a treap: above the first node of a lower priority
+            prio = self.random.random()
+            path = []
+            tree = self.tree
+            position = 1
+            while tree is not None and tree.prio > prio:
+                path.append(tree)
+                if time < tree.time:
+                    tree = tree.left
+                else:
+                    position += size(tree.left) + 1
+                    tree = tree.right
+            at = Breakpoint(time, freed, prio)
+            at.left, at.right = split(tree, time)
+            position += size(at.left)
+            self.replace(path, time, at)
+            path.append(at)
+        for tree in reversed(path):
+            tree.update()
+        return position
+
+    def delete(self, time: Time, freed: int):
+        """Take `freed` from the breakpoint at `time`, dropping it at 0."""
+        path, at = self.find(time)
+        if at is None:
+            # the breakpoint went with an other one, at 0
+            if freed:
+                self.insert(time, -freed)
+            return
+        at.freed -= freed
+        if at.freed == 0:
+            self.replace(path, time, merge(at.left, at.right))
+        else:
+            path.append(at)
+        for tree in reversed(path):
+            tree.update()
+
+    def find(self, time: Time):
+        """The path to the breakpoint at `time`, and the breakpoint (None if there is none)."""
+        path = []
+        tree = self.tree
+        while tree is not None and tree.time != time:
+            path.append(tree)
+            tree = tree.left if time < tree.time else tree.right
+        return path, tree
+
+    def replace(self, path: list[Breakpoint], time: Time, new: Optional[Breakpoint]):
+        """Put `new` in the place of the subtree of `time` below the end of `path`."""
+        if not path:
+            self.tree = new
+        elif time < path[-1].time:
+            path[-1].left = new
+        else:
+            path[-1].right = new
+
+    def reserve(self, end: Time, cores: int, start: Optional[Time] = None):
+        """
+        Add a reservation until `end`, from `start` or else from the start of
+        the profile, undone by `reset`.
+
+        :return: the position of the breakpoint added at `end`, as `add`.
+        """
+        if start is not None and start > self.time:
+            if end <= start:
+                return None
+            self.reservations.append((start, end, cores))
+            self.insert(start, -cores)
+            return self.insert(end, cores)
+        if end == self.time:
+            # nothing to take: the reservation ends as the profile starts
+            return None
+        self.reservations.append((None, end, cores))
+        return self.add(end, cores)
+
+    def reset(self, time: Optional[Time] = None):
+        """Undo the reservations, and move the start of the profile to `time`."""
+        while self.reservations:
+            start, end, cores = self.reservations.pop()
+            if start is None:
+                self.remove(end, cores)
+            else:
+                self.delete(end, cores)
+                self.delete(start, -cores)
+        if time is not None:
+            self.time = time
+
+    def breakpoint(self, position: int):
+        """The time and the free cores of a breakpoint."""
+        if position == 0:
+            return self.time, self.free
+        free = self.free
+        tree = self.tree
+        position -= 1
+        while tree is not None:
+            if position < size(tree.left):
+                tree = tree.left
+                continue
+            free += total(tree.left) + tree.freed
+            if position == size(tree.left):
+                return tree.time, free
+            position -= size(tree.left) + 1
+            tree = tree.right
+        raise IndexError(position)
+
+    def min_free(self, start: Time, end: Time):
+        """
+        The least free cores at the breakpoints in [start, end), and at `start`
+        after the start of the profile. None if there is none.
+        """
+        result = self.free if start <= self.time < end else None
+        if self.time < start < end:
+            result = self.free_at(start)
+        _, low = range_low(self.tree, start, end)
+        if low != math.inf and (result is None or self.free + low < result):
+            result = self.free + int(low)
+        return result
+
+    def free_at(self, time: Time):
+        """The free cores at `time`, from the start of the profile."""
+        if time <= self.time:
+            return self.free
+        return self.free + prefix(self.tree, time)
+
+    def earliest_start(self, cores: int, duration: Time, start: Optional[Time] = None):
+        """
+        The earliest breakpoint from which `cores` are free for `duration`,
+        None if there is none (more cores than the profile ever has).
+
+        Each step skips past the last breakpoint short of cores in the duration
+        from the current candidate, to the next one with the cores free, in O(log n).
+
+        :param start: the first candidate, a breakpoint or a time with `cores` free,
+            the start of the profile by default.
+        """
+        if start is None:
+            start = self.time
+        if duration <= 0:
+            # the cores free at an instant
+            if self.free_at(start) >= cores:
+                return start
+            return self.next_free(cores, start)
+        while start is not None:
+            end = start + duration
+            if start <= self.time < end and self.free < cores:
+                blocked = last_below(self.tree, cores - self.free, start, end)
+                if blocked is None:
+                    blocked = self.time
+            else:
+                blocked = last_below(self.tree, cores - self.free, start, end)
+            if blocked is None:
+                return start
+            start = self.next_free(cores, blocked)
+        return None
+
+    def next_free(self, cores: int, time: Time) -> Optional[Time]:
+        """The time of the first breakpoint after `time` with `cores` free."""
+        return first_at_least(self.tree, cores - self.free, time)[1]
+
+    def next_time(self, time: Time) -> Optional[Time]:
+        """The time of the first breakpoint after `time`."""
+        result = None
+        tree = self.tree
+        while tree is not None:
+            if tree.time > time:
+                result = tree.time
+                tree = tree.left
+            else:
+                tree = tree.right
+        return result
@@ -2,7 +2,7 @@ from __future__ import annotations
 
 from dataclasses import dataclass
 from enum import Enum
-from typing import NamedTuple, Optional, TypedDict
+from typing import Any, NamedTuple, Optional, TypedDict
 
 import pandas as pd
 
@@ -26,34 +26,68 @@ class EventPara(NamedTuple):
     job_index: int
 
 
-@dataclass(eq=True)
-class Event:
-    type: EventType
-    """The type of the event."""
+class ExtendPara(NamedTuple):
+    # Index of the event source, see `Cqsim.add_event_source`
+    source: int
+    data: Any
 
-    time: Time
-    """Virtual time."""
 
-    prio: int
-    """Priority."""
+# Enum members by their integer code, as stored in events
+_EVENT_TYPES = {event_type.value: event_type for event_type in EventType}
 
-    para: Optional[EventPara]
-    """Event parameter list."""
 
-    def _cmp_key(self):
-        return (self.time, -self.prio, self.para, self.type)
+class Event(tuple):
+    """
+    An event, stored as a plain tuple which is also its sort key:
+
+        (time, -prio, para.state, para.job_index, type, para)
+
+    with the enums as their integer codes. Events are ordered by time, then by
+    priority, highest first. Heaps and sorted lists compare them as tuples,
+    without calling back into Python or allocating. The fields are read only.
+    """
+
+    __slots__ = ()
 
-    def __lt__(self, other: Event):
-        return self._cmp_key() < other._cmp_key()
+    def __new__(cls, type: EventType, time: Time, prio: int, para: Optional[EventPara]):
+        if isinstance(para, EventPara):
+            return tuple.__new__(
+                cls,
+                (time, -prio, para.state.value, para.job_index, type.value, para),
+            )
+        return tuple.__new__(cls, (time, -prio, 0, -1, type.value, para))
 
-    def __le__(self, other: Event):
-        return self._cmp_key() <= other._cmp_key()
+    def __getnewargs__(self):
+        return (self.type, self.time, self.prio, self.para)
 
-    def __gt__(self, other: Event):
-        return self._cmp_key() > other._cmp_key()
+    def __repr__(self):
+        return (
+            f"Event(type={self.type}, time={self.time}, "
+            f"prio={self.prio}, para={self.para})"
+        )
 
-    def __ge__(self, other: Event):
-        return self._cmp_key() >= other._cmp_key()
+    @property
+    def type(self) -> EventType:
+        """The type of the event."""
+        return _EVENT_TYPES[self[4]]
+
+    @property
+    def time(self) -> Time:
+        """Virtual time."""
+        return self[0]
+
+    @property
+    def prio(self) -> int:
+        """Priority."""
+        return -self[1]
+
+    @property
+    def para(self) -> Optional[EventPara]:
+        """Event parameter list."""
+        return self[5]
+
+    def _cmp_key(self):
+        return self[:5]
 
 
 @dataclass
@@ -0,0 +1,128 @@
+"""
+Array view of the wait queue for CQSim
+"""
+
+from typing import Iterable, Optional
+
+import numpy as np
+
+from cqsim.types import Time
+
+
+class WaitQueue:
+    """
+    The waiting jobs as columns, in the order of `JobTrace.wait_indices`.
+
+    The job trace keeps it up to date as jobs are submitted, started and
+    rescored, so that the window and backfill read the queue as it is
+    instead of building a `WaitInfo` per job on every call.
+    The columns are arrays of a doubling capacity; `indices`, `procs`, `runs`
+    and `scores` are views of their rows in use.
+    """
+
+    index: np.ndarray
+    proc: np.ndarray
+    run: np.ndarray
+    score: np.ndarray
+    # Number of rows in use
+    size: int
+
+    def __init__(self, capacity: int = 1024):
+        self.index = np.empty(capacity, dtype=np.int64)
+        self.proc = np.empty(capacity, dtype=np.int64)
+        self.run = np.empty(capacity, dtype=np.float64)
+        self.score = np.empty(capacity, dtype=np.float64)
+        self.size = 0
+
+    def __len__(self):
+        return self.size
+
+    @property
+    def indices(self):
+        return self.index[: self.size]
+
+    @property
+    def procs(self):
+        return self.proc[: self.size]
+
+    @property
+    def runs(self):
+        return self.run[: self.size]
+
+    @property
+    def scores(self):
+        return self.score[: self.size]
+
+    def columns(self):
+        return self.index, self.proc, self.run, self.score
+
+    def clear(self):
+        self.size = 0
+
+    def insert(self, position: int, index: int, proc: int, run: Time, score: float):
+        """Insert a job at the given position of the queue."""
+        if self.size == len(self.index):
+            self.index, self.proc, self.run, self.score = (
+                np.concatenate([column, np.empty_like(column)])
+                for column in self.columns()
+            )
+        for column, value in zip(self.columns(), (index, proc, run, score)):
+            column[position + 1 : self.size + 1] = column[position : self.size]
+            column[position] = value
+        self.size += 1
+
+    def append(self, index: int, proc: int, run: Time, score: float):
+        self.insert(self.size, index, proc, run, score)
+
+    def delete(self, position: int):
+        """Remove the job at the given position of the queue."""
+        for column in self.columns():
+            column[position : self.size - 1] = column[position + 1 : self.size]
+        self.size -= 1
+
+    def drop(self, position: int):
+        """Mark the job at the position as gone, until `compress` removes its row."""
+        self.index[position] = -1
+
+    def compress(self):
+        """
+        Remove the rows of the jobs dropped.
+
+        :return: whether each row was kept, as booleans.
+        """
+        kept = self.indices >= 0
+        size = int(kept.sum())
+        for column in self.columns():
+            column[:size] = column[: self.size][kept]
+        self.size = size
+        return kept
+
+    def reorder(self, order: Iterable[int], start: int = 0):
+        """
+        Put the jobs in the given order of their current positions.
+
+        With `start`, the order is of the positions from `start` on, the
+        jobs before and after them keeping their place.
+        """
+        order = np.fromiter(order, dtype=np.int64)
+        for column in self.columns():
+            column[start : start + len(order)] = column[order]
+
+
+def unsorted_range(scores: np.ndarray) -> Optional[tuple[int, int]]:
+    """
+    The range [lo, hi) of the queue to sort for its scores to be descending.
+
+    The queue splits between two jobs when no job before scores lower than
+    a job after: a stable sort of the whole queue keeps each job on its side.
+    The jobs outside the range are split from all the others, so that a
+    stable sort of the range alone gives the same order. None if the queue
+    is in order.
+    """
+    lowest_before = np.minimum.accumulate(scores)[:-1]
+    highest_after = np.maximum.accumulate(scores[::-1])[::-1][1:]
+    # NaN compares false, so that the queue does not split next to one
+    joined = np.flatnonzero(~(lowest_before >= highest_after))
+    if not len(joined):
+        return None
+    return int(joined[0]), int(joined[-1]) + 2
@@ -2,7 +2,7 @@ from itertools import permutations
 from typing import Optional
 
 from cqsim.cqsim.backfill import BackfillPara
-from cqsim.cqsim.types import WaitInfo
+from cqsim.cqsim.wait_queue import WaitQueue
 from cqsim.extend.swf.node import NodeSWF
 from cqsim.logging.debug import DebugLog
 from cqsim.types import Time
@@ -43,7 +43,7 @@ class StartWindow:
     """
 
     current_para: Optional[BackfillPara]
-    wait_jobs: list[WaitInfo]
+    wait_jobs: Optional[WaitQueue]
     para: StartWindowPara
     use_window: bool
     para_list_ad: Optional[list[int]] = None
@@ -101,7 +101,7 @@ class StartWindow:
         self.reset_list()
 
     def start_window(
-        self, wait_jobs: list[WaitInfo], para_in: Optional[BackfillPara] = None
+        self, wait_jobs: WaitQueue, para_in: Optional[BackfillPara] = None
     ):
         """
         This is the entry of the adapt module.
@@ -111,8 +111,8 @@ class StartWindow:
         Get the reordered job sequence from the main method and return it to the invoker
         """
         self.current_para = para_in
-        self.wait_jobs = wait_jobs[: self.para.win_size]
-        check_len = min(self.para.check_size_in, len(self.wait_jobs))
+        self.wait_jobs = wait_jobs
+        check_len = min(self.para.check_size_in, self.para.win_size, len(wait_jobs))
 
         result = self.main(check_len)
         return result
@@ -123,10 +123,11 @@ class StartWindow:
 
         :return: the reordered job sequence
         """
+        assert self.wait_jobs is not None
         if self.use_window:
             return self.window_check(check_len)
         else:
-            return [job.index for job in self.wait_jobs[:check_len]]
+            return self.wait_jobs.indices[:check_len].tolist()
 
     def window_adapt(self, para_in: Optional[BackfillPara] = None):
         pass
@@ -145,29 +146,31 @@ class StartWindow:
 
     def reset_list(self):
         # self.debug.debug("* "+self.display_name+" -- reset_list",5)
-        self.wait_jobs = []
+        self.wait_jobs = None
 
     def window_check(self, check_len: int):
         """Do the window check and return the reordered sequence of the input job list."""
-        assert self.current_para is not None
+        assert self.current_para is not None and self.wait_jobs is not None
         all_permutations = permutations(range(check_len))
 
         last_ended_wait_indices: list[int] = []
         last_ended: Optional[Time] = None
 
+        indices = self.wait_jobs.indices[:check_len].tolist()
         if check_len == 1:
-            return [self.wait_jobs[0].index]
+            return [indices[0]]
+        procs = self.wait_jobs.procs[:check_len].tolist()
+        runs = self.wait_jobs.runs[:check_len].tolist()
 
         for wait_indices in all_permutations:
             self.node_module.predict_reset(self.current_para.time)
-            wait_jobs = (self.wait_jobs[i] for i in wait_indices)
 
             index = 0
-            for job in wait_jobs:
+            for i in wait_indices:
                 index = self.node_module.reserve(
-                    job.proc,
-                    job.index,
-                    job.run,
+                    procs[i],
+                    indices[i],
+                    runs[i],
                     index=index,
                 )
 
@@ -176,7 +179,5 @@ class StartWindow:
                 last_ended = self.node_module.predict_last_ended()
                 last_ended_wait_indices = list(wait_indices)
 
-        latest_end_job_indices = [
-            self.wait_jobs[i].index for i in last_ended_wait_indices
-        ]
+        latest_end_job_indices = [indices[i] for i in last_ended_wait_indices]
         return latest_end_job_indices
@@ -0,0 +1,142 @@
+"""
+In-process API for CQSim
+
+Simulate jobs held in memory on a cluster of a given size, and get the results
+back as DataFrames. Nothing is read from or written to disk, and nothing is printed.
+"""
+
+from __future__ import annotations
+
+import dataclasses
+from dataclasses import dataclass
+from typing import Optional
+
+import pandas as pd
+
+from cqsim.cqsim.backfill import Backfill
+from cqsim.cqsim.basic_algorithm import BasicAlgorithm
+from cqsim.cqsim.cqsim import Cqsim, ModuleList
+from cqsim.cqsim.event_source import EventSource
+from cqsim.cqsim.info_collect import InfoCollect
+from cqsim.cqsim.job_trace import JobTrace
+from cqsim.cqsim.types import Job
+from cqsim.cqsim.window import StartWindow, StartWindowPara
+from cqsim.extend.swf.format import jobs_from_df
+from cqsim.extend.swf.node import NodeSWF
+from cqsim.logging.debug import DebugLog
+from cqsim.logging.output import OutputLog
+from cqsim.result.archive import JobArchive
+from cqsim.result.summary import job_result_summary
+
+JOB_COLUMNS = [field.name for field in dataclasses.fields(Job)]
+
+
+@dataclass
+class SimResult:
+    # One row per finished job, with the columns of the .rst file
+    jobs: pd.DataFrame
+    # One row per system information record, with the fields of the .ult file
+    system: pd.DataFrame
+    # See `job_result_summary`
+    summary: dict[str, float]
+
+
+def simulate(
+    jobs: pd.DataFrame | list[Job],
+    total_cores: int,
+    alg: Optional[list[str]] = None,
+    alg_sign: Optional[list[int]] = None,
+    backfill: int = 2,
+    win: bool = True,
+    win_para: tuple[int, int, int] = (5, 0, 0),
+    monitor: Optional[int] = None,
+    event_queue: int = 2,
+    job_store: int = 1,
+    placement: int = 1,
+    event_sources: Optional[list[EventSource]] = None,
+) -> SimResult:
+    """
+    Simulate the jobs on `total_cores` cores.
+
+    The jobs are simulated as they are given, like the formatted job file:
+    use `JobFilterSWF` first to clean a raw SWF trace.
+
+    :param jobs: the jobs, or a DataFrame with the fields of `Job` as columns.
+        Missing columns are filled with -1.
+    :param alg: the score expression elements, FCFS ("w + 2") by default.
+    :param monitor: the monitor interval. No monitor events by default,
+        so `system` only has a record per job event.
+    :param job_store: 2 to store the jobs as NumPy columns, see `JobStore`.
+    :param placement: the placement of the jobs on the cores, see `PlacementMode`.
+    :param event_sources: sources of extension events, see `EventSource`.
+    """
+    if isinstance(jobs, pd.DataFrame):
+        jobs = list(jobs_from_df(jobs.reindex(columns=JOB_COLUMNS, fill_value=-1)))
+    if alg is None:
+        alg = ["w", "+", "2"]
+    if alg_sign is None:
+        alg_sign = [0] * len(alg)
+
+    module_debug = DebugLog(lvl=0, path=None)
+
+    module_job_trace = JobTrace(
+        start=0,
+        num=None,
+        anchor=0,
+        density=1.0,
+        read_input_freq=len(jobs),
+        debug=module_debug,
+        store=job_store,
+    )
+    module_job_trace.add_jobs(jobs)
+
+    module_node_struc = NodeSWF(debug=module_debug, placement=placement)
+    module_node_struc.import_node_capacity(total_cores)
+
+    module_backfill = Backfill(
+        ad_mode=0,
+        mode=backfill,
+        node_module=module_node_struc,
+        debug=module_debug,
+        para_list=[],
+    )
+    module_win = StartWindow(
+        mode=win,
+        ad_mode=0,
+        node_module=module_node_struc,
+        debug=module_debug,
+        para_list=StartWindowPara(*win_para),
+    )
+    module_alg = BasicAlgorithm(
+        ad_mode=0,
+        element=(alg, alg_sign),
+        debug=module_debug,
+    )
+    module_info_collect = InfoCollect(alg_module=module_alg, debug=module_debug)
+    module_output_log = OutputLog(output=None, archive=JobArchive())
+
+    module_list = ModuleList(
+        job=module_job_trace,
+        node=module_node_struc,
+        backfill=module_backfill,
+        win=module_win,
+        alg=module_alg,
+        info=module_info_collect,
+        output=module_output_log,
+    )
+    module_sim = Cqsim(
+        module=module_list,
+        debug=module_debug,
+        monitor=monitor,
+        event_queue=event_queue,
+    )
+    for source in event_sources or []:
+        module_sim.add_event_source(source)
+    module_sim.cqsim_sim()
+
+    result = module_output_log.archive.frame()  # type: ignore
+    return SimResult(
+        jobs=result,
+        system=pd.DataFrame(module_output_log.sys_infos),
+        summary=job_result_summary(result, total_cores),
+    )
@@ -2,7 +2,7 @@ from __future__ import annotations
 
 import os
 from pprint import pprint
-from typing import TYPE_CHECKING, TypedDict
+from typing import TYPE_CHECKING, Any, Optional, TypedDict
 
 if TYPE_CHECKING:
     from typing_extensions import Required
@@ -10,15 +10,19 @@ if TYPE_CHECKING:
 # import CqSim.Node_struc as Class_Node_struc
 from cqsim.cqsim.backfill import Backfill
 from cqsim.cqsim.basic_algorithm import BasicAlgorithm
+from cqsim.cqsim.branch import Branch, fork_branches
+from cqsim.cqsim.checkpoint import Checkpoint
 from cqsim.cqsim.cqsim import Cqsim, ModuleList
 from cqsim.cqsim.info_collect import InfoCollect
 from cqsim.cqsim.job_trace import JobTrace
+from cqsim.cqsim.types import Job
 from cqsim.cqsim.window import StartWindow, StartWindowPara
 from cqsim.extend.swf.job_filter import JobFilterSWF
 from cqsim.extend.swf.node import NodeSWF
 from cqsim.extend.swf.node_filter import NodeFilterSWF
 from cqsim.logging.debug import DebugLog
 from cqsim.logging.output import Output, OutputLog
+from cqsim.result.archive import JobArchive
 
 
 class ParaList(TypedDict):
@@ -66,6 +70,21 @@ class ParaList(TypedDict):
     monitor: int
     log_freq: int
     read_input_freq: int
+    stream_job: bool
+    event_queue: int
+    job_store: int
+    node_file: bool
+    placement: int
+    archive_mem: float
+    coalesce: bool
+    checkpoint: str
+    checkpoint_time: float
+    checkpoint_wall: float
+    resume: str
+    fork_time: float
+    branches: list[dict[str, Any]]
+    sweep: dict[str, list[Any]]
+    sweep_workers: int
 
 
 class OptionalParaList(TypedDict, total=False):
@@ -113,11 +132,91 @@ class OptionalParaList(TypedDict, total=False):
     monitor: int
     log_freq: int
     read_input_freq: int
+    stream_job: bool
+    event_queue: int
+    job_store: int
+    node_file: bool
+    placement: int
+    archive_mem: float
+    coalesce: bool
+    checkpoint: str
+    checkpoint_time: float
+    checkpoint_wall: float
+    resume: str
+    fork_time: float
+    branches: list[dict[str, Any]]
+    sweep: dict[str, list[Any]]
+    sweep_workers: int
 
 
 def cqsim_main(para_list: ParaList):
     pprint(para_list)
 
+    module_sim = cqsim_build(para_list)
+    resume_name = get_resume_name(para_list)
+    if para_list.get("branches"):
+        module_sim.import_events(resume_name)
+        cqsim_branch(para_list, module_sim)
+    else:
+        module_sim.cqsim_sim(resume=resume_name)
+    # module_debug.end_debug()
+
+
+def get_resume_name(para_list: ParaList) -> Optional[str]:
+    if para_list.get("resume"):
+        return para_list["path_fmt"] + para_list["resume"]
+    return None
+
+
+def cqsim_branch(para_list: ParaList, module_sim: Cqsim):
+    """
+    Fork the simulation at `fork_time` into the branches of `para_list`.
+
+    A branch is a dict with a "name" and any of "backfill", "win", "win_para",
+    "alg" and "alg_sign" to override. It writes to the output, debug and
+    checkpoint files of the simulation suffixed by "_" and its name.
+    """
+    branches: list[Branch] = []
+    for branch_para in para_list["branches"]:
+        name = branch_para["name"]
+        output = para_list["path_out"] + para_list["output"] + "_" + name
+        alg = None
+        if branch_para.get("alg"):
+            alg = (
+                branch_para["alg"],
+                branch_para.get("alg_sign", [0] * len(branch_para["alg"])),
+            )
+        win_para = None
+        if branch_para.get("win_para"):
+            win_para = StartWindowPara(*branch_para["win_para"])
+        checkpoint = None
+        if para_list.get("checkpoint"):
+            checkpoint = para_list["path_fmt"] + para_list["checkpoint"] + "_" + name
+        branches.append(
+            Branch(
+                name=name,
+                output={
+                    "sys": output + para_list["ext_si"],
+                    "adapt": output + para_list["ext_ai"],
+                    "result": output + para_list["ext_jr"],
+                },
+                debug=para_list["path_debug"]
+                + para_list["debug"]
+                + "_"
+                + name
+                + para_list["ext_debug"],
+                checkpoint=checkpoint,
+                backfill=branch_para.get("backfill"),
+                win=branch_para.get("win"),
+                win_para=win_para,
+                alg=alg,
+            )
+        )
+    return fork_branches(module_sim, para_list.get("fork_time") or 0, branches)
+
+
+def cqsim_format(para_list: ParaList, module_debug: DebugLog):
+    """Format the job trace and the node structure into the formatted files."""
     trace_name = para_list["path_in"] + para_list["job_trace"]
     save_name_j = para_list["path_fmt"] + para_list["job_save"] + para_list["ext_fmt_j"]
     config_name_j = (
@@ -131,6 +230,52 @@ def cqsim_main(para_list: ParaList):
         para_list["path_fmt"] + para_list["node_save"] + para_list["ext_fmt_n_c"]
     )
 
+    # Job Filter
+    print(".................... Job Filter")
+    dirPath = os.path.dirname(save_name_j)
+    if not os.path.exists(dirPath):
+        os.makedirs(dirPath, exist_ok=True)
+    module_filter_job = JobFilterSWF(
+        trace=trace_name, save=save_name_j, config=config_name_j, debug=module_debug
+    )
+    module_filter_job.feed_job_trace()
+    # module_filter_job.read_job_trace()
+    # module_filter_job.output_job_data()
+    module_filter_job.dump_config()
+
+    # Node Filter
+    print(".................... Node Filter")
+    dirPath = os.path.dirname(save_name_n)
+    if not os.path.exists(dirPath):
+        os.makedirs(dirPath, exist_ok=True)
+    module_filter_node = NodeFilterSWF(
+        struc=struc_name, save=save_name_n, config=config_name_n, debug=module_debug
+    )
+    module_filter_node.read_node_structure()
+    if para_list.get("node_file"):
+        module_filter_node.dump_node_list()
+    module_filter_node.dump_config()
+
+
+def cqsim_build(para_list: ParaList, jobs: Optional[list[Job]] = None) -> Cqsim:
+    """
+    Format the input files and build the simulator with all its modules.
+
+    :param jobs: the jobs already read from the formatted job file.
+        If given, the input files are neither formatted nor read again.
+    """
+
+    save_name_j = para_list["path_fmt"] + para_list["job_save"] + para_list["ext_fmt_j"]
+    config_name_j = (
+        para_list["path_fmt"] + para_list["job_save"] + para_list["ext_fmt_j_c"]
+    )
+    save_name_n = (
+        para_list["path_fmt"] + para_list["node_save"] + para_list["ext_fmt_n"]
+    )
+    config_name_n = (
+        para_list["path_fmt"] + para_list["node_save"] + para_list["ext_fmt_n_c"]
+    )
+
     output_sys = para_list["path_out"] + para_list["output"] + para_list["ext_si"]
     output_adapt = para_list["path_out"] + para_list["output"] + para_list["ext_ai"]
     output_result = para_list["path_out"] + para_list["output"] + para_list["ext_jr"]
@@ -142,6 +287,11 @@ def cqsim_main(para_list: ParaList):
     log_freq_int = para_list["log_freq"]
     para_list["read_input_freq"]
 
+    checkpoint_name = None
+    if para_list.get("checkpoint"):
+        checkpoint_name = para_list["path_fmt"] + para_list["checkpoint"]
+    resume_name = get_resume_name(para_list)
+
     if not os.path.exists(para_list["path_fmt"]):
         os.makedirs(para_list["path_fmt"])
 
@@ -155,33 +305,15 @@ def cqsim_main(para_list: ParaList):
     print(".................... Debug")
     debug_path = para_list["path_debug"] + para_list["debug"] + para_list["ext_debug"]
     module_debug = DebugLog(
-        lvl=para_list["debug_lvl"], show=2, path=debug_path, log_freq=log_freq_int
+        lvl=para_list["debug_lvl"],
+        show=2,
+        path=debug_path,
+        log_freq=log_freq_int,
+        append=resume_name is not None,
     )
 
-    # Job Filter
-    print(".................... Job Filter")
-    dirPath = os.path.dirname(save_name_j)
-    if not os.path.exists(dirPath):
-        os.makedirs(dirPath, exist_ok=True)
-    module_filter_job = JobFilterSWF(
-        trace=trace_name, save=save_name_j, config=config_name_j, debug=module_debug
-    )
-    module_filter_job.feed_job_trace()
-    # module_filter_job.read_job_trace()
-    # module_filter_job.output_job_data()
-    module_filter_job.dump_config()
-
-    # Node Filter
-    print(".................... Node Filter")
-    dirPath = os.path.dirname(save_name_n)
-    if not os.path.exists(dirPath):
-        os.makedirs(dirPath, exist_ok=True)
-    module_filter_node = NodeFilterSWF(
-        struc=struc_name, save=save_name_n, config=config_name_n, debug=module_debug
-    )
-    module_filter_node.read_node_structure()
-    module_filter_node.dump_node_list()
-    module_filter_node.dump_config()
+    if jobs is None:
+        cqsim_format(para_list, module_debug)
 
     # Job Trace
     print(".................... Job Trace")
@@ -192,15 +324,26 @@ def cqsim_main(para_list: ParaList):
         density=para_list["cluster_fraction"],
         read_input_freq=para_list["read_input_freq"],
         debug=module_debug,
+        store=para_list.get("job_store", 1),
     )
-    module_job_trace.import_job_file(save_name_j)
+    if jobs is None:
+        module_job_trace.import_job_file(
+            save_name_j, stream=para_list.get("stream_job", False)
+        )
+    else:
+        module_job_trace.add_jobs(jobs)
     module_job_trace.import_job_config(config_name_j)
 
     # Node Structure
     print(".................... Node Structure")
-    module_node_struc = NodeSWF(debug=module_debug)
-    module_node_struc.import_node_file(save_name_n)
-    module_node_struc.import_node_config(config_name_n)
+    module_node_struc = NodeSWF(
+        debug=module_debug, placement=para_list.get("placement", 1)
+    )
+    node_config = module_node_struc.import_node_config(config_name_n)
+    if para_list.get("node_file"):
+        module_node_struc.import_node_file(save_name_n)
+    else:
+        module_node_struc.import_node_capacity(node_config["max_procs"])
 
     # Backfill
     print(".................... Backfill")
@@ -238,7 +381,24 @@ def cqsim_main(para_list: ParaList):
 
     # Output Log
     print(".................... Output Log")
-    module_output_log = OutputLog(output=output_fn, log_freq=log_freq_int)
+    module_archive = None
+    if para_list.get("archive_mem"):
+        module_archive = JobArchive(memory=int(para_list["archive_mem"] * 2**20))
+    module_output_log = OutputLog(
+        output=output_fn,
+        log_freq=log_freq_int,
+        append=resume_name is not None,
+        archive=module_archive,
+    )
+
+    # Checkpoint
+    print(".................... Checkpoint")
+    module_checkpoint = Checkpoint(
+        debug=module_debug,
+        path=checkpoint_name,
+        sim_interval=para_list.get("checkpoint_time"),
+        wall_interval=para_list.get("checkpoint_wall"),
+    )
 
     # Cqsim Simulator
     print(".................... Cqsim Simulator")
@@ -253,7 +413,11 @@ def cqsim_main(para_list: ParaList):
     )
 
     module_sim = Cqsim(
-        module=module_list, debug=module_debug, monitor=para_list["monitor"]
+        module=module_list,
+        debug=module_debug,
+        monitor=para_list["monitor"],
+        event_queue=para_list.get("event_queue", 2),
+        coalesce=para_list.get("coalesce", False),
+        checkpoint=module_checkpoint,
     )
-    module_sim.cqsim_sim()
-    # module_debug.end_debug()
+    return module_sim
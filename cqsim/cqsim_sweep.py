@@ -0,0 +1,181 @@
+"""
+Parameter sweep for CQSim
+
+Run the simulation for every combination of a grid of `ParaList` values.
+The trace is formatted and parsed once, then the configurations run on a pool
+of forked processes, and their metrics are collected into one summary table.
+"""
+
+from __future__ import annotations
+
+import copy
+import itertools
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from pprint import pprint
+from typing import Any, Optional
+
+import pandas as pd
+
+from cqsim.cqsim.types import Job
+from cqsim.cqsim_main import ParaList, cqsim_build, cqsim_format
+from cqsim.extend import swf
+from cqsim.logging.debug import DebugLog
+from cqsim.result.summary import job_result_summary, load_job_result
+
+# The fields which change the jobs read from the trace
+TRACE_KEYS = ("job_trace", "node_struc", "job_save", "node_save", "anchor", "read_num")
+
+# The fields set or read by the sweep itself, which the grid cannot change
+SWEEP_KEYS = (
+    "output",
+    "debug",
+    "checkpoint",
+    "resume",
+    "branches",
+    "sweep",
+    "sweep_workers",
+)
+
+# The parsed jobs of every trace, inherited by the forked workers
+_sweep_jobs: dict[tuple, list[Job]] = {}
+
+
+def sweep_grid(grid: dict[str, list[Any]]) -> list[dict[str, Any]]:
+    """Every combination of the values of the grid, in order."""
+    keys = list(grid)
+    return [dict(zip(keys, values)) for values in itertools.product(*grid.values())]
+
+
+def check_grid(grid: dict[str, list[Any]]):
+    """Reject the fields of the grid which would not change the configurations."""
+    unknown = [key for key in grid if key not in ParaList.__annotations__]
+    if unknown:
+        raise ValueError(f"Unknown sweep fields {unknown}")
+    fixed = [key for key in grid if key in SWEEP_KEYS]
+    if fixed:
+        raise ValueError(f"Sweep fields {fixed} have no effect in a sweep")
+
+
+def sweep_para_list(para_list: ParaList, overrides: dict[str, Any], name: str):
+    """The parameters of one configuration, writing to files suffixed by its name."""
+    sweep_para: ParaList = copy.deepcopy(para_list) | overrides  # type: ignore
+    sweep_para["output"] = para_list["output"] + "_" + name
+    sweep_para["debug"] = para_list["debug"] + "_" + name
+    if para_list.get("checkpoint"):
+        sweep_para["checkpoint"] = para_list["checkpoint"] + "_" + name
+    sweep_para["resume"] = None  # type: ignore
+    sweep_para["branches"] = None  # type: ignore
+    return sweep_para
+
+
+def trace_key(para_list: ParaList):
+    return tuple(para_list.get(key) for key in TRACE_KEYS)
+
+
+def load_sweep_jobs(para_list: ParaList, module_debug: DebugLog):
+    """Format the trace of the configuration and parse its jobs, once per trace."""
+    key = trace_key(para_list)
+    if key in _sweep_jobs:
+        return
+    cqsim_format(para_list, module_debug)
+    save_name_j = para_list["path_fmt"] + para_list["job_save"] + para_list["ext_fmt_j"]
+    # XREF: JobTrace.import_job_file()
+    _sweep_jobs[key] = list(
+        swf.load_jobs(
+            save_name_j,
+            swf=False,
+            skiprows=para_list["anchor"],
+            nrows=para_list["read_num"],
+        )
+    )
+
+
+def sweep_run(para_list: ParaList):
+    """Run one configuration in a worker, and return its metrics."""
+    module_sim = cqsim_build(para_list, jobs=_sweep_jobs[trace_key(para_list)])
+    module_sim.cqsim_sim()
+    archive = module_sim.module.output.archive
+    if archive is not None:
+        result = archive.frame()
+    else:
+        result = load_job_result(
+            para_list["path_out"] + para_list["output"] + para_list["ext_jr"]
+        )
+    return job_result_summary(result, module_sim.module.node.get_tot())
+
+
+def cqsim_sweep(
+    para_list: ParaList,
+    grid: Optional[dict[str, list[Any]]] = None,
+    max_workers: Optional[int] = None,
+) -> pd.DataFrame:
+    """
+    Run every configuration of the grid, at most `max_workers` at a time.
+
+    :param grid: the values of each `ParaList` field to sweep over,
+        `para_list["sweep"]` by default.
+    :return: the summary table, one row per configuration. It is also written
+        to the output path as `<output>_sweep.csv`.
+    """
+    if grid is None:
+        grid = para_list["sweep"]
+    max_workers = max_workers or para_list.get("sweep_workers")
+
+    check_grid(grid)
+    configs = sweep_grid(grid)
+    print(".................... Sweep: " + str(len(configs)) + " configurations")
+    pprint(grid)
+
+    sweep_paras = [
+        sweep_para_list(para_list, overrides, str(i))
+        for i, overrides in enumerate(configs)
+    ]
+
+    for path in para_list["path_out"], para_list["path_debug"]:
+        os.makedirs(path, exist_ok=True)
+    module_debug = DebugLog(
+        lvl=para_list["debug_lvl"],
+        show=2,
+        path=para_list["path_debug"]
+        + para_list["debug"]
+        + "_sweep"
+        + para_list["ext_debug"],
+        log_freq=para_list["log_freq"],
+    )
+    for sweep_para in sweep_paras:
+        load_sweep_jobs(sweep_para, module_debug)
+
+    # fork, so that the workers share the parsed jobs
+    with ProcessPoolExecutor(
+        max_workers=max_workers, mp_context=multiprocessing.get_context("fork")
+    ) as executor:
+        futures = [executor.submit(sweep_run, para) for para in sweep_paras]
+        summaries: list[dict[str, Any]] = []
+        for i, future in enumerate(futures):
+            # a failed configuration does not stop the others
+            try:
+                summaries.append(future.result())
+            except Exception as e:
+                module_debug.debug("  [Sweep] " + str(i) + " failed: " + repr(e), 2)
+                summaries.append({"error": repr(e)})
+    _sweep_jobs.clear()
+
+    rows: list[dict[str, Any]] = []
+    for i, (overrides, summary) in enumerate(zip(configs, summaries)):
+        # list values such as alg or win_para as one cell
+        row: dict[str, Any] = {"name": str(i)}
+        row |= {
+            key: str(value) if isinstance(value, list) else value
+            for key, value in overrides.items()
+        }
+        row |= summary
+        rows.append(row)
+    table = pd.DataFrame(rows)
+
+    table.to_csv(
+        para_list["path_out"] + para_list["output"] + "_sweep.csv", index=False
+    )
+    print(table.to_string(index=False))
+    return table
@@ -1 +1 @@
-from .format import load, load_header, load_jobs, load_jobs_df
+from .format import load, load_header, load_jobs, load_jobs_chunks, load_jobs_df
@@ -182,8 +182,13 @@ def load_jobs_df(
     swf: bool,
     skiprows: Sequence[int] | int | Callable[[int], bool] = 0,
     nrows: Optional[int] = None,
+    chunksize: Optional[int] = None,
 ):
-    """Load a SWF file from file or buffer."""
+    """
+    Load a SWF file from file or buffer.
+
+    If `chunksize` is set, return a reader yielding data frames of `chunksize` jobs.
+    """
     field_types = dataclass_types_for_pandas(Job)
 
     # Dynamically set the header or names argument
@@ -202,6 +207,7 @@ def load_jobs_df(
             engine="c",
             skiprows=skiprows,
             nrows=nrows,
+            chunksize=chunksize,
         )
     else:
         df = pd.read_csv(
@@ -213,6 +219,7 @@ def load_jobs_df(
             engine="c",
             skiprows=skiprows,
             nrows=nrows,
+            chunksize=chunksize,
         )
 
     return df
@@ -226,7 +233,25 @@ def load_jobs(
 ):
     """Load a SWF file from file or buffer."""
     df = load_jobs_df(filepath_or_buffer, swf, skiprows=skiprows, nrows=nrows)
+    yield from jobs_from_df(df)
+
+
+def load_jobs_chunks(
+    filepath_or_buffer: FilePathOrBuffer,
+    swf: bool,
+    chunksize: int,
+    skiprows: Sequence[int] | int | Callable[[int], bool] = 0,
+    nrows: Optional[int] = None,
+):
+    """Load a SWF file from file or buffer, yielding lists of at most `chunksize` jobs."""
+    with load_jobs_df(
+        filepath_or_buffer, swf, skiprows=skiprows, nrows=nrows, chunksize=chunksize
+    ) as reader:
+        for df in reader:
+            yield list(jobs_from_df(df))
+
 
+def jobs_from_df(df: pd.DataFrame):
     # types = dataclass_types(Job)
     # https://stackoverflow.com/questions/62647887/preserving-dtypes-when-extracting-a-row-from-a-pandas-dataframe
     for index, row in df.astype(object).iterrows():
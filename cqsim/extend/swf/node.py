@@ -1,27 +1,139 @@
-import bisect
 from typing import Optional
 
-from cqsim.cqsim.node import JobInfo, Node, PredictJob, PredictNode
+import pandas as pd
+
+from cqsim.cqsim.node import JobInfo, Node, NodeTable, PredictJob
+from cqsim.cqsim.placement import BlockIndex, PlacementMode
+from cqsim.cqsim.profile import AvailProfile
+from cqsim.logging.debug import DebugLog
 from cqsim.types import Time
 
 
 class NodeSWF(Node):
+    """
+    The nodes as counts of cores only.
+
+    The predictions are made on `profile`, kept up to date as jobs start and
+    finish, instead of on `predict_nodes`.
+
+    Unless the placement is `PlacementMode.ANY`, a job also needs a block of
+    consecutive free slots of `blocks`, the nodes in the order of their group
+    and location (from the node file, or a single group without it). The jobs
+    and the reservations take the first block that fits, so that the jobs
+    started by backfill get the blocks predicted for them. A slot is held
+    from now until the end of its job or reservation, and counts as free from
+    then on; the reservations made from a later start only book their block
+    from then, and the jobs reserved from now start on the block they were given.
+    """
+
+    profile: AvailProfile
+    placement: PlacementMode
+    blocks: Optional[BlockIndex]
+    # The (first slot, cores) of the block of each running job
+    places: dict[int, tuple[int, int]]
+    # The first slot of the block of each job reserved from now at a given start
+    predict_places: dict[int, int]
+
+    def __init__(self, debug: DebugLog, placement: int = 1):
+        super().__init__(debug)
+        self.profile = AvailProfile(0, 0)
+        self.placement = PlacementMode(placement)
+        self.blocks = None
+        self.places = {}
+        self.predict_places = {}
+
+    def reset(self, debug: DebugLog, placement: Optional[int] = None):
+        super().reset(debug)
+        self.profile = AvailProfile(0, 0)
+        if placement:
+            self.placement = PlacementMode(placement)
+        self.blocks = None
+        self.places = {}
+        self.predict_places = {}
+
+    def set_totals(self, total_cores: int):
+        super().set_totals(total_cores)
+        self.profile = AvailProfile(0, total_cores)
+        self.blocks = self.new_blocks()
+        self.places = {}
+        self.predict_places = {}
+
+    def new_blocks(self):
+        if self.placement == PlacementMode.ANY:
+            return None
+        local = self.placement == PlacementMode.GROUP
+        if self.nodes:
+            return BlockIndex.from_nodes(self.nodes, local=local)
+        assert self.total_cores is not None
+        return BlockIndex([1] * self.total_cores, local=local)
+
+    def import_node_file(self, node_file: str):
+        if self.placement != PlacementMode.ANY:
+            # the groups and locations of the nodes give their slots
+            super().import_node_file(node_file)
+            self.table = NodeTable()
+            return
+        # only the count of nodes is used
+        df = pd.read_csv(node_file, usecols=["id"], comment=";")
+        self.import_node_capacity(len(df))
+
+    def import_node_capacity(self, total_cores: int):
+        self.nodes = []
+        self.table = NodeTable()
+        self.set_totals(total_cores)
+
+    def get_state(self):
+        # only the counts are used, the nodes never change
+        state = super().get_state()
+        del state["nodes"]
+        del state["table"]
+        if self.blocks is not None:
+            self.blocks.reset()
+            state["blocks"] = self.blocks
+            state["places"] = self.places
+        return state
+
+    def set_state(self, state: dict):
+        super().set_state(state)
+        assert self.idle_cores is not None
+        self.profile = AvailProfile(self.profile.time, self.idle_cores, self.jobs)
+        if "blocks" in state:
+            self.blocks = state["blocks"]
+            self.places = state["places"]
+
+    def is_available(self, cores: int):
+        if self.blocks is None:
+            return super().is_available(cores)
+        # the blocks of the predictions are not taken
+        self.blocks.reset()
+        return super().is_available(cores) and self.blocks.fits(cores)
+
     def node_allocate(self, cores: int, job_index: int, start: Time, end: Time):
         assert self.idle_cores is not None
 
         if not self.is_available(cores):
             return False
 
+        if self.blocks is not None:
+            slot = self.predict_places.pop(job_index, None)
+            if slot is None or not self.blocks.is_free(slot, cores):
+                slot = self.blocks.find(cores)
+            assert slot is not None
+            self.blocks.take(slot, cores, end)
+            self.places[job_index] = (slot, cores)
+
         self.idle_cores -= cores
         self.available_cores = self.idle_cores
 
-        # Insert job into jobs list, keeping it sorted by end time
+        # Add the job to the allocations, kept in end time order
         job_info = JobInfo(
             job=job_index,
             end=end,
             cores=cores,
         )
-        bisect.insort(self.jobs, job_info, key=lambda x: x.end)
+        self.jobs.add(job_info)
+        self.profile.reset()
+        self.profile.add(end, cores)
 
         self.debug.debug(
             "  Allocate"
@@ -40,15 +152,16 @@ class NodeSWF(Node):
     def node_release(self, job_index: int, end: Time):
         assert self.idle_cores is not None
 
-        # find matching job in jobs list
-        for index, job in enumerate(self.jobs):
-            if job.job == job_index:
-                job = self.jobs.pop(index)
-                self.idle_cores += job.cores
-                self.available_cores = self.idle_cores
-                break
-        else:
+        if job_index not in self.jobs:
             raise ValueError(f"Job {job_index} not found in {self.jobs}")
+        job = self.jobs.pop(job_index)
+        self.profile.reset()
+        self.profile.remove(job.end, job.cores)
+        if self.blocks is not None:
+            self.blocks.reset()
+            self.blocks.give(*self.places.pop(job_index))
+        self.idle_cores += job.cores
+        self.available_cores = self.idle_cores
 
         self.debug.debug(
             "  Release"
@@ -56,13 +169,27 @@ class NodeSWF(Node):
             + str(job_index)
             + "]"
             + " Req:"
-            + str(index)
+            + str(job.cores)
             + " Avail:"
             + str(self.available_cores)
             + " ",
             4,
         )
 
+    def predict_avail(self, cores: int, start: Time, end: Optional[Time] = None):
+        """
+        If the cores are available between start and end
+
+        The block of a placement must be free from `start` until `end`, around
+        the blocks booked by the reservations (see `BlockIndex.find_at`).
+        """
+        if not end or end < start:
+            end = start
+        free = self.profile.min_free(start, end)
+        if free is not None and free < cores:
+            return False
+        return self.blocks is None or self.blocks.fits_at(cores, start, end)
+
     def reserve(
         self,
         cores: int,
@@ -71,100 +198,69 @@ class NodeSWF(Node):
         start: Optional[Time] = None,
         index: Optional[int] = None,
     ):
-        assert self.idle_cores is not None
-        assert self.total_cores is not None
+        """
+        Reserve the cores for `time` from `start` if they are free then, or else
+        from the breakpoint at `index` if the cores are free from the start of
+        the profile until it ends (and are held from the start of the profile).
 
+        :return: the position of the breakpoint added at the end of the reservation,
+            None if there already was one or the cores are not free.
+        """
         if index is None:
             index = 0
-        if index not in range(len(self.predict_nodes)):
-            # return None
-            raise ValueError(f"Index {index} not in range {len(self.predict_nodes)}")
+        if index not in range(len(self.profile)):
+            raise ValueError(f"Index {index} not in range {len(self.profile)}")
 
+        held_from = start
         if start is None:
-            while index < len(self.predict_nodes):
-                node = self.predict_nodes[index]
-                if cores <= node.avail:
-                    if i := self.find_res_place(cores, index, time):
-                        index = i + 1
-                    else:
-                        start = node.time
-                        break
-                else:  # cores > node.avali
-                    index += 1
-            else:
-                assert index >= len(self.predict_nodes)
+            start, free = self.profile.breakpoint(index)
+            min_free = self.profile.min_free(self.profile.time, start + time)
+            if free < cores or (min_free is not None and min_free < cores):
                 return None
-        elif not self.predict_avail(cores, start, start + time):
-            return None
-
-        assert start is not None
-        end = start + time
-
-        reserve_index = None
-        for i, node in enumerate(self.predict_nodes, start=index):
-            if node.time < end:
-                node.idle -= cores
-                node.avail = node.idle
-            elif node.time == end:
-                break
-            else:
-                last_node = self.predict_nodes[i - 1]
-                node = PredictNode(
-                    time=end,
-                    idle=last_node.idle + cores,
-                    avail=last_node.idle + cores,
-                )
-
-                self.predict_nodes.insert(
-                    i,
-                    node,
-                )
-                reserve_index = i
-                break
         else:
-            self.predict_nodes.append(
-                PredictNode(time=end, idle=self.total_cores, avail=self.total_cores)
-            )
-            reserve_index = len(self.predict_nodes) - 1
+            # the block is looked for as it is reserved
+            free = self.profile.min_free(start, max(start + time, start))
+            if free is not None and free < cores:
+                return None
 
+        end = start + time
+        # a job reserved from now at a given start is started on its block
+        starts_now = held_from is not None and held_from <= self.profile.time
+        if starts_now:
+            held_from = None
+        if self.blocks is not None and (
+            end != self.profile.time if held_from is None else end > held_from
+        ):
+            slot = self.blocks.reserve(cores, end, held_from)
+            if slot is None:
+                return None
+            if starts_now:
+                self.predict_places[job_index] = slot
+        reserve_index = self.profile.reserve(end, cores, held_from)
         self.predict_jobs.append(PredictJob(job=job_index, start=start, end=end))
         return reserve_index
 
-    def predict_reset(self, time: Time) -> None:
-        assert self.idle_cores is not None
-        assert self.available_cores is not None
+    def predict_start(self, cores: int, time: Time):
+        """The earliest time from which the cores are free for `time`, None if never."""
+        start = self.profile.earliest_start(cores, time)
+        if self.blocks is None or start is None:
+            return start
+        # the block only has to be tried again after the next end time, and
+        # the cores from there
+        while start is not None:
+            if self.blocks.fits_at(cores, start, start + time):
+                return start
+            start = self.blocks.next_end(start)
+            if start is not None and self.profile.free_at(start) < cores:
+                start = self.profile.next_free(cores, start)
+            if start is not None:
+                start = self.profile.earliest_start(cores, time, start)
+        return start
 
-        node = PredictNode(time=time, idle=self.idle_cores, avail=self.available_cores)
-        self.predict_nodes = [node]
+    def predict_reset(self, time: Time) -> None:
+        self.profile.reset(time)
+        if self.blocks is not None:
+            self.blocks.reset()
+            self.blocks.time = time
+        self.predict_places = {}
         self.predict_jobs = []
-
-        for i, job in enumerate(self.jobs):
-            if job.end != node.time or i == 0:
-                if i != 0:
-                    assert job.end > node.time
-                # a copy of current node with the new time
-                node = PredictNode(
-                    time=job.end,
-                    idle=node.idle,
-                    avail=node.avail,
-                )
-                self.predict_nodes.append(node)
-
-            assert job.end == node.time
-            node.idle += job.cores
-            node.avail = self.predict_nodes[-1].idle
-
-    def find_res_place(self, cores: int, index: int, time: Time):
-        """
-        In self.predict_nodes[index:], find the index of the first node that has enough cores
-        and is available for the given time.
-        """
-        # self.debug.debug("* "+self.display_name+" -- find_res_place",5)
-        if index >= len(self.predict_nodes):
-            index = len(self.predict_nodes) - 1
-
-        end = self.predict_nodes[index].time + time
-
-        for i, node in enumerate(self.predict_nodes, index):
-            if node.time < end and cores > node.avail:
-                return i
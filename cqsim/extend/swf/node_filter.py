@@ -9,18 +9,27 @@ from cqsim.filter.node import ConfigData, NodeData
 
 
 class NodeFilterSWF(NodeFilter):
+    headers: dict[str, str]
+
     def reset_config(self):
         self.config_data = None
+        self.headers = {}
 
     def read_node_structure(self):
         with open(self.struc, "r") as f:
             headers = swf.load_header(f)
-        self.build_node_list(headers)
+        self.headers = headers
 
         max_procs = int(headers["MaxProcs"])
         max_nodes = int(headers["MaxNodes"])
         self.config_data = ConfigData(max_nodes=max_nodes, max_procs=max_procs)
 
+    def get_node_data(self):
+        """The per-processor node list, only built when asked for."""
+        if not self.node_list and self.headers:
+            self.build_node_list(self.headers)
+        return super().get_node_data()
+
     def build_node_list(self, node_info: dict[str, str]):
         self.node_list = [NodeData(id=i + 1) for i in range(int(node_info["MaxProcs"]))]
 
@@ -34,7 +43,7 @@ class NodeFilterSWF(NodeFilter):
         # nodes = [dataclasses.asdict(n) for n in self.node_list]
         # json.dump(nodes, f)
 
-        df = pd.DataFrame([dataclasses.asdict(n) for n in self.node_list])
+        df = pd.DataFrame([dataclasses.asdict(n) for n in self.get_node_data()])
         df.to_csv(self.save, index=False)
 
     def dump_config(self):
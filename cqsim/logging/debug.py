@@ -14,6 +14,7 @@ class DebugLog:
         show: int = 2,
         path: Optional[StrOrBytesPath] = None,
         log_freq: int = 1,
+        append: bool = False,
     ):
         self.display_name = "Debug"
         self.lvl = lvl
@@ -22,7 +23,10 @@ class DebugLog:
         self.debugFile = LogFile(self.path, "w")
         self.DebugLog_buf = []
         self.log_freq = log_freq
-        self.reset_log()
+        if append:
+            self.debugFile.reset(self.path, "a")
+        else:
+            self.reset_log()
 
     def reset(
         self,
@@ -48,6 +52,14 @@ class DebugLog:
         self.debugFile.file_close()
         self.debugFile.reset(self.path, "a")
 
+    def get_state(self):
+        """The buffered lines and the size of the log file, for checkpoints."""
+        return {"buf": self.DebugLog_buf, "size": self.debugFile.file_size()}
+
+    def set_state(self, state: dict):
+        self.DebugLog_buf = state["buf"]
+        self.debugFile.file_truncate(state["size"])
+
     def set_lvl(self, lvl: int = 0):
         self.lvl = lvl
 
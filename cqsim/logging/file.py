@@ -43,3 +43,17 @@ class LogFile:
         self.logFile.write(str(context))
         if isEnter == 1:
             self.logFile.write("\n")
+
+    def file_size(self):
+        """Size of the file in bytes, 0 if it does not exist."""
+        if not self.filePath or not os.path.exists(self.filePath):
+            return 0
+        return os.path.getsize(self.filePath)
+
+    def file_truncate(self, size: int):
+        """Cut the file back to `size` bytes, used to resume from a checkpoint."""
+        if not self.filePath:
+            return 0
+        with open(self.filePath, "a") as f:
+            f.truncate(size)
+        return 1
@@ -3,6 +3,7 @@ from typing import Optional, TypedDict
 from cqsim.cqsim.info_collect import NodeInfo
 from cqsim.cqsim.job_trace import JobTrace, JobTraceInfo
 from cqsim.logging.file import LogFile
+from cqsim.result.archive import ARCHIVE_EXT, JobArchive
 
 
 class Output(TypedDict):
@@ -12,17 +13,37 @@ class Output(TypedDict):
 
 
 class OutputLog:
+    """
+    Write the job results and the system information to the output files.
+
+    Without output files, the records are kept in `job_results` and `sys_infos`.
+    With an `archive`, the finished jobs are also archived there, and no longer
+    kept in `job_results`. Its spill file is the job result file + ARCHIVE_EXT.
+    """
+
     job_buf: list[JobTraceInfo]
     sys_info_buf: list[NodeInfo]
+    job_results: list[JobTraceInfo]
+    sys_infos: list[NodeInfo]
+    archive: Optional[JobArchive]
 
-    def __init__(self, output: Optional[Output] = None, log_freq=1):
+    def __init__(
+        self,
+        output: Optional[Output] = None,
+        log_freq=1,
+        append=False,
+        archive: Optional[JobArchive] = None,
+    ):
         self.display_name = "Output_log"
         self.output_path = output
+        self.archive = archive
         self.sys_info_buf = []
         self.job_buf = []
+        self.job_results = []
+        self.sys_infos = []
         self.log_freq = log_freq
         # print('log_freq+++++++',self.log_freq)
-        self.reset_output()
+        self.reset_output(append)
 
     def reset(self, output: Optional[Output] = None, log_freq=1):
         if output:
@@ -31,28 +52,69 @@ class OutputLog:
             self.job_buf = []
             self.log_freq = log_freq
             self.reset_output()
+        self.job_results = []
+        self.sys_infos = []
+        if self.archive is not None:
+            self.archive.reset()
 
-    def reset_output(self):
+    def reset_output(self, append=False):
+        """Clear the output files, or keep them when `append` (resuming a checkpoint)."""
         if self.output_path is None:
             return
+        if self.archive is not None:
+            self.archive.reset(self.output_path["result"] + ARCHIVE_EXT, append)
         self.sys_info = LogFile(self.output_path["sys"], "w")
-        self.sys_info.reset(self.output_path["sys"], "w")
-        self.sys_info.file_open()
-        self.sys_info.file_close()
+        if not append:
+            self.sys_info.reset(self.output_path["sys"], "w")
+            self.sys_info.file_open()
+            self.sys_info.file_close()
         self.sys_info.reset(self.output_path["sys"], "a")
 
         self.adapt_info = LogFile(self.output_path["adapt"], "w")
-        self.adapt_info.reset(self.output_path["adapt"], "w")
-        self.adapt_info.file_open()
-        self.adapt_info.file_close()
+        if not append:
+            self.adapt_info.reset(self.output_path["adapt"], "w")
+            self.adapt_info.file_open()
+            self.adapt_info.file_close()
         self.adapt_info.reset(self.output_path["adapt"], "a")
 
         self.job_result = LogFile(self.output_path["result"], "w")
-        self.job_result.reset(self.output_path["result"], "w")
-        self.job_result.file_open()
-        self.job_result.file_close()
+        if not append:
+            self.job_result.reset(self.output_path["result"], "w")
+            self.job_result.file_open()
+            self.job_result.file_close()
         self.job_result.reset(self.output_path["result"], "a")
 
+    def get_state(self):
+        """The buffered records and the size of each output file, for checkpoints."""
+        state: dict = {
+            "sys_info_buf": self.sys_info_buf,
+            "job_buf": self.job_buf,
+            "job_results": self.job_results,
+            "sys_infos": self.sys_infos,
+        }
+        if self.output_path is not None:
+            state["sizes"] = {
+                "sys": self.sys_info.file_size(),
+                "adapt": self.adapt_info.file_size(),
+                "result": self.job_result.file_size(),
+            }
+        if self.archive is not None:
+            state["archive"] = self.archive.get_state()
+        return state
+
+    def set_state(self, state: dict):
+        self.sys_info_buf = state["sys_info_buf"]
+        self.job_buf = state["job_buf"]
+        self.job_results = state.get("job_results", [])
+        self.sys_infos = state.get("sys_infos", [])
+        if self.output_path is not None and "sizes" in state:
+            # drop whatever was written after the checkpoint
+            self.sys_info.file_truncate(state["sizes"]["sys"])
+            self.adapt_info.file_truncate(state["sizes"]["adapt"])
+            self.job_result.file_truncate(state["sizes"]["result"])
+        if self.archive is not None and "archive" in state:
+            self.archive.set_state(state["archive"])
+
     def print_sys_info(self, sys_info=None):
         """
         sep_sign=";"
@@ -77,6 +139,10 @@ class OutputLog:
         """
         if sys_info != None:
             self.sys_info_buf.append(sys_info)
+        if self.output_path is None:
+            self.sys_infos.extend(self.sys_info_buf)
+            self.sys_info_buf = []
+            return
         if (len(self.sys_info_buf) >= self.log_freq) or (sys_info == None):
             sep_sign = ";"
             sep_sign_B = " "
@@ -106,6 +172,8 @@ class OutputLog:
         sep_sign = ";"
         context = ""
         if adapt_info is None:
+            if self.output_path is None:
+                return
             adapt_info = self.adapt_info
         adapt_info.file_open()
         adapt_info.log_print(context, 1)
@@ -114,6 +182,13 @@ class OutputLog:
     def print_result(self, job_module: JobTrace, job_index: Optional[int] = None):
         if job_index != None:
             self.job_buf.append(job_module.job_info(job_index))
+            if self.archive is not None:
+                self.archive.append(self.job_buf[-1])
+        if self.output_path is None:
+            if self.archive is None:
+                self.job_results.extend(self.job_buf)
+            self.job_buf = []
+            return
         if (len(self.job_buf) >= self.log_freq) or (job_index == None):
             self.job_result.file_open()
             sep_sign = ";"
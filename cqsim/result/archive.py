@@ -0,0 +1,150 @@
+"""
+Archive of the finished jobs of a simulation
+
+Only the result columns of a finished job are kept, as a row of a preallocated
+NumPy structured array. Once the array is full, its rows are appended to a spill
+file as one chunk and the array is reused, so the memory stays flat however
+long the trace is.
+"""
+
+import os
+from typing import Any, Iterator, Optional
+
+import numpy as np
+import pandas as pd
+
+from cqsim.types import StrOrBytesPath
+
+# XREF: OutputLog.print_result()
+RESULT_COLUMNS = [
+    "id",
+    "requested_number_processors",
+    "allocated_processors",
+    "requested_time",
+    "run_time",
+    "wait_time",
+    "submit_time",
+    "start_time",
+    "end_time",
+]
+
+# The result file has the requested processors twice, the archive once
+ARCHIVE_DTYPE = np.dtype(
+    [
+        ("id", np.int64),
+        ("requested_number_processors", np.int64),
+        ("requested_time", np.float64),
+        ("run_time", np.float64),
+        ("wait_time", np.float64),
+        ("submit_time", np.float64),
+        ("start_time", np.float64),
+        ("end_time", np.float64),
+    ]
+)
+
+# Appended to the job result file name for the spill file
+ARCHIVE_EXT = ".npy"
+
+
+class JobArchive:
+    """
+    The finished jobs, in a structured array of `ARCHIVE_DTYPE` rows.
+
+    With `memory` (bytes) and a spill file, the array holds `memory` bytes of
+    rows, and is written out to the file as a chunk each time it is full.
+    Otherwise the array grows as needed.
+    """
+
+    rows: np.ndarray
+    # Number of rows in use in `rows`
+    count: int
+    # Number of rows in the spill file
+    spilled: int
+    path: Optional[StrOrBytesPath]
+
+    def __init__(
+        self, memory: Optional[int] = None, path: Optional[StrOrBytesPath] = None
+    ):
+        self.memory = memory
+        capacity = max(1, memory // ARCHIVE_DTYPE.itemsize) if memory else 1024
+        self.rows = np.empty(capacity, dtype=ARCHIVE_DTYPE)
+        self.count = 0
+        self.spilled = 0
+        self.path = None
+        self.reset(path)
+
+    def reset(self, path: Optional[StrOrBytesPath] = None, append=False):
+        """Set the spill file, and clear the archive unless `append` (resuming a checkpoint)."""
+        if path:
+            self.path = path
+        if append:
+            return
+        self.count = 0
+        self.spilled = 0
+        if self.path and os.path.exists(self.path):
+            os.remove(self.path)
+
+    def __len__(self):
+        return self.spilled + self.count
+
+    def append(self, job: Any):
+        """Archive a finished job, from any object with the result fields."""
+        if self.count == len(self.rows):
+            self.spill()
+        self.rows[self.count] = tuple(getattr(job, name) for name in ARCHIVE_DTYPE.names)  # type: ignore
+        self.count += 1
+
+    def spill(self):
+        """Write the rows out to the spill file, or grow the array without one."""
+        if self.path is None or self.memory is None:
+            rows = np.empty(2 * len(self.rows), dtype=ARCHIVE_DTYPE)
+            rows[: self.count] = self.rows[: self.count]
+            self.rows = rows
+            return
+        with open(self.path, "ab") as f:
+            np.save(f, self.rows[: self.count])
+        self.spilled += self.count
+        self.count = 0
+
+    def chunks(self) -> Iterator[np.ndarray]:
+        """The archived rows, a chunk at a time: the spilled ones first."""
+        if self.spilled:
+            assert self.path is not None
+            size = os.path.getsize(self.path)
+            with open(self.path, "rb") as f:
+                while f.tell() < size:
+                    yield np.load(f)
+        yield self.rows[: self.count]
+
+    def array(self):
+        """All the archived rows, in one array."""
+        return np.concatenate(list(self.chunks()))
+
+    def frame(self):
+        """The archived jobs, as `load_job_result` would load them from the result file."""
+        rows = self.array()
+        columns = {name: rows[name] for name in ARCHIVE_DTYPE.names}  # type: ignore
+        columns["allocated_processors"] = rows["requested_number_processors"]
+        return pd.DataFrame(columns, columns=RESULT_COLUMNS)
+
+    def get_state(self):
+        """The rows in memory and the size of the spill file, for checkpoints."""
+        return {
+            "rows": self.rows[: self.count].copy(),
+            "spilled": self.spilled,
+            "size": os.path.getsize(self.path)
+            if self.path and os.path.exists(self.path)
+            else 0,
+        }
+
+    def set_state(self, state: dict):
+        rows = state["rows"]
+        if len(rows) > len(self.rows):
+            self.rows = np.empty(len(rows), dtype=ARCHIVE_DTYPE)
+        self.rows[: len(rows)] = rows
+        self.count = len(rows)
+        self.spilled = state["spilled"]
+        if self.path and os.path.exists(self.path):
+            # drop the chunks spilled after the checkpoint
+            with open(self.path, "ab") as f:
+                f.truncate(state["size"])
@@ -0,0 +1,46 @@
+"""
+Summary metrics of the job result of a simulation
+"""
+
+import pandas as pd
+
+from cqsim.result.archive import RESULT_COLUMNS
+from cqsim.types import FilePathOrBuffer
+
+
+def load_job_result(filepath_or_buffer: FilePathOrBuffer) -> pd.DataFrame:
+    """Load the job result (.rst) file written by `OutputLog`."""
+    return pd.read_csv(filepath_or_buffer, sep=";", header=None, names=RESULT_COLUMNS)
+
+
+def job_result_summary(
+    result: pd.DataFrame, total_cores: int, bsld_threshold: float = 10
+) -> dict[str, float]:
+    """
+    The usual scheduling metrics of a job result.
+
+    :param total_cores: the number of cores of the system, for the utilization.
+    :param bsld_threshold: the run time under which a job counts as this long
+        in the bounded slowdown.
+    """
+    if len(result) == 0:
+        return {"jobs": 0}
+
+    makespan = float(result["end_time"].max() - result["submit_time"].min())
+    wait_time = result["start_time"] - result["submit_time"]
+    run_time = result["end_time"] - result["start_time"]
+    bounded_slowdown = (
+        (wait_time + run_time) / run_time.clip(lower=bsld_threshold)
+    ).clip(lower=1)
+    core_seconds = (run_time * result["requested_number_processors"]).sum()
+    return {
+        "jobs": len(result),
+        "makespan": makespan,
+        "avg_wait": float(wait_time.mean()),
+        "max_wait": float(wait_time.max()),
+        "avg_bsld": float(bounded_slowdown.mean()),
+        "max_bsld": float(bounded_slowdown.max()),
+        "utilization": float(core_seconds / (makespan * total_cores))
+        if makespan > 0
+        else 0.0,
+    }
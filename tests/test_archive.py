@@ -0,0 +1,84 @@
+import os
+import random
+from types import SimpleNamespace
+
+import numpy as np
+
+import cqsim.cqsim  # noqa: F401 (the package imports its modules in order)
+from cqsim.result.archive import ARCHIVE_DTYPE, RESULT_COLUMNS, JobArchive
+
+
+def finished_jobs(count, seed=0):
+    rng = random.Random(seed)
+    for i in range(count):
+        submit = float(rng.randint(0, 10**6))
+        wait = float(rng.randint(0, 10**4))
+        run = float(rng.randint(1, 10**4))
+        yield SimpleNamespace(
+            id=i + 1,
+            requested_number_processors=rng.randint(1, 64),
+            requested_time=run + rng.randint(0, 100),
+            run_time=run,
+            wait_time=wait,
+            submit_time=submit,
+            start_time=submit + wait,
+            end_time=submit + wait + run,
+        )
+
+
+def rows_of(jobs):
+    return np.array(
+        [tuple(getattr(job, name) for name in ARCHIVE_DTYPE.names) for job in jobs],
+        dtype=ARCHIVE_DTYPE,
+    )
+
+
+def test_grows_without_a_spill_file():
+    archive = JobArchive()
+    jobs = list(finished_jobs(3000))
+    for job in jobs:
+        archive.append(job)
+    assert len(archive) == 3000 and archive.spilled == 0
+    assert np.array_equal(archive.array(), rows_of(jobs))
+
+
+def test_spills_in_chunks(tmp_path):
+    path = tmp_path / "result.rst.npy"
+    archive = JobArchive(memory=10 * ARCHIVE_DTYPE.itemsize, path=path)
+    assert len(archive.rows) == 10
+    jobs = list(finished_jobs(95))
+    for job in jobs:
+        archive.append(job)
+    # the array is reused: only the last rows are in memory
+    assert len(archive.rows) == 10
+    assert archive.spilled == 90 and archive.count == 5
+    assert [len(chunk) for chunk in archive.chunks()] == [10] * 9 + [5]
+    assert np.array_equal(archive.array(), rows_of(jobs))
+
+    frame = archive.frame()
+    assert list(frame.columns) == RESULT_COLUMNS
+    assert frame["id"].tolist() == [job.id for job in jobs]
+    assert frame["allocated_processors"].equals(frame["requested_number_processors"])
+
+    archive.reset()
+    assert len(archive) == 0 and not os.path.exists(path)
+
+
+def test_resume_from_a_checkpoint(tmp_path):
+    path = tmp_path / "result.rst.npy"
+    jobs = list(finished_jobs(57))
+    archive = JobArchive(memory=8 * ARCHIVE_DTYPE.itemsize, path=path)
+    for job in jobs[:30]:
+        archive.append(job)
+    state = archive.get_state()
+    # the run goes on after the checkpoint, and stops
+    for job in finished_jobs(20, seed=1):
+        archive.append(job)
+
+    resumed = JobArchive(memory=8 * ARCHIVE_DTYPE.itemsize)
+    resumed.reset(path, append=True)
+    resumed.set_state(state)
+    assert len(resumed) == 30
+    for job in jobs[30:]:
+        resumed.append(job)
+    assert np.array_equal(resumed.array(), rows_of(jobs))
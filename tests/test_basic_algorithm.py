@@ -0,0 +1,37 @@
+import numpy as np
+import pytest
+
+import cqsim.cqsim  # noqa: F401 (the package imports its modules in order)
+from cqsim.cqsim.basic_algorithm import BasicAlgorithm
+from cqsim.logging.debug import DebugLog
+
+
+def score(expr, tmp_path, submit, now):
+    alg = BasicAlgorithm(0, ([expr], [1]), DebugLog(lvl=1, path=tmp_path / "log"))
+    columns = {
+        "submit_time": np.array(submit),
+        "requested_time": np.array([10] * len(submit)),
+        "requested_number_processors": np.array([2] * len(submit)),
+    }
+    return alg, alg.get_score(None, now, columns=columns)
+
+
+def test_scores_match_the_scalar_expression(tmp_path):
+    alg, scores = score("wfp3", tmp_path, [0, 5, 9], 20)
+    assert alg.vectorized
+    assert scores == pytest.approx([(w / 10.0) ** 3 * 2.0 for w in (20, 15, 11)])
+
+
+@pytest.mark.filterwarnings("ignore:divide by zero")
+def test_a_floating_point_error_falls_back_for_the_call(tmp_path):
+    # the job submitted now has waited 0: log(0) raises on arrays only
+    alg, scores = score("np.log(w) * n", tmp_path, [0, 20], 20)
+    assert alg.vectorized
+    assert scores[1] == -np.inf
+
+
+def test_an_expression_without_arrays_is_not_vectorized(tmp_path):
+    alg, scores = score("max(w, t) / t", tmp_path, [0, 15], 20)
+    assert not alg.vectorized
+    assert scores == [2.0, 1.0]
+    assert "is not vectorized" in (tmp_path / "log").read_text()
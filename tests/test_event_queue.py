@@ -0,0 +1,116 @@
+import random
+
+import pytest
+
+import cqsim.cqsim  # noqa: F401 (the package imports its modules in order)
+from cqsim.cqsim.event_queue import (
+    CalendarEventQueue,
+    EventQueueMode,
+    HeapEventQueue,
+    ListEventQueue,
+    MonitorTimer,
+    create_event_queue,
+)
+from cqsim.cqsim.types import Event, EventPara, EventState, EventType
+
+BACKENDS = [
+    HeapEventQueue,
+    CalendarEventQueue,
+    lambda: CalendarEventQueue(width=0.01),
+    lambda: CalendarEventQueue(width=1e6),
+]
+
+
+def random_ops(seed, steps=300):
+    """Pushes and pops of job events, in bursts which grow and shrink the queue."""
+    rng = random.Random(seed)
+    now = 0
+    job_index = 0
+    for _ in range(steps):
+        if rng.random() < 0.05:
+            # a quiet spell, longer than a year of the calendar
+            now += rng.choice([10**4, 10**6])
+        grow = rng.random() < 0.5
+        for _ in range(rng.randint(1, 40)):
+            if grow or rng.random() < 0.3:
+                time = now + rng.choice([0, 0, 1, rng.randint(0, 100), 1e5])
+                if rng.random() < 0.2:
+                    time += rng.random()
+                state = rng.choice([EventState.SUBMIT, EventState.FINISH])
+                prio = 2 if state == EventState.SUBMIT else 1
+                job_index += 1
+                yield "push", Event(
+                    EventType.JOB, time, prio, EventPara(state, job_index)
+                )
+            else:
+                yield "pop", None
+
+
+@pytest.mark.parametrize("backend", range(len(BACKENDS)))
+@pytest.mark.parametrize("seed", range(10))
+def test_same_order_as_the_list(seed, backend):
+    reference = ListEventQueue()
+    queue = BACKENDS[backend]()
+    for op, event in random_ops(seed):
+        if op == "push":
+            reference.push(event)
+            queue.push(event)
+        elif reference:
+            assert queue.peek() == reference.peek()
+            event = reference.pop()
+            assert queue.pop() == event
+        assert len(queue) == len(reference)
+        assert bool(queue) == bool(reference)
+    while reference:
+        assert queue.pop() == reference.pop()
+    assert not queue
+
+
+def test_calendar_resizes_with_the_queue():
+    queue = CalendarEventQueue()
+    events = [
+        Event(EventType.JOB, 7.0 * i, 1, EventPara(EventState.FINISH, i))
+        for i in range(100)
+    ]
+    for event in reversed(events):
+        queue.push(event)
+    # grown past twice the buckets, the width is set from the gaps
+    assert queue.nbuckets >= 64
+    assert queue.width == 21.0
+    popped = [queue.pop() for _ in range(99)]
+    assert popped == events[:99]
+    assert queue.nbuckets == CalendarEventQueue.MIN_BUCKETS
+    queue.reset()
+    assert len(queue) == 0 and queue.width == 1.0
+    with pytest.raises(IndexError):
+        queue.peek()
+
+
+def test_list_index_hint():
+    queue = ListEventQueue()
+    late = Event(EventType.JOB, 10, 1, EventPara(EventState.FINISH, 1))
+    queue.push(late)
+    # monitor events have always been inserted at the position given
+    monitor = Event(EventType.MONITOR, 20, 5, None)
+    queue.push(monitor, 0)
+    assert queue.pop() == monitor
+    assert queue.pop() == late
+
+
+@pytest.mark.parametrize("mode", list(EventQueueMode))
+def test_create_event_queue(mode):
+    queue = create_event_queue(mode)
+    assert isinstance(queue, (ListEventQueue, HeapEventQueue, CalendarEventQueue))
+    assert len(queue) == 0
+
+
+def test_monitor_timer():
+    timer = MonitorTimer(500)
+    assert not timer.started() and not timer.due(1000)
+    timer.start(1200)
+    assert timer.next_time == 1500
+    assert not timer.due(1500) and timer.due(1501)
+    assert timer.pop().time == 1500
+    assert timer.next_time == 2000
+    timer.start(2000)
+    assert timer.next_time == 2000
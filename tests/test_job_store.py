@@ -0,0 +1,135 @@
+import copy
+import dataclasses
+import pickle
+import random
+
+import numpy as np
+import pytest
+
+import cqsim.cqsim  # noqa: F401 (the package imports its modules in order)
+from cqsim.cqsim.job_store import JobRow, JobStore
+from cqsim.cqsim.job_trace import (
+    JOB_STORE_CATEGORIES,
+    JOB_STORE_DTYPES,
+    JobState,
+    JobTraceInfo,
+)
+from cqsim.cqsim.types import Job
+
+
+def random_job(rng, index):
+    return Job(
+        id=index + 1,
+        submit_time=rng.randint(0, 10**6) + rng.choice([0, 0.5]),
+        wait_time=-1,
+        run_time=rng.randint(1, 10**5),
+        allocated_processors=rng.randint(1, 64),
+        average_cpu_time=-1,
+        used_memory=rng.choice([-1, 1024]),
+        requested_number_processors=rng.randint(1, 64),
+        requested_time=rng.randint(1, 10**5),
+        requested_memory=-1,
+        status=1,
+        user_id=rng.randint(0, 30),
+        group_id=rng.choice([-1, 3, 7]),
+        executable_number=-1,
+        queue_number=rng.randint(0, 3),
+        partition_number=-1,
+        previous_job_id=-1,
+        think_time_from_previous_job=-1,
+    )
+
+
+def new_store(capacity=4):
+    return JobStore(
+        JobTraceInfo,
+        dtypes=JOB_STORE_DTYPES,
+        categories=JOB_STORE_CATEGORIES,
+        capacity=capacity,
+    )
+
+
+@pytest.mark.parametrize("seed", range(20))
+def test_same_jobs_as_the_dict(seed):
+    rng = random.Random(seed)
+    store = new_store()
+    traces = {}
+    for _ in range(50):
+        op = rng.random()
+        if op < 0.3:
+            jobs = [random_job(rng, store.size + i) for i in range(rng.randint(0, 9))]
+            indices = store.append(jobs)
+            assert indices == list(range(store.size - len(jobs), store.size))
+            for index, job in zip(indices, jobs):
+                traces[index] = JobTraceInfo.from_job(job)
+        elif op < 0.5:
+            index = store.size
+            traces[index] = JobTraceInfo.from_job(random_job(rng, index))
+            store[index] = traces[index]
+        elif op < 0.8 and traces:
+            # the scheduler updating a job through its row
+            index = rng.choice(list(traces))
+            for job in (traces[index], store[index]):
+                job.state = JobState.START
+                job.start_time = 2e6 + index
+                job.score = 0.25
+                job.estimated_start_time = None if index % 2 else 3e6
+        elif traces:
+            index = rng.choice(list(traces))
+            assert store.pop(index).id == traces.pop(index).id
+            assert index not in store
+            with pytest.raises(KeyError):
+                store[index]
+        assert len(store) == len(traces)
+        for index, job in traces.items():
+            assert index in store
+            assert store[index].record() == job
+    indices = list(traces)
+    assert store.column("user_id", indices).tolist() == [
+        traces[i].user_id for i in indices
+    ]
+    assert store.column("submit_time", indices).tolist() == [
+        traces[i].submit_time for i in indices
+    ]
+
+
+def test_rows_are_views():
+    store = new_store()
+    store.append([random_job(random.Random(0), 0)])
+    row = store[0]
+    assert isinstance(row, JobRow)
+    store[0].wait_time = 42
+    assert row.wait_time == 42
+    # a checkpoint or a copy holds the record, not the store
+    assert pickle.loads(pickle.dumps(row)) == row.record()
+    assert copy.deepcopy({0: row})[0] == row.record()
+    store.pop(0)
+    # the views handed out stay valid
+    assert row.wait_time == 42
+
+
+def test_categories_widen():
+    store = new_store()
+    jobs = [random_job(random.Random(0), i) for i in range(3)]
+    for i, job in enumerate(jobs):
+        job.user_id = 70000 * i
+    store.append(jobs)
+    assert store.columns["user_id"].dtype == np.uint16
+    store.append(
+        [dataclasses.replace(job, user_id=i) for i, job in enumerate(jobs * 22000)]
+    )
+    assert store.columns["user_id"].dtype == np.uint32
+    assert store[2].user_id == 140000
+    assert store[3 + 65999].user_id == 65999
+
+
+def test_extend_keeps_removed_rows():
+    store = new_store()
+    store.extend(5)
+    assert store.size == 5 and len(store) == 0
+    assert 3 not in store
+    store[7] = JobTraceInfo.from_job(random_job(random.Random(0), 7))
+    assert store.size == 8 and len(store) == 1
+    assert store.nbytes() == 8 * (
+        sum(column.itemsize for column in store.columns.values()) + 1
+    )
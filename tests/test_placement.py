@@ -0,0 +1,186 @@
+import random
+
+import numpy as np
+import pytest
+
+import cqsim.cqsim  # noqa: F401 (the package imports its modules in order)
+from cqsim.cqsim.placement import BlockIndex
+
+
+class BruteBlocks:
+    """The slots as lists of end times and bookings, each query a scan."""
+
+    def __init__(self, groups, local):
+        self.groups = groups
+        self.local = local
+        self.until = [-np.inf] * len(groups)
+        self.bookings = []
+        self.largest = max([groups.count(g) for g in set(groups)] or [0])
+
+    def taken(self, slot, start, end):
+        if start is None or start <= 0:
+            start = 0
+            if self.until[slot] != -np.inf:
+                return True
+        elif self.until[slot] > start:
+            return True
+        for first, cores, begin, stop in self.bookings:
+            if first <= slot < first + cores:
+                if (
+                    begin < end and stop > start
+                    if end > start
+                    else begin <= start < stop
+                ):
+                    return True
+        return False
+
+    def find_at(self, cores, start, end):
+        if cores <= 0:
+            return 0
+        local = self.local and cores <= self.largest
+        for slot in range(len(self.groups) - cores + 1):
+            block = range(slot, slot + cores)
+            if not any(self.taken(i, start, end) for i in block) and (
+                not local or len({self.groups[i] for i in block}) == 1
+            ):
+                return slot
+        return None
+
+    def earliest_fit(self, cores, duration, start):
+        first = max(start, 0)
+        ends = list(self.until) + [b[3] for b in self.bookings]
+        for time in [first] + sorted({t for t in ends if t > first}):
+            if self.find_at(cores, time, time + duration) is not None:
+                return time
+        return None
+
+    def hold(self, slot, cores, end):
+        self.until[slot : slot + cores] = [end] * cores
+
+
+def random_ops(seed, steps=150):
+    """Jobs and reservations on random blocks, now being 0."""
+    rng = random.Random(seed)
+    size = rng.randint(0, 50)
+    groups = sorted(rng.randint(0, 5) for _ in range(size))
+    local = rng.random() < 0.5
+    blocks = BlockIndex(groups, local=local)
+    blocks.time = 0
+    brute = BruteBlocks(groups, local)
+    held = []
+    # the slots as they were before the first reservation from now
+    before = None
+    for _ in range(steps):
+        cores = rng.randint(0, 20)
+        yield rng, cores, blocks, brute
+        op = rng.random()
+        if op < 0.6 or op >= 0.9:
+            # the reservations are given back before a job starts or ends
+            if before is not None:
+                brute.until = before
+                before = None
+            brute.bookings = []
+            blocks.reset()
+        slot = brute.find_at(cores, None, 0)
+        if op < 0.3 and held:
+            slot, cores = held.pop(rng.randrange(len(held)))
+            blocks.give(slot, cores)
+            brute.hold(slot, cores, -np.inf)
+        elif op < 0.6 and slot is not None and cores > 0:
+            end = rng.randint(1, 30)
+            blocks.take(slot, cores, end)
+            brute.hold(slot, cores, end)
+            held.append((slot, cores))
+        elif 0.6 <= op < 0.9:
+            start = rng.choice([None, 0, rng.randint(1, 30)])
+            end = (start or 0) + rng.randint(1, 20)
+            slot = brute.find_at(cores, start, end)
+            assert blocks.reserve(cores, end, start) == slot
+            if slot is None or cores <= 0:
+                continue
+            if start:
+                brute.bookings.append((slot, cores, start, end))
+            else:
+                if before is None:
+                    before = list(brute.until)
+                brute.hold(slot, cores, end)
+
+
+@pytest.mark.parametrize("seed", range(40))
+def test_find(seed):
+    for rng, cores, blocks, brute in random_ops(seed):
+        # the tree holds the slots free now, whatever the bookings
+        bookings, brute.bookings = brute.bookings, []
+        slot = brute.find_at(cores, None, 0)
+        brute.bookings = bookings
+        assert blocks.find(cores) == slot
+        assert blocks.fits(cores) == (slot is not None)
+        if slot is not None:
+            assert blocks.is_free(slot, cores)
+
+
+@pytest.mark.parametrize("seed", range(40))
+def test_find_at(seed):
+    for rng, cores, blocks, brute in random_ops(seed):
+        start = rng.choice([None, 0, rng.randint(1, 30)])
+        end = (start or 0) + rng.randint(0, 20)
+        slot = brute.find_at(cores, start, end)
+        assert blocks.find_at(cores, start, end) == slot
+        assert blocks.fits_at(cores, start, end) == (slot is not None)
+
+
+@pytest.mark.parametrize("seed", range(40))
+def test_next_end(seed):
+    for rng, cores, blocks, brute in random_ops(seed):
+        start = rng.randint(-5, 30)
+        duration = rng.randint(0, 20)
+        # a block only fits again from the next end time
+        time = max(start, 0)
+        while time is not None and not blocks.fits_at(cores, time, time + duration):
+            time = blocks.next_end(time)
+        assert time == brute.earliest_fit(cores, duration, start)
+
+
+def test_local_blocks_stay_within_a_group():
+    blocks = BlockIndex([0, 0, 0, 1, 1, 1, 1], local=True)
+    blocks.take(0, 1, 5)
+    # slots 1-3 are free across the boundary, slots 3-5 within group 1
+    assert blocks.find(3) == 3
+    blocks.take(3, 2, 5)
+    assert blocks.find(3) is None
+    # larger than any group, the blocks may cross the boundaries
+    assert blocks.find(5) is None
+    blocks.give(3, 2)
+    assert blocks.find(5) == 1
+    assert BlockIndex([0, 0, 0, 1, 1, 1, 1]).find(3) == 0
+
+
+def test_a_later_reservation_leaves_the_gap_before_it():
+    blocks = BlockIndex([0] * 4)
+    blocks.time = 0
+    # a job holds 2 slots until 100, a reservation the 4 slots over [100, 150)
+    blocks.take(0, 2, 100)
+    assert blocks.reserve(4, 150, start=100) == 0
+    # a job of 2 slots for 50 still fits before it, but not for 120
+    assert blocks.find_at(2, None, 50) == 2
+    assert blocks.find_at(2, None, 120) is None
+    assert blocks.next_end(0) == 100
+    assert blocks.find_at(2, 150, 270) == 0
+    assert blocks.reserve(2, 50) == 2
+    assert blocks.find(2) is None
+
+
+def test_reset_gives_back_the_reservations():
+    blocks = BlockIndex([0] * 8)
+    blocks.time = 0
+    blocks.take(2, 2, 5)
+    assert blocks.reserve(2, 9) == 0
+    # the slots held until 5 are free from then on
+    assert blocks.reserve(3, 9, start=5) == 2
+    assert blocks.reserve(3, 9, start=5) == 5
+    assert blocks.find_at(1, 6, 8) is None
+    blocks.reset()
+    assert blocks.find(4) == 4
+    assert not blocks.is_free(1, 2)
+    assert list(blocks.until) == [-np.inf] * 2 + [5] * 2 + [-np.inf] * 4
+    assert blocks.find_at(6, 6, 8) == 0
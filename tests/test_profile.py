@@ -0,0 +1,125 @@
+import random
+
+import pytest
+
+import cqsim.cqsim  # noqa: F401 (the package imports its modules in order)
+from cqsim.cqsim.profile import AvailProfile
+
+
+class BruteProfile:
+    """The profile as a list of (time, freed) changes, each query a scan."""
+
+    def __init__(self, time, free):
+        self.time = time
+        self.free = free
+        self.changes = []
+
+    def value(self, time):
+        """The free cores at `time`."""
+        if time <= self.time:
+            return self.free
+        return self.free + sum(f for t, f in self.changes if t <= time)
+
+    def times(self):
+        """The times of the breakpoints, those whose changes add up to 0 dropped."""
+        sums = {}
+        for t, f in self.changes:
+            sums[t] = sums.get(t, 0) + f
+        return sorted(t for t, f in sums.items() if f != 0)
+
+    def min_free(self, start, end):
+        values = [self.value(t) for t in self.times() if start <= t < end]
+        if start <= self.time < end:
+            values.append(self.free)
+        elif self.time < start < end:
+            values.append(self.value(start))
+        return min(values) if values else None
+
+    def earliest_start(self, cores, duration):
+        candidates = [self.time] + [t for t in self.times() if t > self.time]
+        for start in candidates:
+            if duration <= 0:
+                if self.value(start) >= cores:
+                    return start
+                continue
+            points = [start] + [t for t in self.times() if start < t < start + duration]
+            if all(self.value(t) >= cores for t in points):
+                return start
+        return None
+
+
+def random_ops(seed, steps=150):
+    rng = random.Random(seed)
+    total = rng.choice([4, 16, 64])
+    profile = AvailProfile(0, total)
+    brute = BruteProfile(0, total)
+    jobs = []
+    reservations = []
+    for _ in range(steps):
+        op = rng.random()
+        if op < 0.3 and profile.free > 0:
+            cores, end = rng.randint(1, profile.free), rng.randint(1, 40)
+            profile.add(end, cores)
+            brute.free -= cores
+            brute.changes.append((end, cores))
+            jobs.append((end, cores))
+        elif op < 0.4 and jobs:
+            end, cores = jobs.pop(rng.randrange(len(jobs)))
+            profile.remove(end, cores)
+            brute.free += cores
+            brute.changes.remove((end, cores))
+        elif op < 0.8:
+            cores = rng.randint(1, total)
+            start = rng.choice([None, rng.randint(1, 40)])
+            end = (start or 0) + rng.randint(0, 20)
+            if start is None or start <= profile.time:
+                if end == profile.time:
+                    continue
+                brute.free -= cores
+                brute.changes.append((end, cores))
+                reservations.append([(end, cores)])
+            else:
+                if end <= start:
+                    continue
+                brute.changes += [(start, -cores), (end, cores)]
+                reservations.append([(start, -cores), (end, cores)])
+            profile.reserve(end, cores, start)
+        elif op < 0.85:
+            profile.reset()
+            for changes in reservations:
+                for change in changes:
+                    brute.changes.remove(change)
+                if len(changes) == 1:
+                    brute.free += changes[0][1]
+            reservations = []
+        yield rng, profile, brute
+
+
+@pytest.mark.parametrize("seed", range(40))
+def test_min_free(seed):
+    for rng, profile, brute in random_ops(seed):
+        start = rng.randint(-5, 45)
+        end = start + rng.randint(0, 30)
+        assert profile.min_free(start, end) == brute.min_free(start, end)
+
+
+@pytest.mark.parametrize("seed", range(40))
+def test_earliest_start(seed):
+    for rng, profile, brute in random_ops(seed):
+        cores = rng.randint(0, 70)
+        duration = rng.randint(-1, 30)
+        assert profile.earliest_start(cores, duration) == brute.earliest_start(
+            cores, duration
+        )
+
+
+def test_reset_restores_the_running_jobs():
+    profile = AvailProfile(0, 10)
+    profile.add(5, 4)
+    profile.reserve(8, 3)
+    profile.reserve(12, 6, start=5)
+    profile.reserve(9, 2, start=12)
+    profile.reset()
+    assert len(profile) == 2
+    assert profile.breakpoint(1) == (5, 10)
+    assert profile.min_free(0, 20) == 6
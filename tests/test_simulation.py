@@ -0,0 +1,134 @@
+import json
+import os
+import random
+import shutil
+import subprocess
+import sys
+from pathlib import Path
+
+import pandas as pd
+import pytest
+
+import cqsim.cqsim  # noqa: F401 (the package imports its modules in order)
+from cqsim.cqsim.checkpoint import load_checkpoint
+from cqsim.cqsim_api import simulate
+
+REPO = Path(__file__).resolve().parent.parent
+CORES = 64
+
+
+def random_jobs(count, seed=0):
+    """Jobs of a busy cluster: they queue, and some of them are backfilled."""
+    rng = random.Random(seed)
+    submit = 0
+    rows = []
+    for i in range(count):
+        submit += rng.choice([0, rng.randint(1, 60), rng.randint(60, 600)])
+        run = rng.randint(1, 3000)
+        rows.append(
+            {
+                "id": i + 1,
+                "submit_time": float(submit),
+                "run_time": float(run),
+                "requested_number_processors": rng.choice(
+                    [1, 2, 4, rng.randint(1, CORES)]
+                ),
+                "requested_time": float(run + rng.choice([0, rng.randint(1, 3000)])),
+            }
+        )
+    return pd.DataFrame(rows)
+
+
+@pytest.mark.parametrize(
+    "monitor, options",
+    [
+        # the list inserts the monitor events where the legacy queue did
+        (None, {"event_queue": 1}),
+        (500, {"event_queue": 3}),
+        (500, {"job_store": 2}),
+        (500, {"event_queue": 3, "job_store": 2}),
+    ],
+)
+def test_backends_give_the_same_results(monitor, options):
+    jobs = random_jobs(300)
+    expected = simulate(jobs, CORES, alg=["wfp3"], alg_sign=[1], monitor=monitor)
+    result = simulate(
+        jobs, CORES, alg=["wfp3"], alg_sign=[1], monitor=monitor, **options
+    )
+    assert len(result.jobs) == 300
+    pd.testing.assert_frame_equal(result.jobs, expected.jobs)
+    pd.testing.assert_frame_equal(result.system, expected.system)
+
+
+@pytest.fixture
+def workdir(tmp_path):
+    """The layout the command line expects, with a generated trace."""
+    shutil.copytree(REPO / "config", tmp_path / "config")
+    (tmp_path / "data" / "InputFiles").mkdir(parents=True)
+    lines = ["; UnixStartTime: 0", "; MaxNodes: %d" % CORES, "; MaxProcs: %d" % CORES]
+    for job in random_jobs(150).itertuples():
+        lines.append(
+            " ".join(
+                str(field)
+                for field in [
+                    job.id,
+                    int(job.submit_time),
+                    -1,
+                    int(job.run_time),
+                    job.requested_number_processors,
+                    -1,
+                    -1,
+                    job.requested_number_processors,
+                    int(job.requested_time),
+                    -1,
+                    1,
+                    1,
+                    1,
+                    1,
+                    1,
+                    -1,
+                    -1,
+                    -1,
+                ]
+            )
+        )
+    (tmp_path / "data" / "InputFiles" / "test.swf").write_text("\n".join(lines) + "\n")
+    return tmp_path
+
+
+def run_cqsim(workdir, *args):
+    subprocess.run(
+        [sys.executable, "-m", "cqsim", "-j", "test.swf", "-n", "test.swf"]
+        + [str(arg) for arg in args],
+        cwd=workdir,
+        env=dict(os.environ, PYTHONPATH=str(REPO)),
+        check=True,
+        capture_output=True,
+        text=True,
+    )
+
+
+def result_of(workdir, name="test"):
+    return (workdir / "data" / "Results" / (name + ".rst")).read_text()
+
+
+def test_resume_from_a_checkpoint(workdir):
+    run_cqsim(workdir, "--checkpoint", "ck.bin", "--checkpoint_time", 20000)
+    expected = result_of(workdir)
+    # the last checkpoint is taken with jobs still to finish
+    state = load_checkpoint(workdir / "data" / "Fmt" / "ck.bin")
+    assert state["job"]["submit_indices"] or state["job"]["run_indices"]
+
+    run_cqsim(workdir, "--resume", "ck.bin")
+    assert result_of(workdir) == expected
+
+
+def test_fork_branches(workdir):
+    run_cqsim(workdir)
+    expected = result_of(workdir)
+    branches = [{"name": "same"}, {"name": "easy", "backfill": 1}]
+    (workdir / "config" / "branches.json").write_text(json.dumps(branches))
+
+    run_cqsim(workdir, "--fork_time", 20000, "--branches", "branches.json")
+    assert result_of(workdir, "test_same") == expected
+    assert result_of(workdir, "test_easy").count("\n") == expected.count("\n")
@@ -0,0 +1,71 @@
+import random
+
+import numpy as np
+import pytest
+
+import cqsim.cqsim  # noqa: F401 (the package imports its modules in order)
+from cqsim.cqsim.wait_queue import WaitQueue, unsorted_range
+
+
+def random_scores(rng):
+    """Scores in descending order, some of which then change."""
+    size = rng.randint(0, 40)
+    values = [rng.choice([0.0, 1.0, 2.5, np.inf, -np.inf]) for _ in range(3)]
+    scores = sorted(
+        (rng.choice(values) if rng.random() < 0.2 else rng.randint(0, 30))
+        for _ in range(size)
+    )[::-1]
+    for _ in range(rng.randint(0, 4)):
+        if scores:
+            scores[rng.randrange(size)] = rng.choice([rng.randint(-5, 35), 0.0])
+    if rng.random() < 0.05 and scores:
+        scores[rng.randrange(size)] = np.nan
+    return np.array(scores, dtype=float)
+
+
+@pytest.mark.parametrize("seed", range(200))
+def test_unsorted_range(seed):
+    scores = random_scores(random.Random(seed))
+    order = np.arange(len(scores))
+    span = unsorted_range(scores)
+    if span is not None:
+        lo, hi = span
+        assert 0 <= lo < hi <= len(scores)
+        order[lo:hi] = lo + np.argsort(-scores[lo:hi], kind="stable")
+    assert order.tolist() == np.argsort(-scores, kind="stable").tolist()
+
+
+def test_unsorted_range_of_a_sorted_queue():
+    assert unsorted_range(np.array([3.0, 3.0, 2.0, -np.inf])) is None
+    assert unsorted_range(np.array([])) is None
+    assert unsorted_range(np.array([1.0])) is None
+    # from the first job passed to the last job passing
+    assert unsorted_range(np.array([9.0, 5.0, 4.0, 6.0, 1.0, 0.0])) == (1, 4)
+    assert unsorted_range(np.array([2.0, 1.0, np.nan, 0.0])) == (0, 4)
+
+
+def test_wait_queue_reorder():
+    queue = WaitQueue(capacity=2)
+    for index in range(5):
+        queue.append(index, index + 1, 10.0 * index, -index)
+    queue.delete(1)
+    queue.insert(0, 9, 4, 1.5, 2.0)
+    assert queue.indices.tolist() == [9, 0, 2, 3, 4]
+    queue.reorder([3, 2], start=2)
+    assert queue.indices.tolist() == [9, 0, 3, 2, 4]
+    assert queue.procs.tolist() == [4, 1, 4, 3, 5]
+    queue.reorder([4, 3, 2, 1, 0])
+    assert queue.scores.tolist() == [-4, -2, -3, 0, 2]
+    assert queue.runs.tolist() == [40.0, 20.0, 30.0, 0.0, 1.5]
+
+
+def test_wait_queue_compress():
+    queue = WaitQueue()
+    for index in range(6):
+        queue.append(index, 1, 1.0, float(index))
+    queue.drop(0)
+    queue.drop(3)
+    assert queue.compress().tolist() == [False, True, True, False, True, True]
+    assert queue.indices.tolist() == [1, 2, 4, 5]
+    assert queue.scores.tolist() == [1.0, 2.0, 4.0, 5.0]
+    assert queue.compress().all()